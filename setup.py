@@ -17,19 +17,32 @@ setuptools.setup(
     packages=["usempl_npp"],
     package_data={
         "usempl_npp": [
-            "data/usempl_2022-11-01.csv",
-            "data/usempl_annual_1919-1938.csv",
-            "data/usempl_pk_2022-11-01.csv",
+            "data/usempl_2023-07-01.csv",
+            "data/usempl_anual_1919-1938.csv",
+            "data/usempl_backcast_f721c16e062f33c9.csv",
+            "data/usempl_pk_2023-07-01.csv",
+            "data/usempl_pk_2023-07-01.npy",
+            "data/usempl_pk_2023-07-01.key",
+            "data/recessions.csv",
+            "data/vintages/PAYEMS.bin",
         ]
     },
     include_packages=True,
+    entry_points={
+        "console_scripts": [
+            "usempl-npp = usempl_npp.pipeline:main",
+            "usempl-npp-serve = usempl_npp.service:main",
+        ],
+    },
     python_requires=">=3.10.8",
     install_requires=[
-        "numpy>=1.23.4",
+        "numpy>=1.24.0",
         "scipy>=1.9.3",
         "pandas>=1.5.2",
         "pandas-datareader>=0.10.0",
+        "requests>=2.26.0",
         "bokeh>=2.4.3, <3.0",
+        "matplotlib>=3.5.0",
         "pytest>=7.1.2",
         "pytest-cov",
         "pytest-pycodestyle",
@@ -0,0 +1,320 @@
+"""
+Tests of async_fetch.py module
+
+The requests go to a local HTTP stand-in for FRED that serves the bundled
+PAYEMS data, so these tests run offline. The order in which downloads
+finish is set by gating the answers of the stand-in on threading.Event
+objects, not by delays, so that the tests do not depend on timing.
+"""
+
+import asyncio
+import http.server
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+import pandas as pd
+import pytest
+from usempl_npp import async_fetch
+from usempl_npp import multi_series
+from usempl_npp import usempl_data
+from usempl_npp import vintage_store
+
+# Bundled PAYEMS series as FRED serves it in fredgraph.csv
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+bundled_df = pd.read_csv(
+    os.path.join(
+        cur_path, "..", "usempl_npp", "data", "usempl_2023-07-01.csv"
+    ),
+    parse_dates=["Date"],
+)
+bundled_df = bundled_df[bundled_df["Date"] >= "1939-01-01"]
+
+
+# Stand-in for the FRED CSV download that serves the bundled series (through
+# its vintage_date for vintage requests). A request whose key (series_id,
+# vintage_date) is in gates waits for that threading.Event before it is
+# answered, so that each test decides which download finishes first. The
+# handler records the key of each request in the order the requests start
+# and the most requests in flight
+class GatedFredHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    gates = {}
+    num_in_flight = 0
+    max_in_flight = 0
+    started = []
+
+    def do_GET(self):
+        cls = GatedFredHandler
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        fetch_key = (query["id"][0], query.get("vintage_date", [None])[0])
+        with cls.lock:
+            cls.started.append(fetch_key)
+            cls.num_in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.num_in_flight)
+            gate = cls.gates.get(fetch_key)
+        if gate is not None:
+            gate.wait(GATE_TIMEOUT)
+        series_df = bundled_df
+        if fetch_key[1] is not None:
+            series_df = series_df[series_df["Date"] <= fetch_key[1]]
+        body = (
+            series_df.rename(columns={"Date": "observation_date"})
+            .to_csv(index=False, date_format="%Y-%m-%d")
+            .encode("utf-8")
+        )
+        with cls.lock:
+            cls.num_in_flight -= 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up on a timed-out download
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+# Upper bound in seconds on any wait of a gate, so that a failing test does
+# not hang
+GATE_TIMEOUT = 10.0
+
+
+@pytest.fixture
+def fred_url():
+    GatedFredHandler.gates = {}
+    GatedFredHandler.num_in_flight = 0
+    GatedFredHandler.max_in_flight = 0
+    GatedFredHandler.started = []
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), GatedFredHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:" + str(server.server_port) + "/fredgraph.csv"
+    for gate in GatedFredHandler.gates.values():
+        gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+# Event set by the handler once num_requests requests are in flight at the
+# same time
+def in_flight_event(num_requests):
+    all_in_flight = threading.Event()
+
+    def watch():
+        while not all_in_flight.is_set():
+            with GatedFredHandler.lock:
+                if GatedFredHandler.num_in_flight >= num_requests:
+                    all_in_flight.set()
+            time.sleep(0.001)
+
+    threading.Thread(target=watch, daemon=True).start()
+    return all_in_flight
+
+
+# Test that the downloads run one at a time with max_concurrency=1, that
+# with max_concurrency=2 two downloads are in flight at once but never
+# more, and that each series is aligned as in one process
+def test_get_multi_series_panels_async(fred_url):
+    series_id_lst = ["PAYEMS", "MANEMP", "UNRATE", "INDPRO"]
+    results_serial, errors, _, _ = async_fetch.get_multi_series_panels_async(
+        series_id_lst,
+        end_date_str="2023-07-01",
+        max_concurrency=1,
+        rate_per_sec=None,
+        fred_url=fred_url,
+    )
+    assert errors == {}
+    assert GatedFredHandler.max_in_flight == 1
+    assert GatedFredHandler.started == [
+        (series_id, None) for series_id in series_id_lst
+    ]
+
+    # The first download is answered only once a second one is in flight,
+    # so the downloads must overlap
+    GatedFredHandler.max_in_flight = 0
+    GatedFredHandler.gates = {("PAYEMS", None): in_flight_event(2)}
+    results, errors, total_secs, throughput = (
+        async_fetch.get_multi_series_panels_async(
+            series_id_lst,
+            end_date_str="2023-07-01",
+            max_concurrency=2,
+            rate_per_sec=None,
+            fred_url=fred_url,
+        )
+    )
+    assert errors == {}
+    assert GatedFredHandler.max_in_flight == 2
+    assert total_secs > 0
+    assert throughput > 0
+    assert list(results.keys()) == series_id_lst
+
+    # Each panel matches the alignment of the same series in one process
+    rec_df = usempl_data.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(
+            rec_df["peak_search_beg"].dt.strftime("%Y-%m-%d"),
+            rec_df["peak_search_end"].dt.strftime("%Y-%m-%d"),
+        )
+    )
+    series_df = bundled_df.reset_index(drop=True)
+    for series_id in series_id_lst:
+        series_pk_long, peak_vals, peak_dates = (
+            multi_series.align_series_panel(
+                series_df.rename(columns={"PAYEMS": series_id}),
+                series_id,
+                maxdate_rng_lst,
+                rec_df["rec_label_yr"].tolist(),
+            )
+        )
+        pd.testing.assert_frame_equal(results[series_id][0], series_pk_long)
+        pd.testing.assert_frame_equal(
+            results_serial[series_id][0], series_pk_long
+        )
+        assert results[series_id][1] == peak_vals
+        assert results[series_id][2] == peak_dates
+
+
+# Test that a download that never answers times out without stopping the
+# others, and that each series is handed over in the order it arrives: the
+# current PAYEMS series is held until the later vintage has been handed over
+def test_fetch_series_order(fred_url):
+    vintage_arrived = threading.Event()
+    GatedFredHandler.gates = {
+        ("SLOW", None): threading.Event(),
+        ("PAYEMS", None): vintage_arrived,
+    }
+    arrival_lst = []
+
+    def on_result(series_id, vintage_date, series_df):
+        arrival_lst.append((series_id, vintage_date))
+        if vintage_date is not None:
+            vintage_arrived.set()
+        return len(series_df)
+
+    results, errors = async_fetch.fetch_series(
+        [("SLOW", None), ("PAYEMS", None), ("PAYEMS", "2020-06-05")],
+        on_result=on_result,
+        max_concurrency=3,
+        rate_per_sec=None,
+        timeout=0.5,
+        fred_url=fred_url,
+    )
+    assert list(errors.keys()) == [("SLOW", None)]
+    assert isinstance(errors[("SLOW", None)], Exception)
+    assert list(results.keys()) == [("PAYEMS", None), ("PAYEMS", "2020-06-05")]
+    assert arrival_lst == [("PAYEMS", "2020-06-05"), ("PAYEMS", None)]
+    assert results[("PAYEMS", None)] == len(bundled_df)
+    assert set(GatedFredHandler.started) == {
+        ("SLOW", None),
+        ("PAYEMS", None),
+        ("PAYEMS", "2020-06-05"),
+    }
+
+
+# Test that the rate limiter reserves the request starts 1 / rate_per_sec
+# seconds apart in the order of the calls, without waiting in real time
+def test_wait_rate_limiter(monkeypatch):
+    sleep_lst = []
+
+    async def record_sleep(delay):
+        sleep_lst.append(delay)
+
+    monkeypatch.setattr(async_fetch.asyncio, "sleep", record_sleep)
+
+    async def wait_three(limiter):
+        await asyncio.gather(
+            *[async_fetch.wait_rate_limiter(limiter) for _ in range(3)]
+        )
+
+    limiter = async_fetch.make_rate_limiter(10.0)
+    asyncio.run(wait_three(limiter))
+    assert len(sleep_lst) == 2
+    assert sleep_lst[0] == pytest.approx(0.1, abs=0.01)
+    assert sleep_lst[1] == pytest.approx(0.2, abs=0.01)
+    sleep_lst.clear()
+    asyncio.run(wait_three(async_fetch.make_rate_limiter(None)))
+    assert sleep_lst == []
+
+
+# Test that past vintages downloaded concurrently are appended to the
+# vintage store from old to new
+def test_backfill_vintages(fred_url, tmp_path):
+    store_path = vintage_store.get_store_path("PAYEMS", str(tmp_path))
+    vintage_date_lst = ["2023-07-01", "2020-06-05", "2021-06-04"]
+    num_records, errors = async_fetch.backfill_vintages(
+        vintage_date_lst,
+        store_path=store_path,
+        rate_per_sec=None,
+        fred_url=fred_url,
+    )
+    assert errors == {}
+    assert vintage_store.get_vintage_dates(store_path) == sorted(
+        vintage_date_lst
+    )
+    assert num_records == len(bundled_df)
+    for vintage_date in vintage_date_lst:
+        vintage_df = vintage_store.get_vintage(store_path, vintage_date)
+        assert vintage_df["Date"].iloc[-1] == (
+            bundled_df["Date"][bundled_df["Date"] <= vintage_date].iloc[-1]
+        )
+
+
+# Test that pre-2023 vintages are backfilled into the default store, which
+# starts with the newer bundled vintage, and that a failed download is
+# skipped without skipping the later vintages
+def test_backfill_vintages_default_store(monkeypatch, tmp_path):
+    store_path = os.path.join(tmp_path, "PAYEMS.bin")
+    shutil.copyfile(vintage_store.get_bundled_store_path("PAYEMS"), store_path)
+    monkeypatch.setattr(
+        vintage_store, "get_store_path", lambda series_id: store_path
+    )
+    latest_df = vintage_store.get_vintage(store_path)
+    vintage_df = {}
+    for vintage_date in ["2020-06-05", "2021-06-04"]:
+        vintage_df[vintage_date] = (
+            latest_df[latest_df["Date"] < vintage_date]
+            .iloc[:-1]
+            .reset_index(drop=True)
+        )
+    # The first release of April 2020 was revised a year later
+    vintage_df["2020-06-05"].loc[
+        len(vintage_df["2020-06-05"]) - 2, "PAYEMS"
+    ] -= 100.0
+
+    def fetch_stub(fetch_lst, *args):
+        assert fetch_lst == [
+            ("PAYEMS", "2020-06-05"),
+            ("PAYEMS", "2021-06-04"),
+            ("PAYEMS", "2022-06-03"),
+        ]
+        results = {key: vintage_df[key[1]] for key in fetch_lst[:2]}
+        return results, {fetch_lst[2]: TimeoutError()}
+
+    monkeypatch.setattr(async_fetch, "fetch_series", fetch_stub)
+    num_records, errors = async_fetch.backfill_vintages(
+        ["2022-06-03", "2021-06-04", "2020-06-05"]
+    )
+    assert list(errors) == [("PAYEMS", "2022-06-03")]
+    assert num_records == len(vintage_df["2020-06-05"]) + 12 + 1
+    assert vintage_store.get_vintage_dates(store_path) == [
+        "2020-06-05",
+        "2021-06-04",
+        "2023-08-04",
+    ]
+    for vintage_date in ["2020-06-05", "2021-06-04"]:
+        pd.testing.assert_frame_equal(
+            vintage_store.get_vintage(store_path, vintage_date),
+            vintage_df[vintage_date],
+        )
+    pd.testing.assert_frame_equal(
+        vintage_store.get_vintage(store_path), latest_df
+    )
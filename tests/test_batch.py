@@ -0,0 +1,96 @@
+"""
+Tests of batch.py module
+
+The figures are rendered from the bundled PAYEMS data into a temporary
+directory.
+"""
+
+import os
+import pandas as pd
+import pytest
+from usempl_npp import batch
+
+
+# Test that one HTML file is rendered per data month, in parallel and
+# serially, and that recessions after the end date are left out
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_usempl_npp_batch(tmp_path, max_workers):
+    html_path_lst = batch.usempl_npp_batch(
+        ["2008-06-01", "2020-07-01", "2020-07-15", "2023-07-01"],
+        download_from_internet=False,
+        data_end_date_str="2023-07-01",
+        image_dir=str(tmp_path),
+        max_workers=max_workers,
+    )
+    assert [os.path.basename(html_path) for html_path in html_path_lst] == [
+        "usempl_npp_2008-06-01.html",
+        "usempl_npp_2020-07-01.html",
+        "usempl_npp_2023-07-01.html",
+    ]
+    with open(html_path_lst[0], encoding="utf-8") as html_file:
+        html_2008 = html_file.read()
+    with open(html_path_lst[-1], encoding="utf-8") as html_file:
+        html_2023 = html_file.read()
+    assert "Dec 2007 - Jun 2009" in html_2008
+    assert "Feb 2020 - Apr 2020" not in html_2008
+    assert "Feb 2020 - Apr 2020" in html_2023
+    assert "last 15 recessions" in html_2023
+    assert "July 15, 2020" in open(html_path_lst[1], encoding="utf-8").read()
+
+
+# Test that end dates before the first month of the series raise an error
+# that names them, in the batch and in a single render
+def test_usempl_npp_batch_early_end_date(tmp_path):
+    with pytest.raises(ValueError, match="1900-01-01, 1910-05-01"):
+        batch.usempl_npp_batch(
+            ["1910-05-01", "2008-06-01", "1900-01-01"],
+            download_from_internet=False,
+            data_end_date_str="2023-07-01",
+            image_dir=str(tmp_path),
+            max_workers=2,
+        )
+    assert os.listdir(tmp_path) == []
+    batch.init_batch_worker(
+        pd.DataFrame(
+            {"Date": pd.to_datetime(["1939-01-01"]), "PAYEMS": [29923.0]}
+        ),
+        None,
+    )
+    with pytest.raises(ValueError, match="1938-12-01"):
+        batch.render_vintage("1938-12-01", image_dir=str(tmp_path))
+
+
+# Test that the batch renders 200 monthly release dates
+@pytest.mark.local
+def test_usempl_npp_batch_200_dates(tmp_path):
+    end_date_str_lst = (
+        pd.date_range("2006-11-05", periods=200, freq="MS")
+        .strftime("%Y-%m-%d")
+        .tolist()
+    )
+    html_path_lst = batch.usempl_npp_batch(
+        end_date_str_lst,
+        download_from_internet=False,
+        data_end_date_str="2023-07-01",
+        image_dir=str(tmp_path),
+    )
+    assert len(html_path_lst) == 200
+
+
+# Test that the batch renders static PNG images instead of HTML
+def test_usempl_npp_batch_png(tmp_path):
+    fig_path_lst = batch.usempl_npp_batch(
+        ["2008-06-01", "2023-07-01"],
+        download_from_internet=False,
+        data_end_date_str="2023-07-01",
+        image_dir=str(tmp_path),
+        max_workers=1,
+        image_format="png",
+    )
+    assert [os.path.basename(fig_path) for fig_path in fig_path_lst] == [
+        "usempl_npp_2008-06-01.png",
+        "usempl_npp_2023-07-01.png",
+    ]
+    for fig_path in fig_path_lst:
+        with open(fig_path, "rb") as png_file:
+            assert png_file.read(8) == b"\x89PNG\r\n\x1a\n"
@@ -0,0 +1,75 @@
+"""
+Tests of benchmark.py module
+"""
+
+import json
+import os
+import pytest
+from usempl_npp import benchmark
+
+
+# Test that the benchmark times every step of the bundled and synthetic cases
+# and saves the results as JSON
+def test_run_benchmarks(tmp_path):
+    out_path = os.path.join(tmp_path, "bench.json")
+    bench = benchmark.run_benchmarks(
+        scale_lst=[1], num_reps=1, out_path=out_path
+    )
+    with open(out_path, "r", encoding="utf-8") as out_file:
+        assert json.load(out_file) == bench
+    assert sorted(bench["results"]) == ["bundled", "synthetic_x1"]
+    assert bench["results"]["bundled"]["num_rec"] == 15
+    for case_result in bench["results"].values():
+        for step_name in [
+            "align_wide",
+            "align_long",
+            "csv_round_trip",
+            "npy_round_trip",
+            "window_sweep",
+            "cds",
+            "html",
+        ]:
+            assert case_result[step_name]["secs"] > 0
+            assert case_result[step_name]["peak_mb"] > 0
+        assert case_result["html"]["bytes"] > 0
+    assert benchmark.compare_benchmarks(bench, bench) == []
+
+
+# Test that a slower or more memory-hungry step is flagged as a regression,
+# and that a step under min_secs is only compared on memory
+def test_compare_benchmarks():
+    bench_base = {
+        "results": {
+            "bundled": {
+                "num_rec": 15,
+                "align_wide": {"secs": 0.01, "peak_mb": 1.0},
+                "html": {"secs": 0.0001, "peak_mb": 1.0, "bytes": 100},
+            }
+        }
+    }
+    bench = {
+        "results": {
+            "bundled": {
+                "num_rec": 15,
+                "align_wide": {"secs": 0.02, "peak_mb": 1.2},
+                "html": {"secs": 0.001, "peak_mb": 2.0, "bytes": 100},
+            },
+            "synthetic_x10": {"align_wide": {"secs": 1.0, "peak_mb": 9.0}},
+        }
+    }
+    regressions = benchmark.compare_benchmarks(bench, bench_base)
+    assert regressions == [
+        ("bundled", "align_wide", "secs", 0.01, 0.02),
+        ("bundled", "html", "peak_mb", 1.0, 2.0),
+    ]
+
+
+# Full benchmark with the 10x and 100x synthetic series
+@pytest.mark.local
+def test_run_benchmarks_full(tmp_path):
+    bench = benchmark.run_benchmarks(
+        scale_lst=[10, 100],
+        num_reps=1,
+        out_path=os.path.join(tmp_path, "bench.json"),
+    )
+    assert bench["results"]["synthetic_x100"]["num_rec"] == 1500
@@ -0,0 +1,102 @@
+"""
+Tests of downsample.py module
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from usempl_npp import downsample
+from usempl_npp import usempl_data
+
+usempl_pk_long = usempl_data.get_usempl_data(
+    135, 48, "2023-07-01", False, output_format="long", verbose=False
+)[0]
+
+
+# Reference LTTB of one line with a loop over the points of each bucket
+def lttb_loop(x_vals, y_vals, num_points):
+    num_obs = len(x_vals)
+    every = (num_obs - 2) / (num_points - 2)
+    keep_idx = [0]
+    for k in range(num_points - 2):
+        beg = 1 + int(np.floor(k * every))
+        end = 1 + int(np.floor((k + 1) * every))
+        nxt_end = min(1 + int(np.floor((k + 2) * every)), num_obs)
+        if k == num_points - 3:
+            nxt_end = num_obs
+        avg_x = np.mean(x_vals[end:nxt_end])
+        avg_y = np.mean(y_vals[end:nxt_end])
+        prev = keep_idx[-1]
+        best_idx, best_area = beg, -1.0
+        for j in range(beg, end):
+            area = abs(
+                (x_vals[prev] - avg_x) * (y_vals[j] - y_vals[prev])
+                - (x_vals[prev] - x_vals[j]) * (avg_y - y_vals[prev])
+            )
+            if area > best_area:
+                best_idx, best_area = j, area
+        keep_idx.append(best_idx)
+    keep_idx.append(num_obs - 1)
+
+    return np.array(keep_idx)
+
+
+# Test that LTTB matches the reference loop and that min/max decimation
+# keeps the extremes of every bucket within the point budget
+@pytest.mark.parametrize("num_points", [3, 10, 101])
+def test_downsample_indices(num_points):
+    rng = np.random.default_rng(num_points)
+    x_vals = np.cumsum(rng.uniform(0.5, 1.5, 1000))
+    y_vals = np.cumsum(rng.normal(0, 1, 1000))
+    keep_idx = downsample.get_lttb_indices(x_vals, y_vals, num_points)
+    np.testing.assert_array_equal(
+        keep_idx, lttb_loop(x_vals, y_vals, num_points)
+    )
+    assert len(keep_idx) == num_points
+    np.testing.assert_array_equal(
+        downsample.get_lttb_indices(x_vals[:50], y_vals[:50], 50),
+        np.arange(50),
+    )
+
+    if num_points >= 4:
+        keep_idx = downsample.get_minmax_indices(x_vals, y_vals, num_points)
+        assert len(keep_idx) <= num_points
+        assert (np.diff(keep_idx) > 0).all()
+        assert keep_idx[0] == 0 and keep_idx[-1] == 999
+        assert np.argmin(y_vals) in keep_idx
+        assert np.argmax(y_vals) in keep_idx
+    else:
+        with pytest.raises(ValueError):
+            downsample.get_minmax_indices(x_vals, y_vals, num_points)
+
+
+# Test that downsampling the long DataFrame keeps the recessions contiguous
+# and in order, and that the detail data hold every point of each recession
+def test_downsample_long():
+    usempl_pk_down = downsample.downsample_long(usempl_pk_long, 50)
+    rec_counts = usempl_pk_down["recession_id"].value_counts(sort=False)
+    full_counts = usempl_pk_long["recession_id"].value_counts(sort=False)
+    np.testing.assert_array_equal(
+        rec_counts.to_numpy(), np.minimum(full_counts.to_numpy(), 50)
+    )
+    assert usempl_pk_down["recession_id"].cat.codes.is_monotonic_increasing
+    pd.testing.assert_frame_equal(
+        usempl_pk_down, usempl_pk_long.loc[usempl_pk_down.index]
+    )
+    with pytest.raises(ValueError):
+        downsample.downsample_long(usempl_pk_long, 50, method="every_nth")
+
+    detail_data = downsample.get_detail_data(
+        usempl_pk_long, ["mths_frm_peak", "Date", "usempl_dv_pk"]
+    )
+    assert [len(mths) for mths in detail_data["mths_frm_peak"]] == (
+        full_counts.tolist()
+    )
+    rec_pk = usempl_pk_long[usempl_pk_long["recession_id"] == "2020"]
+    assert detail_data["Date"][-1][0] == (
+        rec_pk["Date"].iloc[0].value // 1_000_000
+    )
+    np.testing.assert_array_equal(
+        np.array(detail_data["usempl_dv_pk"][-1], dtype=np.float32),
+        rec_pk["usempl_dv_pk"].to_numpy(),
+    )
@@ -0,0 +1,100 @@
+"""
+Tests of fred_cache.py module
+
+The FRED reader is replaced by a stub that serves the bundled PAYEMS data, so
+these tests run offline.
+"""
+
+import os
+import datetime as dt
+import numpy as np
+import pandas as pd
+from usempl_npp import fred_cache
+
+
+# Bundled PAYEMS series indexed by DATE, the way FredReader returns it
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+bundled_df = pd.read_csv(
+    os.path.join(
+        cur_path, "..", "usempl_npp", "data", "usempl_2023-07-01.csv"
+    ),
+    parse_dates=["Date"],
+)
+bundled_df = bundled_df[bundled_df["Date"] >= "1939-01-01"]
+fred_df = bundled_df.rename(columns={"Date": "DATE"}).set_index("DATE")
+
+
+# Stub of pandas_datareader.fred.FredReader that records every request
+class StubReader:
+    calls = []
+    data = fred_df
+
+    def __init__(self, symbols, start, end):
+        self.start = pd.Timestamp(start)
+        self.end = pd.Timestamp(end)
+        StubReader.calls.append((symbols, self.start, self.end))
+
+    def read(self):
+        return StubReader.data.loc[self.start : self.end]
+
+
+# Test that the first call downloads the full history, that later calls only
+# ask for the months after the cache plus the revision overlap, and that an
+# end date inside the cache sends no request at all
+def test_get_fred_series_incremental(tmp_path):
+    StubReader.calls = []
+    StubReader.data = fred_df.loc[:"2022-11-01"]
+    series_df = fred_cache.get_fred_series(
+        "PAYEMS",
+        end_date=dt.datetime(2022, 11, 15),
+        cache_dir=tmp_path,
+        reader=StubReader,
+    )
+    assert len(StubReader.calls) == 1
+    assert StubReader.calls[0][1] == pd.Timestamp(fred_cache.FRED_START_DATE)
+    assert series_df["Date"].iloc[0] == pd.Timestamp("1939-01-01")
+    assert series_df["Date"].iloc[-1] == pd.Timestamp("2022-11-01")
+    assert os.access(os.path.join(tmp_path, "PAYEMS.csv"), os.F_OK)
+
+    # New month and revision of the previous month published
+    StubReader.data = fred_df.loc[:"2022-12-01"].copy()
+    StubReader.data.loc["2022-11-01", "PAYEMS"] += 10
+    series_df = fred_cache.get_fred_series(
+        "PAYEMS",
+        end_date=dt.datetime(2022, 12, 15),
+        cache_dir=tmp_path,
+        reader=StubReader,
+    )
+    assert len(StubReader.calls) == 2
+    assert StubReader.calls[1][1] == pd.Timestamp("2022-09-01")
+    assert series_df["Date"].iloc[-1] == pd.Timestamp("2022-12-01")
+    assert (
+        series_df["PAYEMS"].iloc[-2]
+        == fred_df.loc["2022-11-01", "PAYEMS"] + 10
+    )
+    np.testing.assert_array_equal(
+        series_df["PAYEMS"].to_numpy()[:-2],
+        fred_df.loc[:"2022-10-01", "PAYEMS"].to_numpy(),
+    )
+
+    # Historical end date served from the cache without a request
+    series_df = fred_cache.get_fred_series(
+        "PAYEMS",
+        end_date=dt.datetime(2020, 7, 1),
+        cache_dir=tmp_path,
+        reader=StubReader,
+    )
+    assert len(StubReader.calls) == 2
+    assert series_df["Date"].iloc[-1] == pd.Timestamp("2020-07-01")
+
+
+# Test that the cache is shared across calls through the file on disk and is
+# re-read when another process rewrites it
+def test_read_cache_memo(tmp_path):
+    cache_path = fred_cache.get_cache_path("PAYEMS", tmp_path)
+    assert fred_cache.read_cache(cache_path, "PAYEMS").empty
+    fred_cache.write_cache(bundled_df.iloc[:10], cache_path)
+    cache_df = fred_cache.read_cache(cache_path, "PAYEMS")
+    assert fred_cache.read_cache(cache_path, "PAYEMS") is cache_df
+    bundled_df.iloc[:12].to_csv(cache_path, index=False)
+    assert len(fred_cache.read_cache(cache_path, "PAYEMS")) == 12
@@ -0,0 +1,147 @@
+"""
+Tests of fred_client.py module
+
+The requests go to a local HTTP stand-in for FRED that serves the bundled
+PAYEMS data, so these tests run offline.
+"""
+
+import hashlib
+import http.server
+import os
+import threading
+import datetime as dt
+import pandas as pd
+import pytest
+import requests
+from usempl_npp import fred_cache
+from usempl_npp import fred_client
+
+
+# Bundled PAYEMS series as FRED serves it in fredgraph.csv
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+bundled_df = pd.read_csv(
+    os.path.join(
+        cur_path, "..", "usempl_npp", "data", "usempl_2023-07-01.csv"
+    ),
+    parse_dates=["Date"],
+)
+bundled_df = bundled_df[bundled_df["Date"] >= "1939-01-01"]
+fred_body = bundled_df.rename(columns={"Date": "observation_date"}).to_csv(
+    index=False, date_format="%Y-%m-%d"
+)
+
+
+# Stand-in for the FRED CSV download that honors the ETag validator, can
+# fail the next requests with 503, and records every response
+class StubFredHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = fred_body.encode("utf-8")
+    num_fail = 0
+    responses = []
+
+    def do_GET(self):
+        cls = StubFredHandler
+        etag = '"' + hashlib.sha256(cls.body).hexdigest()[:16] + '"'
+        if cls.num_fail > 0:
+            cls.num_fail -= 1
+            status, body = 503, b""
+        elif self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        else:
+            status, body = 200, cls.body
+        cls.responses.append((status, len(body), self.client_address[1]))
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Fri, 07 Jul 2023 12:30:00 GMT")
+        self.send_header("Retry-After", "0")
+        if status != 304:
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fred_url():
+    StubFredHandler.body = fred_body.encode("utf-8")
+    StubFredHandler.num_fail = 0
+    StubFredHandler.responses = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubFredHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:" + str(server.server_port) + "/fredgraph.csv"
+    server.shutdown()
+    server.server_close()
+
+
+# Test that a repeated download sends the validators, transfers nothing on a
+# 304, reuses the pooled connection, and downloads again after a change
+def test_fetch_fred_csv_conditional(fred_url):
+    series_df, validators, num_bytes = fred_client.fetch_fred_csv(
+        "PAYEMS", fred_url=fred_url
+    )
+    assert num_bytes == len(fred_body)
+    assert series_df["Date"].iloc[0] == pd.Timestamp("1939-01-01")
+    assert series_df["PAYEMS"].iloc[-1] == bundled_df["PAYEMS"].iloc[-1]
+    assert validators["etag"].startswith('"')
+
+    series_df2, validators2, num_bytes = fred_client.fetch_fred_csv(
+        "PAYEMS", validators, fred_url
+    )
+    assert series_df2 is None and num_bytes == 0
+    assert validators2 == validators
+    assert [resp[:2] for resp in StubFredHandler.responses] == [
+        (200, len(fred_body)),
+        (304, 0),
+    ]
+    # Both requests went over the same pooled connection
+    assert StubFredHandler.responses[0][2] == StubFredHandler.responses[1][2]
+
+    StubFredHandler.body = fred_body.encode("utf-8") + b"2023-08-01,157000\n"
+    series_df3, validators3, _ = fred_client.fetch_fred_csv(
+        "PAYEMS", validators, fred_url
+    )
+    assert series_df3["Date"].iloc[-1] == pd.Timestamp("2023-08-01")
+    assert validators3["etag"] != validators["etag"]
+
+
+# Test that failed requests are retried
+def test_fetch_fred_csv_retry(fred_url):
+    StubFredHandler.num_fail = 2
+    session = fred_client.get_session(backoff_factor=0.01)
+    series_df, _, _ = fred_client.fetch_fred_csv(
+        "PAYEMS", fred_url=fred_url, session=session
+    )
+    assert len(series_df) == len(bundled_df)
+    assert [resp[0] for resp in StubFredHandler.responses] == [503, 503, 200]
+
+    StubFredHandler.num_fail = 5
+    with pytest.raises(requests.HTTPError):
+        fred_client.fetch_fred_csv(
+            "PAYEMS", fred_url=fred_url, session=session
+        )
+
+
+# Test that the FRED cache neither parses nor rewrites an unchanged series
+def test_get_fred_series_not_modified(fred_url, tmp_path):
+    end_date = dt.datetime(2023, 8, 15)
+    series_df = fred_cache.get_fred_series(
+        "PAYEMS", end_date=end_date, cache_dir=tmp_path, fred_url=fred_url
+    )
+    cache_path = os.path.join(tmp_path, "PAYEMS.csv")
+    cache_mtime = os.stat(cache_path).st_mtime_ns
+    assert os.access(os.path.join(tmp_path, "PAYEMS.json"), os.F_OK)
+
+    # The cache ends before end_date, so FRED is asked again, conditionally
+    series_df2 = fred_cache.get_fred_series(
+        "PAYEMS", end_date=end_date, cache_dir=tmp_path, fred_url=fred_url
+    )
+    assert series_df2.equals(series_df)
+    assert os.stat(cache_path).st_mtime_ns == cache_mtime
+    assert [resp[:2] for resp in StubFredHandler.responses] == [
+        (200, len(fred_body)),
+        (304, 0),
+    ]
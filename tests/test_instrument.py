@@ -0,0 +1,122 @@
+"""
+Tests of instrument.py module
+"""
+
+import contextvars
+import json
+import os
+import threading
+import pytest
+from usempl_npp import instrument
+from usempl_npp import pipeline
+from usempl_npp import usempl_data
+
+
+# Test that the stages are recorded in nested reports and passed to the
+# callbacks, and that the profile and memory peaks are added on request
+def test_record_stages():
+    stage_recs = []
+    instrument.add_stage_callback(stage_recs.append)
+    try:
+        with instrument.record_stages(
+            profile=True, trace_memory=True, profile_lines=5
+        ) as report:
+            with instrument.stage("outer", rows=3) as stage_rec:
+                with instrument.record_stages() as inner_report:
+                    with instrument.stage("inner") as inner_rec:
+                        inner_rec["bytes"] = 10
+                stage_rec["bytes"] = 20
+    finally:
+        instrument.remove_stage_callback(stage_recs.append)
+    with instrument.stage("unrecorded"):
+        pass
+
+    assert [rec["name"] for rec in report["stages"]] == ["inner", "outer"]
+    assert [rec["name"] for rec in inner_report["stages"]] == ["inner"]
+    assert stage_recs == report["stages"]
+    outer_rec = report["stages"][1]
+    assert (outer_rec["rows"], outer_rec["bytes"]) == (3, 20)
+    assert outer_rec["secs"] >= report["stages"][0]["secs"]
+    assert report["total_secs"] >= outer_rec["secs"]
+    assert "peak_mb" in outer_rec and "peak_mb" not in inner_report
+    assert len(report["profile"]) == 5
+    assert "_start_time" not in report
+
+
+# Test that a stage of another thread is not recorded in the report or
+# passed to the callbacks of this thread, unless the thread runs in a copy of
+# this context
+def test_record_stages_threads():
+    stage_recs = []
+
+    def run_stage(name):
+        with instrument.stage(name):
+            pass
+
+    instrument.add_stage_callback(stage_recs.append)
+    try:
+        with instrument.record_stages() as report:
+            thread = threading.Thread(target=run_stage, args=("other",))
+            thread.start()
+            thread.join()
+            thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(run_stage, "copied"),
+            )
+            thread.start()
+            thread.join()
+            run_stage("own")
+    finally:
+        instrument.remove_stage_callback(stage_recs.append)
+    assert [rec["name"] for rec in report["stages"]] == ["copied", "own"]
+    assert stage_recs == report["stages"]
+
+
+# Test that the data stages of an offline run are recorded
+def test_get_usempl_data_stages():
+    with instrument.record_stages() as report:
+        usempl_data.get_usempl_data(
+            end_date_str="2023-07-01",
+            download_from_internet=False,
+            output_format="long",
+            verbose=False,
+        )
+    assert [rec["name"] for rec in report["stages"]] == [
+        "binary_read",
+        "long_convert",
+    ]
+    assert report["stages"][0]["rows"] == 184
+
+
+# Test that the pipeline saves a JSON report of the stages that ran
+@pytest.mark.parametrize("profile", [False, True])
+def test_pipeline_report(tmp_path, profile):
+    report_path = os.path.join(tmp_path, "report.json")
+    argv = [
+        "render",
+        "--end-date",
+        "2023-07-01",
+        "--offline",
+        "--pipeline-dir",
+        os.path.join(tmp_path, "pipeline"),
+        "--image-dir",
+        os.path.join(tmp_path, "images"),
+        "--report",
+        report_path,
+    ]
+    if profile:
+        argv.append("--profile")
+    html_path = pipeline.main(argv)
+    with open(report_path, "r", encoding="utf-8") as report_file:
+        report = json.load(report_file)
+    stage_recs = {rec["name"]: rec for rec in report["stages"]}
+    assert list(stage_recs) == [
+        "series_csv_read",
+        "alignment",
+        "pk_npy_write",
+        "figure_build",
+        "html_write",
+    ]
+    assert stage_recs["alignment"]["num_rec"] == 15
+    assert stage_recs["html_write"]["bytes"] == os.path.getsize(html_path)
+    assert ("profile" in report) == profile
@@ -0,0 +1,118 @@
+"""
+Tests of multi_series.py module
+
+Fixture CSV files derived from the bundled PAYEMS data are written to a
+temporary directory and used in place of FRED.
+"""
+
+import os
+import pandas as pd
+import pytest
+from usempl_npp import instrument
+from usempl_npp import multi_series
+from usempl_npp import usempl_npp_bokeh as usempl
+
+
+# Write fixture series PAYEMS, MANEMP (scaled PAYEMS), and UNRATE (an
+# inverted PAYEMS that starts in 1948) to a temporary data directory
+@pytest.fixture
+def fixture_dir(tmp_path):
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    usempl_df = pd.read_csv(
+        os.path.join(
+            cur_path, "..", "usempl_npp", "data", "usempl_2023-07-01.csv"
+        ),
+        parse_dates=["Date"],
+    )
+    usempl_df = usempl_df[usempl_df["Date"] >= "1939-01-01"]
+    usempl_df.to_csv(os.path.join(tmp_path, "PAYEMS.csv"), index=False)
+    manemp_df = usempl_df.assign(PAYEMS=usempl_df["PAYEMS"] * 0.1)
+    manemp_df.to_csv(os.path.join(tmp_path, "MANEMP.csv"), index=False)
+    unrate_df = usempl_df[usempl_df["Date"] >= "1948-01-01"]
+    unrate_df = unrate_df.assign(PAYEMS=1e6 / unrate_df["PAYEMS"])
+    unrate_df.to_csv(os.path.join(tmp_path, "UNRATE.csv"), index=False)
+    return str(tmp_path)
+
+
+# Test that the process pool gives one panel per series that matches the
+# serial results and the single-series alignment engine
+def test_get_multi_series_panels(fixture_dir):
+    series_id_lst = ["PAYEMS", "MANEMP", "UNRATE"]
+    results, total_secs, throughput = multi_series.get_multi_series_panels(
+        series_id_lst,
+        end_date_str="2023-07-01",
+        data_dir=fixture_dir,
+        max_workers=2,
+    )
+    assert list(results.keys()) == series_id_lst
+    assert total_secs > 0
+    assert throughput > 0
+    with instrument.record_stages() as report:
+        results_serial, _, _ = multi_series.get_multi_series_panels(
+            series_id_lst,
+            end_date_str="2023-07-01",
+            data_dir=fixture_dir,
+            max_workers=1,
+        )
+    multi_rec = report["stages"][-1]
+    assert (multi_rec["name"], multi_rec["rows"]) == ("multi_series", 3)
+    assert list(multi_rec["series_secs"].keys()) == series_id_lst
+    for series_id in series_id_lst:
+        pd.testing.assert_frame_equal(
+            results[series_id][0], results_serial[series_id][0]
+        )
+        assert results[series_id][3] > 0
+
+    # PAYEMS panel matches the alignment engine with the registry windows
+    payems_pk_long, peak_vals, peak_dates, _ = results["PAYEMS"]
+    rec_df = usempl.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    usempl_df = multi_series.load_series("PAYEMS", data_dir=fixture_dir)
+    peak_idx = usempl.get_peak_indices(usempl_df, maxdate_rng_lst[2:])
+    usempl_pk_long = usempl.align_peaks_long(
+        usempl_df, peak_idx, 135, 48, rec_df["rec_label_yr"].tolist()[2:]
+    )
+    pd.testing.assert_frame_equal(
+        payems_pk_long.rename(columns={"dv_pk": "usempl_dv_pk"}),
+        usempl_pk_long,
+    )
+    assert peak_dates[-1] == "2020-02-01"
+    assert peak_vals[-1] == 152371
+
+    # Scaled series has the same normalized values, and recessions before the
+    # start of UNRATE are left out
+    pd.testing.assert_series_equal(
+        results["MANEMP"][0]["dv_pk"], payems_pk_long["dv_pk"], rtol=1e-6
+    )
+    assert list(results["UNRATE"][0]["recession_id"].cat.categories) == (
+        rec_df["rec_label_yr"].tolist()[3:]
+    )
+
+
+# Test that a quarterly series is aligned on quarters from peak
+def test_align_series_panel_freq(fixture_dir):
+    usempl_df = multi_series.load_series("PAYEMS", data_dir=fixture_dir)
+    qtr_df = usempl_df[usempl_df["Date"].dt.month % 3 == 1]
+    qtr_df = qtr_df.reset_index(drop=True)
+    rec_df = usempl.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    qtr_pk_long, peak_vals, peak_dates = multi_series.align_series_panel(
+        qtr_df,
+        "PAYEMS",
+        maxdate_rng_lst,
+        rec_df["rec_label_yr"].tolist(),
+        frwd_mths_max=45,
+        bkwd_mths_max=16,
+        freq="Q",
+    )
+    assert "pers_frm_peak" in qtr_pk_long.columns
+    assert qtr_pk_long["pers_frm_peak"].min() == -16
+    assert qtr_pk_long["pers_frm_peak"].max() == 45
+    peak_rows = qtr_pk_long[qtr_pk_long["pers_frm_peak"] == 0]
+    assert peak_rows["Date"].dt.strftime("%Y-%m-%d").tolist() == peak_dates
+    assert (peak_rows["dv_pk"] == 1.0).all()
+    assert peak_rows["PAYEMS"].tolist() == peak_vals
@@ -0,0 +1,179 @@
+"""
+Tests of pipeline.py module
+"""
+
+import os
+import pandas as pd
+from usempl_npp import instrument
+from usempl_npp import pipeline
+from usempl_npp import usempl_data
+
+
+# Test that each stage runs only when its inputs or parameters change
+def test_pipeline_skips_unchanged_stages(tmp_path):
+    pipeline_dir = os.path.join(tmp_path, "pipeline")
+    image_dir = os.path.join(tmp_path, "images")
+    render_args = {
+        "end_date_str": "2023-07-01",
+        "download_from_internet": False,
+        "pipeline_dir": pipeline_dir,
+        "image_dir": image_dir,
+    }
+    html_path, stage_ran = pipeline.run_render(**render_args)
+    assert stage_ran
+    assert html_path == os.path.join(image_dir, "usempl_npp_2023-07-01.html")
+    pk_path = os.path.join(pipeline_dir, "usempl_pk.npy")
+    pk_mtime = os.stat(pk_path).st_mtime_ns
+    html_mtime = os.stat(html_path).st_mtime_ns
+
+    # Nothing changed: no stage does any work
+    _, stage_ran = pipeline.run_render(**render_args)
+    assert not stage_ran
+    assert os.stat(pk_path).st_mtime_ns == pk_mtime
+    assert os.stat(html_path).st_mtime_ns == html_mtime
+
+    # New main window: only the render stage runs
+    _, stage_ran = pipeline.run_render(bkwd_mths_main=7, **render_args)
+    assert stage_ran
+    assert os.stat(pk_path).st_mtime_ns == pk_mtime
+
+    # New months from peak: the align and render stages run
+    pk_path, stage_ran = pipeline.run_align(
+        96, 12, "2023-07-01", False, pipeline_dir=pipeline_dir
+    )
+    assert stage_ran
+    _, stage_ran = pipeline.run_render(
+        frwd_mths_max=96, bkwd_mths_max=12, **render_args
+    )
+    assert stage_ran
+
+    # A deleted output file is rebuilt
+    os.remove(pk_path)
+    _, stage_ran = pipeline.run_align(
+        96, 12, "2023-07-01", False, pipeline_dir=pipeline_dir
+    )
+    assert stage_ran
+
+
+# Test that a later requested end date with no new data, as requested by a
+# daily run with 'today', does not render the plot again
+def test_pipeline_render_end_date(tmp_path):
+    render_args = {
+        "download_from_internet": False,
+        "pipeline_dir": os.path.join(tmp_path, "pipeline"),
+        "image_dir": os.path.join(tmp_path, "images"),
+    }
+    html_path, stage_ran = pipeline.run_render(
+        end_date_str="2023-07-10", **render_args
+    )
+    assert stage_ran
+    assert html_path.endswith("usempl_npp_2023-07-01.html")
+    html_mtime = os.stat(html_path).st_mtime_ns
+    html_path2, stage_ran = pipeline.run_render(
+        end_date_str="2023-07-20", **render_args
+    )
+    assert not stage_ran
+    assert html_path2 == html_path
+    assert os.stat(html_path).st_mtime_ns == html_mtime
+
+
+# Test the command line interface
+def test_pipeline_main(tmp_path):
+    pipeline_dir = os.path.join(tmp_path, "pipeline")
+    series_path = pipeline.main(
+        [
+            "fetch",
+            "--end-date",
+            "2023-07-01",
+            "--offline",
+            "--pipeline-dir",
+            pipeline_dir,
+        ]
+    )
+    assert series_path == os.path.join(pipeline_dir, "usempl.csv")
+    html_path = pipeline.main(
+        [
+            "render",
+            "--end-date",
+            "2023-07-01",
+            "--offline",
+            "--pipeline-dir",
+            pipeline_dir,
+            "--image-dir",
+            os.path.join(tmp_path, "images"),
+            "--render-mode",
+            "compact",
+        ]
+    )
+    assert os.path.getsize(html_path) < 60000
+    state = pipeline.read_state(
+        os.path.join(pipeline_dir, "pipeline_state.json")
+    )
+    assert sorted(state) == ["align", "fetch", "render"]
+
+
+# Test that a new month and a revision patch the saved normalized peak series
+# to the same result as a full alignment
+def test_pipeline_align_update(tmp_path):
+    pipeline_dir = os.path.join(tmp_path, "pipeline")
+    pk_path, _ = pipeline.run_align(
+        end_date_str="2023-07-01",
+        download_from_internet=False,
+        pipeline_dir=pipeline_dir,
+    )
+    series_path = os.path.join(pipeline_dir, "usempl.csv")
+    usempl_df = pd.read_csv(series_path, parse_dates=["Date"])
+    usempl_df.loc[usempl_df.index[-2], "PAYEMS"] += 40
+    usempl_df.loc[len(usempl_df)] = [pd.Timestamp("2023-08-01"), 156500.0]
+    usempl_df.to_csv(series_path, index=False, date_format="%Y-%m-%d")
+
+    with instrument.record_stages() as report:
+        _, stage_ran = pipeline.run_align(
+            end_date_str="2023-07-01",
+            download_from_internet=False,
+            pipeline_dir=pipeline_dir,
+        )
+    assert stage_ran
+    stage_recs = {rec["name"]: rec for rec in report["stages"]}
+    assert "alignment" not in stage_recs
+    update_rec = stage_recs["alignment_update"]
+    assert (update_rec["rows"], update_rec["num_rec"]) == (2, 1)
+
+    rec_df = usempl_data.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    usempl_pk, _, _ = usempl_data.align_peaks(
+        usempl_df,
+        usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst),
+        135,
+        48,
+    )
+    assert usempl_data.read_usempl_pk(pk_path).equals(usempl_pk)
+
+
+# Test that a saved series whose months cannot be patched is aligned again
+# in full, and that the report shows the failed update and the alignment
+def test_pipeline_align_update_fallback(tmp_path):
+    pipeline_dir = os.path.join(tmp_path, "pipeline")
+    pk_path, _ = pipeline.run_align(
+        end_date_str="2023-07-01",
+        download_from_internet=False,
+        pipeline_dir=pipeline_dir,
+    )
+    series_path = os.path.join(pipeline_dir, "usempl.csv")
+    usempl_df = pd.read_csv(series_path, parse_dates=["Date"])
+    usempl_df = usempl_df.drop(index=len(usempl_df) - 5)
+    usempl_df.to_csv(series_path, index=False, date_format="%Y-%m-%d")
+
+    with instrument.record_stages() as report:
+        _, stage_ran = pipeline.run_align(
+            end_date_str="2023-07-01",
+            download_from_internet=False,
+            pipeline_dir=pipeline_dir,
+        )
+    assert stage_ran
+    stage_recs = {rec["name"]: rec for rec in report["stages"]}
+    assert stage_recs["alignment_update"]["error"]
+    assert stage_recs["alignment_update"]["rows"] is None
+    assert stage_recs["alignment"]["num_rec"] == 15
@@ -0,0 +1,181 @@
+"""
+Tests of service.py module
+"""
+
+import http.server
+import threading
+import pandas as pd
+import pytest
+import requests
+from usempl_npp import instrument
+from usempl_npp import service as usempl_service
+
+panel_2023 = usempl_service.load_panel(
+    end_date_str="2023-07-01", download_from_internet=False
+)
+
+
+@pytest.fixture
+def plot_service():
+    service = usempl_service.make_service(lambda: panel_2023)
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), usempl_service.make_request_handler(service)
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, "http://127.0.0.1:" + str(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+# Test that a plot is rendered once and then served from the cache, and that
+# the metrics count the hits and misses
+def test_plot_service_cache(plot_service):
+    service, base_url = plot_service
+    plot_url = base_url + "/plot?frwd_mths_main=24&render_mode=compact"
+    resp = requests.get(plot_url)
+    assert resp.status_code == 200
+    assert resp.headers["X-Cache"] == "miss"
+    assert resp.headers["X-Data-Version"] == panel_2023["data_version"]
+    assert "<html" in resp.text
+    resp2 = requests.get(plot_url)
+    assert resp2.headers["X-Cache"] == "hit"
+    assert resp2.content == resp.content
+
+    metrics = requests.get(base_url + "/metrics").json()
+    assert (metrics["hits"], metrics["misses"]) == (1, 1)
+    assert metrics["hit_ratio"] == 0.5
+    assert metrics["entries"] == 1
+    assert metrics["cache_bytes"] == len(resp.content)
+    assert metrics["end_date"] == "2023-07-01"
+
+    for bad_query in [
+        "frwd_mths_main=x",
+        "frwd_mths_main=500",
+        "bkwd_mths_main=-1",
+        "render_mode=svg",
+    ]:
+        assert requests.get(base_url + "/plot?" + bad_query).status_code == 400
+    assert requests.get(base_url + "/nothing").status_code == 404
+
+
+# Test that the least recently used plot is evicted when the cache is full
+def test_plot_service_eviction():
+    service = usempl_service.make_service(lambda: panel_2023)
+    html_bytes, _, _ = usempl_service.get_plot_html(service, 24, 5, "compact")
+    service["max_cache_bytes"] = int(2.5 * len(html_bytes))
+    usempl_service.get_plot_html(service, 30, 5, "compact")
+    assert usempl_service.get_plot_html(service, 24, 5, "compact")[2]
+    usempl_service.get_plot_html(service, 36, 5, "compact")
+    cached_mths = [cache_key[1] for cache_key in service["cache"]]
+    assert cached_mths == [24, 36]
+    metrics = usempl_service.get_metrics(service)
+    assert metrics["evictions"] == 1
+    assert metrics["cache_bytes"] <= service["max_cache_bytes"]
+
+
+# Test that a refresh with new data drops the cached plots of the old data,
+# and that a failed refresh keeps the current data
+def test_plot_service_refresh():
+    panel_lst = [panel_2023]
+
+    def panel_loader():
+        if panel_lst[-1] is None:
+            raise requests.ConnectionError("FRED is unreachable")
+        return panel_lst[-1]
+
+    service = usempl_service.make_service(panel_loader)
+    usempl_service.get_plot_html(service, 24, 5, "compact")
+    assert not usempl_service.refresh_panel(service)
+    assert len(service["cache"]) == 1
+
+    usempl_pk_long = panel_2023["usempl_pk_long"].copy()
+    usempl_pk_long.loc[usempl_pk_long.index[-1], "PAYEMS"] += 100
+    panel_lst.append(
+        dict(
+            panel_2023,
+            usempl_pk_long=usempl_pk_long,
+            data_version=usempl_service.get_data_version(
+                usempl_pk_long, "2023-07-01"
+            ),
+        )
+    )
+    assert usempl_service.refresh_panel(service)
+    assert len(service["cache"]) == 0
+    _, data_version, cache_hit = usempl_service.get_plot_html(
+        service, 24, 5, "compact"
+    )
+    assert data_version == panel_lst[-1]["data_version"]
+    assert not cache_hit
+
+    panel_lst.append(None)
+    with instrument.record_stages() as report:
+        assert not usempl_service.refresh_panel(service)
+    assert report["stages"][-1]["name"] == "panel_refresh"
+    assert "FRED is unreachable" in report["stages"][-1]["error"]
+    metrics = usempl_service.get_metrics(service)
+    assert (metrics["refreshes"], metrics["refresh_errors"]) == (2, 1)
+    assert metrics["data_updates"] == 1
+    assert metrics["data_version"] == panel_lst[1]["data_version"]
+
+
+# Test that a service process that attaches to the shared panel file serves
+# the same series as the process that wrote it, and plots from the mapping
+def test_plot_service_shared_panel(tmp_path):
+    panel_path = str(tmp_path / "panel.bin")
+    panel_pub = usempl_service.load_panel(
+        end_date_str="2023-07-01",
+        download_from_internet=False,
+        panel_path=panel_path,
+    )
+    panel_att = usempl_service.load_panel(
+        end_date_str="2023-07-01", panel_path=panel_path, publish_panel=False
+    )
+    for panel in [panel_pub, panel_att]:
+        assert panel["data_version"] == panel_2023["data_version"]
+        assert panel["end_date"] == panel_2023["end_date"]
+        assert panel["rec_label_yrmth_lst"] == (
+            panel_2023["rec_label_yrmth_lst"]
+        )
+        pd.testing.assert_frame_equal(
+            panel["usempl_pk_long"], panel_2023["usempl_pk_long"]
+        )
+        assert not panel["usempl_pk_long"]["PAYEMS"].to_numpy().flags.writeable
+    service = usempl_service.make_service(lambda: panel_att)
+    html_bytes, data_version, _ = usempl_service.get_plot_html(
+        service, 24, 5, "compact"
+    )
+    assert data_version == panel_2023["data_version"]
+    assert b"<html" in html_bytes
+
+    with pytest.raises(ValueError):
+        usempl_service.load_panel(
+            frwd_mths_max=100, panel_path=panel_path, publish_panel=False
+        )
+
+
+# Test that a downsampled plot points its zoom callback at the /detail path,
+# which serves every point of the current data version
+def test_plot_service_detail(plot_service):
+    service, base_url = plot_service
+    resp = requests.get(base_url + "/plot?render_mode=compact&max_points=100")
+    assert resp.status_code == 200
+    data_version = panel_2023["data_version"]
+    assert "detail?data_version=" + data_version in resp.text
+    assert list(service["cache"])[0][-1] == 100
+    assert requests.get(base_url + "/plot?max_points=3").status_code == 400
+
+    resp = requests.get(
+        base_url + "/detail",
+        params={"data_version": data_version, "render_mode": "compact"},
+    )
+    assert resp.status_code == 200
+    detail_data = resp.json()
+    assert list(detail_data.keys()) == ["mths_frm_peak", "usempl_dv_pk"]
+    assert sum(len(mths) for mths in detail_data["mths_frm_peak"]) == len(
+        panel_2023["usempl_pk_long"]
+    )
+    resp = requests.get(
+        base_url + "/detail", params={"data_version": "0" * 12}
+    )
+    assert resp.status_code == 410
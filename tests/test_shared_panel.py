@@ -0,0 +1,62 @@
+"""
+Tests of shared_panel.py module
+"""
+
+import mmap
+import pandas as pd
+from usempl_npp import shared_panel
+from usempl_npp import usempl_data
+
+(
+    usempl_pk_long,
+    end_date_str,
+    peak_vals,
+    peak_dates,
+    _,
+    rec_label_yrmth_lst,
+    _,
+    _,
+) = usempl_data.get_usempl_data(
+    end_date_str="2023-07-01",
+    download_from_internet=False,
+    output_format="long",
+    verbose=False,
+)
+
+
+# Test that the attached panel equals the written one with every column a
+# read-only view of the mapped file, that an unchanged file is not mapped
+# again, and that a replaced file leaves the earlier mapping intact
+def test_shared_panel(tmp_path):
+    panel_path = str(tmp_path / "panel.bin")
+    panel_meta = {
+        "rec_label_yrmth_lst": rec_label_yrmth_lst,
+        "peak_vals": [float(peak_val) for peak_val in peak_vals],
+        "peak_dates": peak_dates,
+        "end_date_str": end_date_str,
+    }
+    num_bytes = shared_panel.write_shared_panel(
+        usempl_pk_long, panel_meta, panel_path
+    )
+    assert num_bytes < 1.2 * usempl_pk_long.memory_usage(deep=True).sum()
+    panel_pk_long, panel_meta2 = shared_panel.attach_shared_panel(panel_path)
+    pd.testing.assert_frame_equal(panel_pk_long, usempl_pk_long)
+    assert panel_meta2 == panel_meta
+    for col in panel_pk_long.columns:
+        if col == "recession_id":
+            col_arr = panel_pk_long[col].cat.codes.to_numpy()
+        else:
+            col_arr = panel_pk_long[col].to_numpy()
+        assert not col_arr.flags.writeable
+        assert col_arr.ctypes.data % shared_panel.PANEL_ALIGN == 0
+        while getattr(col_arr, "base", None) is not None:
+            col_arr = col_arr.base
+        assert isinstance(col_arr, mmap.mmap)
+    assert shared_panel.attach_shared_panel(panel_path)[0] is panel_pk_long
+
+    usempl_pk_long2 = usempl_pk_long.iloc[:-1]
+    shared_panel.write_shared_panel(usempl_pk_long2, {}, panel_path)
+    panel_pk_long2, panel_meta2 = shared_panel.attach_shared_panel(panel_path)
+    pd.testing.assert_frame_equal(panel_pk_long2, usempl_pk_long2)
+    assert panel_meta2 == {}
+    pd.testing.assert_frame_equal(panel_pk_long, usempl_pk_long)
@@ -0,0 +1,69 @@
+"""
+Tests of static_image.py module
+
+The images are rendered from the bundled PAYEMS data into a temporary
+directory.
+"""
+
+import datetime as dt
+import os
+import matplotlib.image
+import pytest
+from usempl_npp import static_image
+from usempl_npp import usempl_data
+
+
+# Test that the full-size PNG and the thumbnail have the requested pixel
+# sizes, and that the SVG file is the same on every render
+def test_usempl_npp_image(tmp_path):
+    png_path, end_date_str = static_image.usempl_npp_image(
+        usempl_end_date="2023-07-01",
+        download_from_internet=False,
+        image_dir=str(tmp_path),
+        verbose=False,
+    )
+    assert end_date_str == "2023-07-01"
+    assert os.path.basename(png_path) == "usempl_npp_2023-07-01.png"
+    assert matplotlib.image.imread(png_path).shape == (500, 800, 4)
+
+    thumb_path, _ = static_image.usempl_npp_image(
+        usempl_end_date="2023-07-01",
+        download_from_internet=False,
+        thumbnail=True,
+        image_dir=os.path.join(tmp_path, "thumbs"),
+        verbose=False,
+    )
+    assert matplotlib.image.imread(thumb_path).shape == (250, 400, 4)
+
+    svg_lst = []
+    for _ in range(2):
+        svg_path, _ = static_image.usempl_npp_image(
+            usempl_end_date="2023-07-01",
+            download_from_internet=False,
+            image_format="svg",
+            image_dir=str(tmp_path),
+            verbose=False,
+        )
+        with open(svg_path, "r", encoding="utf-8") as svg_file:
+            svg_lst.append(svg_file.read())
+    assert svg_lst[0] == svg_lst[1]
+    assert "Feb 2020 - Apr 2020" in svg_lst[0]
+    assert "updated July 1, 2023." in svg_lst[0]
+
+
+# Test the legend entries and axis ranges of the figure, and that an unknown
+# image format is rejected
+def test_create_usempl_image(tmp_path):
+    out = usempl_data.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long", verbose=False
+    )
+    fig = static_image.create_usempl_image(
+        out[0], out[5], dt.datetime(2023, 7, 1), 24, 6
+    )
+    ax = fig.axes[0]
+    assert [text.get_text() for text in ax.get_legend().get_texts()] == out[5]
+    assert ax.get_xlim() == pytest.approx((-9.0, 27.0))
+    assert ax.lines[0].get_color() == "blue"
+    assert ax.lines[-2].get_color() == "black"
+    with pytest.raises(ValueError):
+        static_image.save_usempl_image(fig, os.path.join(tmp_path, "a.jpg"))
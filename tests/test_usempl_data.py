@@ -0,0 +1,584 @@
+"""
+Tests of usempl_data.py module
+"""
+
+import pytest
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+from usempl_npp import instrument
+from usempl_npp import usempl_data
+
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+data_dir = os.path.join(cur_path, "..", "usempl_npp", "data")
+
+
+# Legacy sequential-merge construction of usempl_pk, kept here as the
+# reference that the vectorized align_peaks() engine must reproduce
+def legacy_usempl_pk(usempl_df, maxdate_rng_lst, frwd_mths_max, bkwd_mths_max):
+    usempl_pk = pd.DataFrame(
+        np.arange(-bkwd_mths_max, frwd_mths_max + 1, dtype=int),
+        columns=["mths_frm_peak"],
+    )
+    usempl_pk_long = usempl_df.copy()
+    for i, maxdate_rng in enumerate(maxdate_rng_lst):
+        in_rng = (usempl_df["Date"] >= maxdate_rng[0]) & (
+            usempl_df["Date"] <= maxdate_rng[1]
+        )
+        peak_val = usempl_df["PAYEMS"][in_rng].max()
+        usempl_pk_long[f"usempl_dv_pk{i}"] = (
+            usempl_pk_long["PAYEMS"] / peak_val
+        )
+        peak_date = usempl_df["Date"][
+            in_rng & (usempl_df["PAYEMS"] == peak_val)
+        ].max()
+        usempl_pk_long[f"mths_frm_pk{i}"] = (
+            usempl_pk_long["Date"].dt.year - peak_date.year
+        ) * 12 + (usempl_pk_long["Date"].dt.month - peak_date.month)
+        usempl_pk = pd.merge(
+            usempl_pk,
+            usempl_pk_long[
+                [f"mths_frm_pk{i}", "Date", "PAYEMS", f"usempl_dv_pk{i}"]
+            ],
+            left_on="mths_frm_peak",
+            right_on=f"mths_frm_pk{i}",
+            how="left",
+        )
+        usempl_pk.drop(columns=[f"mths_frm_pk{i}"], inplace=True)
+        usempl_pk.rename(
+            columns={"Date": f"Date{i}", "PAYEMS": f"PAYEMS{i}"}, inplace=True
+        )
+
+    return usempl_pk
+
+
+# Bundled monthly PAYEMS series, read the same way as the offline path of
+# get_usempl_data()
+def read_bundled_usempl():
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    data_file_path = os.path.join(
+        cur_path, "..", "usempl_npp", "data", "usempl_2023-07-01.csv"
+    )
+    usempl_df = pd.read_csv(
+        data_file_path,
+        names=["Date", "PAYEMS"],
+        parse_dates=["Date"],
+        skiprows=1,
+        na_values=[".", "na", "NaN"],
+    )
+    return usempl_df.dropna()
+
+
+# Synthetic monthly series with num_rec evenly spaced recession windows
+def synthetic_usempl(num_rec, mths_btw_rec=12, seed=25):
+    rng = np.random.default_rng(seed)
+    num_mths = (num_rec + 6) * mths_btw_rec
+    usempl_df = pd.DataFrame(
+        {
+            "Date": pd.date_range("1700-01-01", periods=num_mths, freq="MS"),
+            "PAYEMS": 1000.0 + rng.normal(0.0, 5.0, num_mths).cumsum(),
+        }
+    )
+    rng_beg = usempl_df["Date"].iloc[np.arange(3, num_rec + 3) * mths_btw_rec]
+    maxdate_rng_lst = [
+        (
+            beg.strftime("%Y-%m-%d"),
+            (beg + pd.DateOffset(months=2)).strftime("%Y-%m-%d"),
+        )
+        for beg in rng_beg
+    ]
+    return usempl_df, maxdate_rng_lst
+
+
+# Test that the vectorized align_peaks() engine reproduces the legacy
+# sequential-merge usempl_pk DataFrame, peak values, and peak dates
+@pytest.mark.parametrize("frwd_mths_max,bkwd_mths_max", [(135, 48), (12, 2)])
+def test_align_peaks_matches_legacy(frwd_mths_max, bkwd_mths_max):
+    usempl_df = read_bundled_usempl()
+    maxdate_rng_lst = [
+        ("1929-7-1", "1929-10-1"),
+        ("1937-7-1", "1937-7-1"),
+        ("1945-1-1", "1945-3-1"),
+        ("1948-9-1", "1949-1-1"),
+        ("1953-6-1", "1953-8-1"),
+        ("1957-7-1", "1957-9-1"),
+        ("1960-3-1", "1960-5-1"),
+        ("1969-11-1", "1970-3-1"),
+        ("1973-10-1", "1974-7-1"),
+        ("1979-12-1", "1980-3-1"),
+        ("1981-6-1", "1981-8-1"),
+        ("1990-6-1", "1991-8-1"),
+        ("2001-2-1", "2001-4-1"),
+        ("2007-11-1", "2008-1-1"),
+        ("2020-1-1", "2020-3-1"),
+    ]
+    peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+    usempl_pk, peak_vals, peak_dates = usempl_data.align_peaks(
+        usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+    )
+    usempl_pk_legacy = legacy_usempl_pk(
+        usempl_df, maxdate_rng_lst, frwd_mths_max, bkwd_mths_max
+    )
+    pd.testing.assert_frame_equal(
+        usempl_pk, usempl_pk_legacy, check_dtype=False
+    )
+    assert peak_vals[14] == 152371
+    assert peak_dates[13] == "2008-01-01"
+    assert peak_dates[14] == "2020-02-01"
+
+
+# Test that ties within a peak search window go to the latest date and that
+# an empty search window raises an error
+def test_get_peak_indices_ties_and_empty_window():
+    usempl_df = pd.DataFrame(
+        {
+            "Date": pd.date_range("2000-01-01", periods=6, freq="MS"),
+            "PAYEMS": [1.0, 3.0, np.nan, 3.0, 2.0, 1.0],
+        }
+    )
+    peak_idx = usempl_data.get_peak_indices(
+        usempl_df, [("2000-1-1", "2000-5-1"), ("2000-5-1", "2000-6-1")]
+    )
+    assert peak_idx.tolist() == [3, 4]
+    with pytest.raises(ValueError):
+        usempl_data.get_peak_indices(usempl_df, [("2001-1-1", "2001-3-1")])
+
+
+# Test that the vectorized alignment engine matches the legacy
+# sequential-merge construction as the number of event windows grows. The
+# run times are measured by benchmark.run_benchmarks()
+@pytest.mark.local
+@pytest.mark.parametrize("num_rec", [15, 60, 240, 480])
+def test_align_peaks_scaling(num_rec):
+    usempl_df, maxdate_rng_lst = synthetic_usempl(num_rec)
+    peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+    usempl_pk, _, _ = usempl_data.align_peaks(usempl_df, peak_idx, 135, 48)
+    usempl_pk_legacy = legacy_usempl_pk(usempl_df, maxdate_rng_lst, 135, 48)
+    pd.testing.assert_frame_equal(
+        usempl_pk, usempl_pk_legacy, check_dtype=False
+    )
+
+
+# Test that the binary columnar usempl_pk file round-trips values and dtypes
+@pytest.mark.parametrize("mmap", [True, False])
+def test_usempl_pk_binary_round_trip(tmp_path, mmap):
+    usempl_df = read_bundled_usempl()
+    peak_idx = usempl_data.get_peak_indices(
+        usempl_df, [("2020-1-1", "2020-3-1")]
+    )
+    usempl_pk, _, _ = usempl_data.align_peaks(usempl_df, peak_idx, 135, 48)
+    file_path = os.path.join(tmp_path, "usempl_pk_test.npy")
+    usempl_data.write_usempl_pk(usempl_pk, file_path)
+    usempl_pk2 = usempl_data.read_usempl_pk(file_path, mmap=mmap)
+    pd.testing.assert_frame_equal(usempl_pk2, usempl_pk)
+    assert usempl_pk2["Date0"].dtype == "datetime64[ns]"
+    assert usempl_pk2["Date0"].isna().sum() == usempl_pk["Date0"].isna().sum()
+
+
+# Test that the offline path loads the bundled binary usempl_pk file directly
+# and slices it to the requested months from peak
+def test_get_usempl_data_offline_binary():
+    (
+        usempl_pk,
+        end_date_str2,
+        peak_vals,
+        peak_dates,
+        _,
+        _,
+        _,
+        _,
+    ) = usempl_data.get_usempl_data(
+        frwd_mths_max=96,
+        bkwd_mths_max=12,
+        end_date_str="2023-07-01",
+        download_from_internet=False,
+    )
+    assert usempl_pk.shape == (109, 46)
+    assert usempl_pk["mths_frm_peak"].iloc[0] == -12
+    assert end_date_str2 == "2023-07-01"
+    assert peak_vals[14] == 152371
+    assert peak_dates[13] == "2008-01-01"
+
+
+# Test that the bundled binary usempl_pk file is smaller than the CSV file
+# and reads to the same DataFrame. The load times are measured by
+# benchmark.run_benchmarks()
+@pytest.mark.local
+def test_usempl_pk_binary_load():
+    csv_path = os.path.join(data_dir, "usempl_pk_2023-07-01.csv")
+    bin_path = os.path.join(data_dir, "usempl_pk_2023-07-01.npy")
+    usempl_pk_csv = pd.read_csv(
+        csv_path, parse_dates=[f"Date{i}" for i in range(15)]
+    )
+    usempl_pk_bin = usempl_data.read_usempl_pk(bin_path)
+    assert os.path.getsize(bin_path) < os.path.getsize(csv_path)
+    pd.testing.assert_frame_equal(usempl_pk_bin, usempl_pk_csv)
+
+
+# Test that the long normalized peak DataFrame has the right dtypes, matches
+# the wide DataFrame, and gives zero-copy per-recession views
+def test_align_peaks_long():
+    usempl_df, maxdate_rng_lst = synthetic_usempl(15)
+    peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+    usempl_pk, peak_vals, _ = usempl_data.align_peaks(
+        usempl_df, peak_idx, 135, 48
+    )
+    usempl_pk_long = usempl_data.align_peaks_long(usempl_df, peak_idx, 135, 48)
+    pd.testing.assert_frame_equal(
+        usempl_pk_long, usempl_data.usempl_pk_to_long(usempl_pk)
+    )
+    assert usempl_pk_long["recession_id"].dtype == "category"
+    assert usempl_pk_long["mths_frm_peak"].dtype == np.int16
+    assert usempl_pk_long["PAYEMS"].dtype == np.float32
+    assert usempl_pk_long["usempl_dv_pk"].dtype == np.float32
+    assert usempl_pk_long["usempl_dv_pk"].isna().sum() == 0
+
+    rec_groups = usempl_data.get_recession_groups(usempl_pk_long)
+    assert list(rec_groups.keys()) == [str(i) for i in range(15)]
+    for i, usempl_pk_rec in enumerate(rec_groups.values()):
+        usempl_pk_wide = usempl_pk[
+            ["mths_frm_peak", f"PAYEMS{i}", f"usempl_dv_pk{i}"]
+        ].dropna()
+        np.testing.assert_array_equal(
+            usempl_pk_rec["mths_frm_peak"], usempl_pk_wide["mths_frm_peak"]
+        )
+        np.testing.assert_allclose(
+            usempl_pk_rec["usempl_dv_pk"],
+            usempl_pk_wide[f"usempl_dv_pk{i}"],
+            rtol=1e-6,
+        )
+        assert np.shares_memory(
+            usempl_pk_rec["PAYEMS"].to_numpy(),
+            usempl_pk_long["PAYEMS"].to_numpy(),
+        )
+    assert (
+        usempl_pk_long[usempl_pk_long["mths_frm_peak"] == 0]["PAYEMS"]
+        == np.float32(peak_vals)
+    ).all()
+
+
+# Test that aligning on periods of other frequencies matches a loop over the
+# recessions that counts the periods between each date and the peak date
+@pytest.mark.parametrize(
+    "freq,date_freq", [("B", "B"), ("D", "D"), ("W-FRI", "W-FRI"), ("Q", "QS")]
+)
+def test_align_peaks_long_freq(freq, date_freq):
+    rng = np.random.default_rng(25)
+    dates = pd.date_range("1990-01-01", "2010-12-31", freq=date_freq)
+    usempl_df = pd.DataFrame(
+        {
+            "Date": dates,
+            "PAYEMS": 1000.0 + rng.normal(0.0, 5.0, len(dates)).cumsum(),
+        }
+    )
+    # Missing observations, e.g., holidays, are left out of the panel
+    usempl_df = usempl_df.iloc[np.sort(rng.permutation(len(dates))[:-20])]
+    usempl_df = usempl_df.reset_index(drop=True)
+    maxdate_rng_lst = [
+        ("1992-03-01", "1992-09-30"),
+        ("2001-01-01", "2001-06-30"),
+        ("2007-10-01", "2008-03-31"),
+    ]
+    peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+    frwd_max, bkwd_max = 40, 25
+    usempl_pk_long = usempl_data.align_peaks_long(
+        usempl_df,
+        peak_idx,
+        frwd_max,
+        bkwd_max,
+        freq=freq,
+        period_col="pers_frm_peak",
+    )
+
+    rec_lst = []
+    for i, peak_date in enumerate(usempl_df["Date"].iloc[peak_idx]):
+        if freq == "B":
+            pers_frm_peak = np.busday_count(
+                np.datetime64(peak_date.date()),
+                usempl_df["Date"].to_numpy(dtype="datetime64[D]"),
+            )
+        else:
+            pers_frm_peak = np.array(
+                [
+                    (date.to_period(freq) - peak_date.to_period(freq)).n
+                    for date in usempl_df["Date"]
+                ]
+            )
+        in_rec = (pers_frm_peak >= -bkwd_max) & (pers_frm_peak <= frwd_max)
+        rec_lst.append(
+            pd.DataFrame(
+                {
+                    "recession_id": str(i),
+                    "pers_frm_peak": pers_frm_peak[in_rec].astype(np.int16),
+                    "Date": usempl_df["Date"][in_rec],
+                    "PAYEMS": usempl_df["PAYEMS"][in_rec].astype(np.float32),
+                    "usempl_dv_pk": (
+                        usempl_df["PAYEMS"][in_rec]
+                        / usempl_df["PAYEMS"].iloc[peak_idx[i]]
+                    ).astype(np.float32),
+                }
+            )
+        )
+    usempl_pk_loop = pd.concat(rec_lst, ignore_index=True)
+    usempl_pk_loop["recession_id"] = usempl_pk_loop["recession_id"].astype(
+        pd.CategoricalDtype(["0", "1", "2"])
+    )
+    pd.testing.assert_frame_equal(usempl_pk_long, usempl_pk_loop)
+
+    # More than one observation per period, or a weekend date for business
+    # days, cannot be aligned
+    with pytest.raises(ValueError):
+        usempl_data.align_peaks_long(usempl_df, peak_idx, 12, 4, freq="A")
+    if freq == "D":
+        with pytest.raises(ValueError):
+            usempl_data.align_peaks_long(usempl_df, peak_idx, 12, 4, freq="B")
+
+
+# Test that the offline path returns the long DataFrame with the recession
+# labels as categories
+def test_get_usempl_data_long():
+    data_tuple = usempl_data.get_usempl_data(
+        end_date_str="2023-07-01",
+        download_from_internet=False,
+        output_format="long",
+    )
+    usempl_pk_long = data_tuple[0]
+    rec_label_yr_lst = data_tuple[4]
+    assert list(usempl_pk_long.columns) == [
+        "recession_id",
+        "mths_frm_peak",
+        "Date",
+        "PAYEMS",
+        "usempl_dv_pk",
+    ]
+    assert list(usempl_pk_long["recession_id"].cat.categories) == (
+        rec_label_yr_lst
+    )
+    with pytest.raises(ValueError):
+        usempl_data.get_usempl_data(
+            end_date_str="2023-07-01",
+            download_from_internet=False,
+            output_format="tall",
+        )
+
+
+# Test that the long DataFrame uses less memory than the wide DataFrame as
+# the number of event windows grows
+@pytest.mark.local
+@pytest.mark.parametrize("num_rec", [15, 240, 480])
+def test_align_peaks_long_memory(num_rec):
+    usempl_df, maxdate_rng_lst = synthetic_usempl(num_rec)
+    peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+    usempl_pk, _, _ = usempl_data.align_peaks(usempl_df, peak_idx, 135, 48)
+    usempl_pk_long = usempl_data.align_peaks_long(usempl_df, peak_idx, 135, 48)
+    wide_bytes = usempl_pk.memory_usage(deep=True).sum()
+    long_bytes = usempl_pk_long.memory_usage(deep=True).sum()
+    assert long_bytes < wide_bytes
+
+
+# Test that the bundled recession registry reproduces the recession labels
+# and peak search windows, and that a new recession only needs a new row
+def test_get_recession_registry(tmp_path):
+    rec_df = usempl_data.get_recession_registry()
+    assert len(rec_df) == 15
+    assert rec_df["rec_label_yr"].iloc[0] == "1929-1933"
+    assert rec_df["rec_label_yr"].iloc[2] == "1945"
+    assert rec_df["rec_label_yrmth"].iloc[13] == "Dec 2007 - Jun 2009"
+    assert rec_df["rec_beg_yrmth"].iloc[14] == "Feb 2020"
+    assert rec_df["peak_search_beg"].iloc[13] == pd.Timestamp("2007-11-01")
+    assert rec_df["peak_search_end"].iloc[13] == pd.Timestamp("2008-01-01")
+    assert rec_df["peak_search_end"].iloc[11] == pd.Timestamp("1991-08-01")
+
+    rec_file_path = os.path.join(tmp_path, "recessions.csv")
+    with open(rec_file_path, "w") as rec_file:
+        rec_file.write(
+            "peak,trough,peak_search_beg,peak_search_end\n"
+            + "2001-03-01,2001-11-01,,\n"
+            + "2023-03-01,,,\n"
+            + "2007-12-01,2009-06-01,,\n"
+        )
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+    assert rec_df["rec_label_yrmth"].tolist() == [
+        "Mar 2001 - Nov 2001",
+        "Dec 2007 - Jun 2009",
+        "Mar 2023 - present",
+    ]
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    peak_idx = usempl_data.get_peak_indices(
+        read_bundled_usempl(), maxdate_rng_lst
+    )
+    assert len(peak_idx) == 3
+
+
+# Test that the data module does not load the plotting and download libraries
+def test_usempl_data_import_is_light():
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    import_code = (
+        "import sys\n"
+        + "from usempl_npp import usempl_data\n"
+        + "print(sorted(set(('bokeh', 'pandas_datareader')) & set("
+        + "mod.split('.')[0] for mod in sys.modules)))"
+    )
+    import_out = subprocess.run(
+        [sys.executable, "-c", import_code],
+        cwd=os.path.join(cur_path, ".."),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert import_out.stdout.strip() == "[]"
+    assert usempl_data.get_usempl_data is usempl_data.get_usempl_data
+
+
+# Test that the 1919-1938 backcast passes through the annual data, is saved
+# once under a key of its inputs, and is recomputed when an input changes
+def test_get_usempl_backcast(tmp_path):
+    usempl_df = read_bundled_usempl()
+    anchor_vals = usempl_df["PAYEMS"][usempl_df["Date"] >= "1939-01-01"][:2]
+    usempl_data._backcast_memo.clear()
+    backcast_df = usempl_data.get_usempl_backcast(
+        anchor_vals, data_dir=tmp_path
+    )
+    assert len(backcast_df) == 240
+    assert backcast_df["Date"].iloc[-1] == pd.Timestamp("1938-12-01")
+    assert backcast_df["PAYEMS"].iloc[:6].isna().all()
+    ann_df = usempl_df[usempl_df["Date"] < "1939-01-01"]
+    assert np.array_equal(
+        backcast_df.set_index("Date")["PAYEMS"][ann_df["Date"]],
+        ann_df["PAYEMS"],
+    )
+    backcast_files = os.listdir(tmp_path)
+    assert len(backcast_files) == 1
+
+    # The bundled backcast matches, and a saved backcast is reloaded exactly
+    bundled_df = usempl_data.get_usempl_backcast(anchor_vals)
+    assert bundled_df.equals(backcast_df)
+    usempl_data._backcast_memo.clear()
+    assert usempl_data.get_usempl_backcast(
+        anchor_vals, data_dir=tmp_path
+    ).equals(backcast_df)
+
+    backcast_df2 = usempl_data.get_usempl_backcast(
+        anchor_vals + 100, data_dir=tmp_path
+    )
+    assert len(os.listdir(tmp_path)) == 2
+    assert backcast_df2["PAYEMS"].iloc[-1] > backcast_df["PAYEMS"].iloc[-1]
+    with pytest.raises(ValueError):
+        usempl_data.get_usempl_backcast([29923.0, np.nan])
+
+
+# Test that patching the normalized peak series with new and revised months
+# gives the same result as aligning the updated series, also when a peak
+# value is revised or a peak moves
+def test_update_usempl_pk():
+    usempl_df = read_bundled_usempl().reset_index(drop=True)
+    rec_df = usempl_data.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+
+    def align_full(usempl_df):
+        peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+        return usempl_data.align_peaks(usempl_df, peak_idx, 135, 48)
+
+    usempl_df_old = usempl_df.iloc[:-2].reset_index(drop=True)
+    usempl_df.loc[usempl_df["Date"] == "2023-04-01", "PAYEMS"] += 50
+    usempl_pk_old, _, _ = align_full(usempl_df_old)
+    delta_df = usempl_data.get_usempl_delta(usempl_df_old, usempl_df)
+    assert delta_df["Date"].dt.strftime("%Y-%m").tolist() == [
+        "2023-04",
+        "2023-06",
+        "2023-07",
+    ]
+    usempl_pk, peak_vals, peak_dates, rec_updated = (
+        usempl_data.update_usempl_pk(usempl_pk_old, delta_df, maxdate_rng_lst)
+    )
+    usempl_pk_full, peak_vals_full, peak_dates_full = align_full(usempl_df)
+    assert usempl_pk.equals(usempl_pk_full)
+    assert peak_vals == peak_vals_full
+    assert peak_dates == peak_dates_full
+    assert rec_updated == [14]
+    assert usempl_pk_old.equals(align_full(usempl_df_old)[0])
+
+    # A revised peak value rescales the recession
+    usempl_df2 = usempl_df.copy()
+    usempl_df2.loc[usempl_df2["Date"] == "2020-02-01", "PAYEMS"] += 10
+    usempl_pk2, peak_vals2, _, _ = usempl_data.update_usempl_pk(
+        usempl_pk_full,
+        usempl_data.get_usempl_delta(usempl_df, usempl_df2),
+        maxdate_rng_lst,
+    )
+    assert usempl_pk2.equals(align_full(usempl_df2)[0])
+    assert peak_vals2[14] == peak_vals_full[14] + 10
+
+    # A moved peak needs the full series
+    usempl_df3 = usempl_df.copy()
+    usempl_df3.loc[usempl_df3["Date"] == "2020-01-01", "PAYEMS"] += 1000
+    delta_df3 = usempl_data.get_usempl_delta(usempl_df, usempl_df3)
+    with pytest.raises(ValueError):
+        usempl_data.update_usempl_pk(
+            usempl_pk_full, delta_df3, maxdate_rng_lst
+        )
+    usempl_pk3, _, peak_dates3, _ = usempl_data.update_usempl_pk(
+        usempl_pk_full, delta_df3, maxdate_rng_lst, usempl_df3
+    )
+    assert usempl_pk3.equals(align_full(usempl_df3)[0])
+    assert peak_dates3[14] == "2020-01-01"
+    with pytest.raises(ValueError):
+        usempl_data.get_usempl_delta(usempl_df, usempl_df_old)
+
+
+# Test that the saved .npy normalized peak series are reused only with the
+# recession registry they were computed with, so that moving a peak search
+# window in a registry with the same number of recessions takes effect
+def test_get_usempl_data_registry_key(tmp_path):
+    rec_df = pd.read_csv(os.path.join(data_dir, "recessions.csv"))
+    rec_df.loc[len(rec_df) - 1, "peak_search_beg"] = "2019-06-01"
+    rec_df.loc[len(rec_df) - 1, "peak_search_end"] = "2019-08-01"
+    rec_file_path = os.path.join(tmp_path, "recessions.csv")
+    rec_df.to_csv(rec_file_path, index=False)
+    assert usempl_data.get_registry_key(
+        usempl_data.get_recession_registry(rec_file_path)
+    ) != usempl_data.get_registry_key(usempl_data.get_recession_registry())
+
+    stage_names = {}
+    peak_dates = {}
+    for reg_name, reg_path in [("bundled", None), ("edited", rec_file_path)]:
+        with instrument.record_stages() as report:
+            peak_dates[reg_name] = usempl_data.get_usempl_data(
+                135,
+                48,
+                "2023-07-01",
+                download_from_internet=False,
+                rec_file_path=reg_path,
+                verbose=False,
+            )[3]
+        stage_names[reg_name] = [rec["name"] for rec in report["stages"]]
+    assert stage_names["bundled"] == ["binary_read"]
+    assert "binary_read" not in stage_names["edited"]
+    assert "alignment" in stage_names["edited"]
+    assert peak_dates["bundled"][-1] == "2020-02-01"
+    assert peak_dates["edited"][-1] < "2019-09-01"
+    assert peak_dates["edited"][:-1] == peak_dates["bundled"][:-1]
+
+
+# Test that get_usempl_data() prints nothing by default and that the
+# alignment or binary_read stage records the end date and the peak dates
+def test_get_usempl_data_stage_info(capsys):
+    for frwd_mths_max, stage_name in [
+        (135, "binary_read"),
+        (150, "alignment"),
+    ]:
+        with instrument.record_stages() as report:
+            peak_dates = usempl_data.get_usempl_data(
+                frwd_mths_max, 48, "2023-07-01", download_from_internet=False
+            )[3]
+        stage_recs = {rec["name"]: rec for rec in report["stages"]}
+        assert stage_recs[stage_name]["end_date"] == "2023-07-01"
+        assert stage_recs[stage_name]["peak_dates"] == peak_dates
+        assert peak_dates[-1] == "2020-02-01"
+    assert capsys.readouterr().out == ""
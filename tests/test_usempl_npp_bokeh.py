@@ -11,6 +11,14 @@ Three main tests:
 
 import pytest
 import datetime as dt
+import json
+import shutil
+import subprocess
+import numpy as np
+import pandas as pd
+from bokeh.embed import file_html
+from bokeh.models import MultiLine
+from bokeh.resources import CDN
 
 # import os
 # import pathlib
@@ -93,3 +101,352 @@ def test_html_fig(
     # assert html file exists
     # assert usempl series csv file exists
     # assert usempl ColumnDataSource source DataFrame csv file exists
+
+
+# Test that usempl_npp() builds the figure offline from the bundled data
+def test_html_fig_offline():
+    fig, end_date_str = usempl.usempl_npp(
+        usempl_end_date="2023-07-01",
+        download_from_internet=False,
+        html_show=False,
+    )
+    assert end_date_str == "2023-07-01"
+    assert len(fig.legend[0].items) == 15
+    assert fig.y_range.start < 0.7 < 1.27 < fig.y_range.end
+
+
+# Test that the multi_line render mode draws all recessions from one source
+# with one renderer and keeps one legend entry per recession
+def test_create_usempl_fig_multi_line():
+    out = usempl.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long"
+    )
+    usempl_pk_long, rec_label_yrmth_lst = out[0], out[5]
+    fig = usempl.create_usempl_fig(
+        usempl_pk_long,
+        rec_label_yrmth_lst,
+        dt.datetime(2023, 7, 1),
+        render_mode="multi_line",
+    )
+    multi_lines = [
+        rend for rend in fig.renderers if isinstance(rend.glyph, MultiLine)
+    ]
+    assert len(multi_lines) == 1
+    rec_data = multi_lines[0].data_source.data
+    assert len(rec_data["usempl_dv_pk"]) == 15
+    assert rec_data["line_color"][0] == "blue"
+    assert rec_data["line_color"][14] == "black"
+    for i, usempl_pk_rec in enumerate(
+        usempl.get_recession_groups(usempl_pk_long).values()
+    ):
+        assert np.array_equal(
+            rec_data["usempl_dv_pk"][i], usempl_pk_rec["usempl_dv_pk"]
+        )
+    legend_items = fig.legend[0].items
+    assert len(legend_items) == 15
+    assert all(
+        len(item.renderers[0].data_source.data["x"]) == 0
+        and len(item.renderers[0].js_property_callbacks["change:muted"]) == 2
+        for item in legend_items
+    )
+    assert fig.y_range.start < 0.7 < 1.27 < fig.y_range.end
+    with pytest.raises(ValueError):
+        usempl.create_usempl_fig(
+            usempl_pk_long,
+            rec_label_yrmth_lst,
+            dt.datetime(2023, 7, 1),
+            render_mode="scatter",
+        )
+
+
+# Test that the compact render mode keeps only the int16 months and float32
+# fractions of the peak plus one peak value and peak date per recession
+def test_create_usempl_fig_compact():
+    out = usempl.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long"
+    )
+    usempl_pk_long, peak_vals, peak_dates = out[0], out[2], out[3]
+    fig_dict = {}
+    for render_mode in ["lines", "compact"]:
+        fig_dict[render_mode] = usempl.create_usempl_fig(
+            usempl_pk_long,
+            out[5],
+            dt.datetime(2023, 7, 1),
+            render_mode=render_mode,
+        )
+    rec_data = [
+        rend.data_source.data
+        for rend in fig_dict["compact"].renderers
+        if isinstance(rend.glyph, MultiLine)
+    ][0]
+    assert "Date" not in rec_data and "PAYEMS" not in rec_data
+    assert rec_data["mths_frm_peak"][0].dtype == np.int16
+    assert rec_data["usempl_dv_pk"][0].dtype == np.float32
+    assert np.array_equal(rec_data["peak_val"], peak_vals)
+    peak_date_arr = rec_data["peak_date"].astype("datetime64[ms]")
+    assert [str(peak_date)[:10] for peak_date in peak_date_arr] == peak_dates
+    assert len(fig_dict["compact"].legend[0].items) == 15
+    html_lines = file_html(fig_dict["lines"], CDN, "usempl_npp")
+    html_compact = file_html(fig_dict["compact"], CDN, "usempl_npp")
+    assert len(html_compact) < 0.5 * len(html_lines)
+
+
+# Test that the HTML size decreases from the lines to the multi_line to the
+# compact render mode. The build times are measured by
+# benchmark.run_benchmarks()
+@pytest.mark.local
+def test_create_usempl_fig_render_mode_size():
+    out = usempl.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long"
+    )
+    usempl_pk_long, rec_label_yrmth_lst = out[0], out[5]
+    html_size = {}
+    for render_mode in ["lines", "multi_line", "compact"]:
+        fig = usempl.create_usempl_fig(
+            usempl_pk_long,
+            rec_label_yrmth_lst,
+            dt.datetime(2023, 7, 1),
+            render_mode=render_mode,
+        )
+        html_size[render_mode] = len(file_html(fig, CDN, "usempl_npp"))
+    assert html_size["compact"] < html_size["multi_line"] < html_size["lines"]
+
+
+# Test the block minimums and maximums of the y-axis autoscaling and, if
+# Node.js is installed, the callback that queries them in the browser
+@pytest.mark.parametrize("render_mode", ["lines", "compact"])
+def test_create_usempl_fig_y_autoscale(render_mode):
+    out = usempl.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long"
+    )
+    usempl_pk_long = out[0]
+    block_min, block_max = usempl.get_yrange_blocks(usempl_pk_long, 48, 135)
+    assert block_min.shape == (15, 46)
+    rec_codes = usempl_pk_long["recession_id"].cat.codes.to_numpy()
+    block_idx = (usempl_pk_long["mths_frm_peak"].to_numpy() + 48) // 4
+    dv_pk = usempl_pk_long["usempl_dv_pk"].to_numpy()
+    in_block = (rec_codes == 3) & (block_idx == 20)
+    assert block_min[3, 20] == dv_pk[in_block].min()
+    assert block_max[3, 20] == dv_pk[in_block].max()
+    assert np.isposinf(block_min[-1, -1]) and np.isneginf(block_max[-1, -1])
+
+    fig = usempl.create_usempl_fig(
+        usempl_pk_long,
+        out[5],
+        dt.datetime(2023, 7, 1),
+        render_mode=render_mode,
+    )
+    yrange_callback = fig.x_range.js_property_callbacks["change:start"][0]
+    assert fig.x_range.js_property_callbacks["change:end"] == [yrange_callback]
+    fig_off = usempl.create_usempl_fig(
+        usempl_pk_long,
+        out[5],
+        dt.datetime(2023, 7, 1),
+        render_mode=render_mode,
+        y_autoscale=False,
+    )
+    assert fig_off.x_range.js_property_callbacks == {}
+    if shutil.which("node") is None:
+        return
+
+    # Run the callback for a zoomed-out x-range with the Great Depression
+    # muted and compare with the blocks of the visible months
+    blocks_json = json.dumps(
+        {
+            key: np.where(np.isinf(val), None, val).tolist()
+            for key, val in [
+                ("block_min", block_min),
+                ("block_max", block_max),
+            ]
+        }
+    )
+    js_code = (
+        "const inf = (arr, sgn) => arr.map("
+        "(val) => val === null ? sgn * Infinity : val);\n"
+        "const data = JSON.parse(process.argv[1]);\n"
+        "const blocks = {data: {"
+        "block_min: data.block_min.map((row) => inf(row, 1)), "
+        "block_max: data.block_max.map((row) => inf(row, -1))}};\n"
+        "const rec_lines = [...Array(15).keys()].map("
+        "(i) => ({muted: i === 0}));\n"
+        "const x_range = {start: -10, end: 100};\n"
+        "const y_range = {setv: (attrs) => console.log("
+        "JSON.stringify(attrs))};\n"
+        "const mth_beg = -48;\n"
+        "const block_mths = 4;\n"
+        "const buffer_pct = 0.1;\n" + yrange_callback.code
+    )
+    js_out = subprocess.run(
+        ["node", "-e", js_code, blocks_json],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    y_range = json.loads(js_out.stdout)
+    in_view = (
+        (rec_codes > 0)
+        & (block_idx >= (-10 + 48) // 4)
+        & (block_idx <= (100 + 48) // 4)
+    )
+    y_min = dv_pk[in_view].min()
+    y_max = dv_pk[in_view].max()
+    buffer = 0.1 * (y_max - y_min)
+    assert y_range["start"] == pytest.approx(y_min - buffer)
+    assert y_range["end"] == pytest.approx(y_max + buffer)
+
+
+# Test that lines with more than max_points points are downsampled in the
+# figure, and that the zoom callback swaps in the full-resolution points
+# around the visible months and back
+@pytest.mark.parametrize("render_mode", ["lines", "multi_line"])
+def test_create_usempl_fig_downsample(render_mode):
+    out = usempl.get_usempl_data(
+        135, 48, "2023-07-01", False, output_format="long"
+    )
+    # Daily-like series with 10 points per month
+    rec_pk_lst = []
+    for rec_label, usempl_pk_rec in usempl.get_recession_groups(
+        out[0]
+    ).items():
+        mths = usempl_pk_rec["mths_frm_peak"].to_numpy(dtype=float)
+        mths_dense = np.arange(mths[0] * 10, mths[-1] * 10 + 1) / 10
+        dv_pk = np.interp(mths_dense, mths, usempl_pk_rec["usempl_dv_pk"])
+        rec_pk_lst.append(
+            pd.DataFrame(
+                {
+                    "recession_id": rec_label,
+                    "mths_frm_peak": mths_dense,
+                    "Date": usempl_pk_rec["Date"].iloc[0]
+                    + pd.to_timedelta(3 * (mths_dense - mths[0]), "D"),
+                    "PAYEMS": 1e5 * dv_pk,
+                    "usempl_dv_pk": dv_pk,
+                }
+            )
+        )
+    dense_pk_long = pd.concat(rec_pk_lst, ignore_index=True)
+    dense_pk_long["recession_id"] = pd.Categorical(
+        dense_pk_long["recession_id"],
+        categories=out[0]["recession_id"].cat.categories,
+    )
+    num_full = dense_pk_long["recession_id"].value_counts(sort=False)
+    assert num_full.max() > 1000
+
+    fig = usempl.create_usempl_fig(
+        dense_pk_long,
+        out[5],
+        dt.datetime(2023, 7, 1),
+        render_mode=render_mode,
+        max_points=200,
+    )
+    x_callbacks = fig.x_range.js_property_callbacks["change:start"]
+    assert len(x_callbacks) == 2
+    lod_callback = x_callbacks[0]
+    assert lod_callback.args["max_points"] == 200
+    sources = lod_callback.args["sources"]
+    if render_mode == "lines":
+        num_drawn = [len(source.data["mths_frm_peak"]) for source in sources]
+    else:
+        num_drawn = [len(mths) for mths in sources[0].data["mths_frm_peak"]]
+    assert num_drawn == np.minimum(num_full.to_numpy(), 200).tolist()
+    fig_full = usempl.create_usempl_fig(
+        dense_pk_long, out[5], dt.datetime(2023, 7, 1), max_points=5000
+    )
+    assert len(fig_full.x_range.js_property_callbacks["change:start"]) == 1
+    if shutil.which("node") is None:
+        return
+
+    # Zoom in to 10 months (100 points per line), pan within the loaded
+    # months, and zoom out again
+    detail_json = json.dumps(
+        {
+            rec_col: [
+                rec_vals.astype(
+                    "datetime64[ms]" if rec_col == "Date" else float
+                )
+                .astype(float)
+                .tolist()
+                for rec_vals in rec_col_vals
+            ]
+            for rec_col, rec_col_vals in lod_callback.args[
+                "detail"
+            ].data.items()
+        }
+    )
+    js_code = (
+        "const args = JSON.parse(process.argv[1]);\n"
+        "const detail = {data: JSON.parse("
+        "require('fs').readFileSync(0, 'utf8'))};\n"
+        "const sources = args.num_drawn.map(() => ({data: null}));\n"
+        "const x_range = {start: -10, end: 100};\n"
+        "const callback = new Function('x_range', 'sources', 'detail', "
+        "'detail_url', 'rec_cols', 'is_multi', 'num_full', 'x_min', "
+        "'x_max', 'max_points', args.code);\n"
+        "const run = (start, end) => {\n"
+        "  x_range.start = start;\n"
+        "  x_range.end = end;\n"
+        "  callback(x_range, sources, detail, null, args.rec_cols, "
+        "args.is_multi, args.num_full, args.x_min, args.x_max, 200);\n"
+        "};\n"
+        "const lens = () => sources.map((src) => src.data === null ? null "
+        ": args.is_multi ? src.data['mths_frm_peak'].map((xs) => xs.length) "
+        ": src.data['mths_frm_peak'].length);\n"
+        "const out = [];\n"
+        "run(-10, 100);\n"
+        "setTimeout(() => {\n"
+        "  out.push(lens());\n"
+        "  run(0, 10);\n"
+        "  setTimeout(() => {\n"
+        "    out.push(lens());\n"
+        "    out.push(sources[0].data['mths_frm_peak']);\n"
+        "    run(5, 15);\n"
+        "    setTimeout(() => {\n"
+        "      out.push(lens());\n"
+        "      run(-40, 120);\n"
+        "      setTimeout(() => {\n"
+        "        out.push(lens());\n"
+        "        console.log(JSON.stringify(out));\n"
+        "      }, 150);\n"
+        "    }, 150);\n"
+        "  }, 150);\n"
+        "}, 150);\n"
+    )
+    # The sources start with their overview data, which the node harness
+    # stands in for with markers
+    js_code = js_code.replace(
+        "const out = [];",
+        "sources.forEach((src, i) => { src.data = args.is_multi ? "
+        "{mths_frm_peak: args.num_drawn.map((num) => Array(num))} : "
+        "{mths_frm_peak: Array(args.num_drawn[i])}; });\n"
+        "const out = [];",
+    )
+    args_json = json.dumps(
+        {
+            "code": lod_callback.code,
+            "rec_cols": lod_callback.args["rec_cols"],
+            "is_multi": lod_callback.args["is_multi"],
+            "num_full": lod_callback.args["num_full"],
+            "x_min": lod_callback.args["x_min"],
+            "x_max": lod_callback.args["x_max"],
+            "num_drawn": num_drawn if render_mode == "lines" else [0],
+        }
+    )
+    js_out = subprocess.run(
+        ["node", "-e", js_code, args_json],
+        input=detail_json,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lens_over, lens_in, mths_in, lens_pan, lens_out = json.loads(js_out.stdout)
+    if render_mode == "multi_line":
+        mths_in = mths_in[0]
+        lens_over, lens_in, lens_pan, lens_out = [
+            lens[0] for lens in [lens_over, lens_in, lens_pan, lens_out]
+        ]
+    assert lens_over == lens_out
+    assert lens_pan == lens_in
+    # Full-resolution months from one point before -10 through 20
+    assert mths_in[0] == pytest.approx(-10.1)
+    assert mths_in[-1] == pytest.approx(20.0)
+    assert np.allclose(np.diff(mths_in), 0.1)
+    assert max(lens_in) == 302
@@ -0,0 +1,243 @@
+"""
+Tests of vintage_store.py module
+"""
+
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from usempl_npp import fred_cache
+from usempl_npp import instrument
+from usempl_npp import usempl_data
+from usempl_npp import vintage_store
+
+cur_path = os.path.split(os.path.abspath(__file__))[0]
+data_dir = os.path.join(cur_path, "..", "usempl_npp", "data")
+usempl_2023 = pd.read_csv(
+    os.path.join(data_dir, "usempl_2023-07-01.csv"),
+    parse_dates=["Date"],
+    dtype={"PAYEMS": float},
+)
+usempl_2023 = usempl_2023[usempl_2023["Date"] >= "1939-01-01"].reset_index(
+    drop=True
+)
+
+
+# Test that each vintage stores only its new and revised months, that every
+# vintage is rebuilt exactly, and that a vintage older than the latest one is
+# inserted without changing the later vintages
+def test_vintage_store(tmp_path):
+    store_path = vintage_store.get_store_path("PAYEMS", str(tmp_path))
+    vintage_1 = usempl_2023.iloc[:-2]
+    vintage_2 = usempl_2023.copy()
+    vintage_2.loc[len(vintage_2) - 3, "PAYEMS"] -= 25.0
+    vintage_3 = usempl_2023.drop(index=100).reset_index(drop=True)
+    assert vintage_store.append_vintage(
+        vintage_1, "2023-06-02", store_path
+    ) == (len(vintage_1))
+    assert (
+        vintage_store.append_vintage(vintage_2, "2023-08-04", store_path) == 3
+    )
+    # A repeated download and a download through an earlier end date add
+    # nothing, and dropping a month and undoing the revision add two records
+    assert (
+        vintage_store.append_vintage(vintage_2, "2023-08-05", store_path) == 0
+    )
+    assert (
+        vintage_store.append_vintage(
+            vintage_2.iloc[:-24], "2023-08-05", store_path
+        )
+        == 0
+    )
+    assert (
+        vintage_store.append_vintage(vintage_3, "2023-09-01", store_path) == 2
+    )
+    assert vintage_store.get_vintage_dates(store_path) == [
+        "2023-06-02",
+        "2023-08-04",
+        "2023-09-01",
+    ]
+    num_records = len(vintage_1) + 5
+    assert os.path.getsize(store_path) == 16 * (num_records + 1)
+
+    for as_of, vintage_df in [
+        ("2023-06-02", vintage_1),
+        ("2023-07-31", vintage_1),
+        ("2023-08-04", vintage_2),
+        ("2023-08-31", vintage_2),
+        (None, vintage_3),
+    ]:
+        pd.testing.assert_frame_equal(
+            vintage_store.get_vintage(store_path, as_of), vintage_df
+        )
+    pd.testing.assert_frame_equal(
+        vintage_store.get_vintage(store_path, "2023-08-04", "2020-12-15"),
+        vintage_2[vintage_2["Date"] <= "2020-12-01"],
+    )
+
+    with pytest.raises(ValueError):
+        vintage_store.get_vintage(store_path, "2023-06-01")
+
+    # The revised month of an older vintage is also stored with its previous
+    # value as a record of the next vintage, which did not revise it
+    vintage_ins = vintage_1.copy()
+    vintage_ins.loc[50, "PAYEMS"] += 7.0
+    assert (
+        vintage_store.append_vintage(vintage_ins, "2023-07-14", store_path)
+        == 2
+    )
+    num_records += 2
+    assert vintage_store.get_vintage_dates(store_path) == [
+        "2023-06-02",
+        "2023-07-14",
+        "2023-08-04",
+        "2023-09-01",
+    ]
+    for as_of, vintage_df in [
+        ("2023-06-02", vintage_1),
+        ("2023-07-14", vintage_ins),
+        ("2023-08-04", vintage_2),
+        (None, vintage_3),
+    ]:
+        pd.testing.assert_frame_equal(
+            vintage_store.get_vintage(store_path, as_of), vintage_df
+        )
+
+    # A partial record left by an interrupted append is ignored
+    with open(store_path, "ab") as store_file:
+        store_file.write(b"\x00" * 5)
+    assert len(vintage_store.read_store(store_path)) == num_records
+    pd.testing.assert_frame_equal(
+        vintage_store.get_vintage(store_path), vintage_3
+    )
+
+
+# Test that the default store is a copy of the bundled store, so that the
+# bundled file is never written, and that concurrent appends of the same
+# vintage are serialized into whole records
+def test_vintage_store_default_and_locking(tmp_path):
+    bundled_path = vintage_store.get_bundled_store_path("PAYEMS")
+    store_path = vintage_store.get_store_path("PAYEMS")
+    assert os.path.dirname(store_path) != os.path.dirname(bundled_path)
+    assert os.path.basename(os.path.dirname(store_path)) == "vintage_cache"
+    assert vintage_store.get_vintage_dates(store_path)[0] == (
+        vintage_store.get_vintage_dates(bundled_path)[0]
+    )
+
+    store_path = vintage_store.get_store_path("PAYEMS", str(tmp_path))
+    vintage_store.append_vintage(usempl_2023, "2023-08-04", store_path)
+    revised_lst = []
+    for i in range(8):
+        revised_df = usempl_2023.copy()
+        revised_df.loc[len(revised_df) - 1 - i, "PAYEMS"] += 10.0
+        revised_lst.append(revised_df)
+    num_records_lst = [0] * len(revised_lst)
+
+    def append_revised(i):
+        num_records_lst[i] = vintage_store.append_vintage(
+            revised_lst[i], "2023-09-01", store_path
+        )
+
+    threads = [
+        threading.Thread(target=append_revised, args=(i,))
+        for i in range(len(revised_lst))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Each append compares with the vintage left by the previous one
+    num_records = len(usempl_2023) + sum(num_records_lst)
+    assert os.path.getsize(store_path) == 16 * (num_records + 1)
+    assert len(vintage_store.read_store(store_path)) == num_records
+    latest_df = vintage_store.get_vintage(store_path)
+    assert any(latest_df.equals(revised_df) for revised_df in revised_lst)
+
+
+# Test that a past vintage is stored into a copy of the bundled store, whose
+# only vintage is newer, and is rebuilt with as_of
+def test_vintage_store_past_vintage(tmp_path):
+    store_path = vintage_store.get_store_path("PAYEMS", str(tmp_path))
+    shutil.copyfile(vintage_store.get_bundled_store_path("PAYEMS"), store_path)
+    latest_df = vintage_store.get_vintage(store_path)
+    vintage_2020 = usempl_2023[usempl_2023["Date"] <= "2020-05-01"].copy()
+    vintage_2020.loc[vintage_2020.index[-2], "PAYEMS"] -= 100.0
+    assert vintage_store.append_vintage(
+        vintage_2020, "2020-06-05", store_path
+    ) == len(vintage_2020)
+    assert vintage_store.get_vintage_dates(store_path) == [
+        "2020-06-05",
+        "2023-08-04",
+    ]
+    pd.testing.assert_frame_equal(
+        vintage_store.get_vintage(store_path, "2020-06-05"), vintage_2020
+    )
+    pd.testing.assert_frame_equal(
+        vintage_store.get_vintage(store_path), latest_df
+    )
+    usempl_df, end_date_str2 = usempl_data.get_usempl_series(
+        "2020-06-05",
+        download_from_internet=False,
+        as_of="2020-06-05",
+        store_dir=str(tmp_path),
+    )
+    assert end_date_str2 == "2020-05-01"
+    assert usempl_df["PAYEMS"].iloc[-2] == vintage_2020["PAYEMS"].iloc[-2]
+
+
+# Test that the vintage date of a download is FRED's Last-Modified date
+def test_get_release_date(tmp_path):
+    cache_path = fred_cache.get_cache_path("PAYEMS", str(tmp_path))
+    assert fred_cache.get_release_date("PAYEMS", str(tmp_path)) is None
+    fred_cache.write_validators(
+        {"etag": None, "last_modified": "Fri, 04 Aug 2023 12:45:03 GMT"},
+        cache_path,
+    )
+    assert str(fred_cache.get_release_date("PAYEMS", str(tmp_path))) == (
+        "2023-08-04"
+    )
+
+
+# Test that get_usempl_data() rebuilds an as-of vintage from the bundled
+# store, spliced to the 1919-1938 backcast, without saving per-date files
+def test_get_usempl_data_as_of():
+    with instrument.record_stages() as report:
+        usempl_pk, end_date_str2, peak_vals, peak_dates = (
+            usempl_data.get_usempl_data(
+                135,
+                48,
+                "2020-07-15",
+                download_from_internet=False,
+                verbose=False,
+                as_of="2023-08-04",
+            )[:4]
+        )
+    assert [rec["name"] for rec in report["stages"]] == [
+        "vintage_read",
+        "backcast_splice",
+        "alignment",
+    ]
+    assert end_date_str2 == "2020-07-01"
+    assert peak_dates[-1] == "2020-02-01"
+    assert usempl_pk["Date14"].max() == pd.Timestamp("2020-07-01")
+    assert not os.access(
+        os.path.join(data_dir, "usempl_pk_2020-07-01.npy"), os.F_OK
+    )
+    usempl_pk_2023 = usempl_data.get_usempl_data(
+        135, 48, "2023-07-01", False, verbose=False
+    )[0]
+    in_2020 = usempl_pk_2023["Date14"] <= "2020-07-01"
+    np.testing.assert_allclose(
+        usempl_pk["usempl_dv_pk14"][in_2020],
+        usempl_pk_2023["usempl_dv_pk14"][in_2020],
+        rtol=1e-12,
+    )
+    with pytest.raises(ValueError):
+        usempl_data.get_usempl_data(
+            end_date_str="2020-07-15",
+            download_from_internet=False,
+            verbose=False,
+            as_of="2020-08-07",
+        )
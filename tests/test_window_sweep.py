@@ -0,0 +1,83 @@
+"""
+Tests of window_sweep.py module
+"""
+
+import numpy as np
+import pytest
+from usempl_npp import usempl_data
+from usempl_npp import window_sweep
+
+usempl_pk_2023 = usempl_data.get_usempl_data(
+    135, 48, "2023-07-01", False, verbose=False
+)[0]
+
+
+# Test that the sweep of random windows matches a boolean-mask scan of each
+# window, including windows in which some recessions have no data
+def test_sweep_windows():
+    mths_frm_peak, rec_vals = window_sweep.get_sweep_matrix(usempl_pk_2023)
+    assert rec_vals.shape == (15, 184)
+    range_index = window_sweep.build_range_index(mths_frm_peak, rec_vals)
+    rng = np.random.default_rng(0)
+    bkwd_mths = np.append(rng.integers(0, 49, 200), [48, 0, 0])
+    frwd_mths = np.append(rng.integers(0, 136, 200), [135, 0, 135])
+    win_min, win_max, trough_mths, y_min, y_max = window_sweep.sweep_windows(
+        range_index, bkwd_mths, frwd_mths
+    )
+    assert win_min.shape == (203, 15) and y_min.shape == (203,)
+    for w in range(len(bkwd_mths)):
+        in_win = (mths_frm_peak >= -bkwd_mths[w]) & (
+            mths_frm_peak <= frwd_mths[w]
+        )
+        win_vals = rec_vals[:, in_win]
+        has_data = ~np.isnan(win_vals).all(axis=1)
+        np.testing.assert_array_equal(
+            win_min[w, has_data], np.nanmin(win_vals[has_data], axis=1)
+        )
+        np.testing.assert_array_equal(
+            win_max[w, has_data], np.nanmax(win_vals[has_data], axis=1)
+        )
+        np.testing.assert_array_equal(
+            trough_mths[w, has_data],
+            mths_frm_peak[in_win][np.nanargmin(win_vals[has_data], axis=1)],
+        )
+        assert np.isnan(win_min[w, ~has_data]).all()
+        assert np.isnan(trough_mths[w, ~has_data]).all()
+        assert (y_min[w], y_max[w]) == (
+            np.nanmin(win_vals),
+            np.nanmax(win_vals),
+        )
+
+    # The long DataFrame gives the same (float32) matrix
+    long_mths, long_vals = window_sweep.get_sweep_matrix(
+        usempl_data.usempl_pk_to_long(usempl_pk_2023)
+    )
+    np.testing.assert_array_equal(long_mths, mths_frm_peak)
+    np.testing.assert_allclose(long_vals, rec_vals, rtol=1e-6)
+
+
+# Test that the earliest month of a tied minimum is the trough, that an empty
+# recession gives NaN, and that windows outside the index are rejected
+def test_sweep_windows_edges():
+    rec_vals = np.array(
+        [
+            [3.0, 1.0, 2.0, 1.0, 5.0],
+            [np.nan, np.nan, np.nan, 4.0, np.nan],
+        ]
+    )
+    range_index = window_sweep.build_range_index(np.arange(-2, 3), rec_vals)
+    win_min, win_max, trough_mths, y_min, y_max = window_sweep.sweep_windows(
+        range_index, [2, 0, 2], [2, 2, -1]
+    )
+    np.testing.assert_array_equal(
+        win_min, [[1.0, 4.0], [1.0, 4.0], [1.0, np.nan]]
+    )
+    np.testing.assert_array_equal(
+        win_max, [[5.0, 4.0], [5.0, 4.0], [3.0, np.nan]]
+    )
+    np.testing.assert_array_equal(trough_mths, [[-1, 1], [1, 1], [-1, np.nan]])
+    np.testing.assert_array_equal(y_min, [1.0, 1.0, 1.0])
+    np.testing.assert_array_equal(y_max, [5.0, 5.0, 3.0])
+    for bkwd_mths, frwd_mths in [(3, 0), (0, 3), (0, -1)]:
+        with pytest.raises(ValueError):
+            window_sweep.sweep_windows(range_index, [bkwd_mths], [frwd_mths])
@@ -0,0 +1,457 @@
+"""
+This module downloads many FRED series, or many vintages of a series,
+concurrently with asyncio. Each download is the blocking
+fred_client.fetch_fred_csv() call (pooled connections and retries) run in a
+worker thread, so the event loop only schedules them. The number of
+downloads in flight is bounded by a semaphore, the starts of the downloads
+are spaced to a maximum request rate, and each download has a timeout. Each
+downloaded series is handed to a callback as soon as it arrives, e.g., to
+build its normalized peak DataFrame while the other downloads are still
+running.
+
+Usage:
+    results, errors = fetch_series(
+        [("PAYEMS", None), ("PAYEMS", "2020-06-05"), ("UNRATE", None)],
+        max_concurrency=8,
+        rate_per_sec=2.0,
+    )
+
+The synchronous wrappers fetch_series(), get_multi_series_panels_async(),
+and backfill_vintages() run their own event loop with asyncio.run(), so
+inside a running event loop (e.g., a Jupyter notebook) await
+fetch_series_async() instead.
+
+This module defines the following function(s):
+    make_rate_limiter()
+    wait_rate_limiter()
+    fetch_one_async()
+    fetch_series_async()
+    fetch_series()
+    get_multi_series_panels_async()
+    backfill_vintages()
+"""
+
+# Import packages
+import asyncio
+import datetime as dt
+import time
+from usempl_npp import fred_client
+from usempl_npp import instrument
+from usempl_npp import multi_series
+from usempl_npp import usempl_data
+from usempl_npp import vintage_store
+
+# Default limits: downloads in flight (within the 16 pooled connections of
+# fred_client.get_session()), request starts per second (FRED allows 120
+# requests per minute), and seconds per download
+MAX_CONCURRENCY = 8
+RATE_PER_SEC = 2.0
+TIMEOUT_SECS = 30.0
+
+"""
+Define functions
+"""
+
+
+def make_rate_limiter(rate_per_sec=RATE_PER_SEC):
+    """
+    This function creates the state of a rate limiter that spaces the starts
+    of requests at least 1 / rate_per_sec seconds apart.
+
+    Args:
+        rate_per_sec (float): maximum number of request starts per second.
+            If None, the requests are not rate limited
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        limiter (dict): dictionary with the interval in seconds between
+            request starts (interval) and the event loop time of the next
+            free start (next_time)
+    """
+    limiter = {
+        "interval": 0.0 if rate_per_sec is None else 1.0 / rate_per_sec,
+        "next_time": 0.0,
+    }
+
+    return limiter
+
+
+async def wait_rate_limiter(limiter):
+    """
+    This function waits until the next request may start under the rate
+    limiter and reserves that start. The reservation is made before the
+    wait, so concurrent callers are queued in the order they called.
+
+    Args:
+        limiter (dict): rate limiter state from make_rate_limiter()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns: None
+    """
+    now = asyncio.get_running_loop().time()
+    start_time = max(now, limiter["next_time"])
+    limiter["next_time"] = start_time + limiter["interval"]
+    if start_time > now:
+        await asyncio.sleep(start_time - now)
+
+
+async def fetch_one_async(
+    series_id,
+    vintage_date,
+    semaphore,
+    limiter,
+    timeout=TIMEOUT_SECS,
+    fred_url=None,
+):
+    """
+    This function downloads one series or vintage in a worker thread once a
+    slot of the semaphore and a start of the rate limiter are free. The
+    timeout covers the whole download, including the retries of
+    fred_client.get_session(). A download that times out is abandoned by the
+    event loop, while its thread finishes its remaining retries, each of
+    which also times out after timeout seconds.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        vintage_date (str): vintage date in 'YYYY-mm-dd' format, or None
+            for the current series
+        semaphore (asyncio.Semaphore): semaphore that bounds the downloads
+            in flight
+        limiter (dict): rate limiter state from make_rate_limiter()
+        timeout (float): timeout in seconds of the download
+        fred_url (str): URL of the FRED CSV download. If None,
+            fred_client.FRED_CSV_URL
+
+    Other functions and files called by this function:
+        wait_rate_limiter()
+        fred_client.fetch_fred_csv()
+
+    Files created by this function: None
+
+    Returns:
+        series_df (DataFrame): series with columns Date and series_id, sorted
+            from old to new
+    """
+    async with semaphore:
+        await wait_rate_limiter(limiter)
+        series_df, _, _ = await asyncio.wait_for(
+            asyncio.to_thread(
+                fred_client.fetch_fred_csv,
+                series_id,
+                None,
+                fred_url,
+                timeout,
+                None,
+                vintage_date,
+            ),
+            timeout,
+        )
+
+    return series_df
+
+
+async def fetch_series_async(
+    fetch_lst,
+    on_result=None,
+    max_concurrency=MAX_CONCURRENCY,
+    rate_per_sec=RATE_PER_SEC,
+    timeout=TIMEOUT_SECS,
+    fred_url=None,
+):
+    """
+    This function downloads the series and vintages in fetch_lst
+    concurrently. The downloads start in the order of fetch_lst, and each
+    series is passed to on_result as soon as it arrives,
+    in the order in which the downloads finish. A failed or timed-out
+    download is recorded in errors and does not stop the others.
+
+    Args:
+        fetch_lst (list): list of tuples (series_id, vintage_date) to
+            download, with vintage_date None for the current series
+        on_result (function): function on_result(series_id, vintage_date,
+            series_df) called in the event loop thread with each downloaded
+            series. Its return value is stored in results. If None, results
+            holds the downloaded series
+        max_concurrency (int): maximum number of downloads in flight
+        rate_per_sec (float): maximum number of download starts per second.
+            If None, the downloads are not rate limited
+        timeout (float): timeout in seconds of each download
+        fred_url (str): URL of the FRED CSV download. If None,
+            fred_client.FRED_CSV_URL
+
+    Other functions and files called by this function:
+        make_rate_limiter()
+        fetch_one_async()
+
+    Files created by this function: None
+
+    Returns:
+        results (dict): dictionary with (series_id, vintage_date) keys, in
+            the order of fetch_lst, and the downloaded series or the return
+            values of on_result as values
+        errors (dict): dictionary with the (series_id, vintage_date) keys of
+            the failed downloads and their exceptions as values
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = make_rate_limiter(rate_per_sec)
+
+    async def fetch_key(fetch_key):
+        try:
+            series_df = await fetch_one_async(
+                *fetch_key, semaphore, limiter, timeout, fred_url
+            )
+        except Exception as exc:
+            return fetch_key, None, exc
+        return fetch_key, series_df, None
+
+    # Create the tasks in the order of fetch_lst, so that the downloads
+    # queue on the semaphore and the rate limiter in that order
+    # (asyncio.as_completed() would schedule bare coroutines in any order)
+    tasks = [
+        asyncio.create_task(fetch_key(tuple(fetch_item)))
+        for fetch_item in fetch_lst
+    ]
+    arrived = {}
+    errors = {}
+    for next_done in asyncio.as_completed(tasks):
+        fetch_key, series_df, exc = await next_done
+        if exc is not None:
+            errors[fetch_key] = exc
+        elif on_result is None:
+            arrived[fetch_key] = series_df
+        else:
+            arrived[fetch_key] = on_result(*fetch_key, series_df)
+    results = {
+        tuple(fetch_item): arrived[tuple(fetch_item)]
+        for fetch_item in fetch_lst
+        if tuple(fetch_item) in arrived
+    }
+
+    return results, errors
+
+
+def fetch_series(
+    fetch_lst,
+    on_result=None,
+    max_concurrency=MAX_CONCURRENCY,
+    rate_per_sec=RATE_PER_SEC,
+    timeout=TIMEOUT_SECS,
+    fred_url=None,
+):
+    """
+    This function runs fetch_series_async() in a new event loop.
+
+    Args:
+        fetch_lst (list): list of tuples (series_id, vintage_date) to
+            download, see fetch_series_async()
+        on_result (function): function called with each downloaded series,
+            see fetch_series_async()
+        max_concurrency (int): maximum number of downloads in flight
+        rate_per_sec (float): maximum number of download starts per second
+        timeout (float): timeout in seconds of each download
+        fred_url (str): URL of the FRED CSV download. If None,
+            fred_client.FRED_CSV_URL
+
+    Other functions and files called by this function:
+        fetch_series_async()
+
+    Files created by this function: None
+
+    Returns:
+        results (dict): downloaded series or on_result values by
+            (series_id, vintage_date)
+        errors (dict): exceptions of the failed downloads by (series_id,
+            vintage_date)
+    """
+    return asyncio.run(
+        fetch_series_async(
+            fetch_lst,
+            on_result,
+            max_concurrency,
+            rate_per_sec,
+            timeout,
+            fred_url,
+        )
+    )
+
+
+def get_multi_series_panels_async(
+    series_id_lst,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str=None,
+    rec_file_path=None,
+    max_concurrency=MAX_CONCURRENCY,
+    rate_per_sec=RATE_PER_SEC,
+    timeout=TIMEOUT_SECS,
+    fred_url=None,
+    freq="M",
+):
+    """
+    This function downloads the series in series_id_lst concurrently and
+    builds the long normalized peak DataFrame of each series as soon as it
+    arrives, the concurrent download counterpart of
+    multi_series.get_multi_series_panels().
+
+    Args:
+        series_id_lst (list): list of FRED series IDs, e.g., ['PAYEMS',
+            'UNRATE', 'INDPRO']
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month
+        end_date_str (str): end date of the series in 'YYYY-mm-dd' format. If
+            None, the series run through the most recent available month
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        max_concurrency (int): maximum number of downloads in flight
+        rate_per_sec (float): maximum number of download starts per second
+        timeout (float): timeout in seconds of each download
+        fred_url (str): URL of the FRED CSV download. If None,
+            fred_client.FRED_CSV_URL
+        freq (str): pandas frequency of the periods from peak, see
+            multi_series.align_series_panel()
+
+    Other functions and files called by this function:
+        usempl_data.get_recession_registry()
+        instrument.stage()
+        fetch_series()
+        multi_series.align_series_panel()
+
+    Files created by this function: None
+
+    Returns:
+        results (dict): dictionary with series IDs as keys and tuples of
+            (series_pk_long, peak_vals, peak_dates) from
+            multi_series.align_series_panel() as values, in the order of
+            series_id_lst
+        errors (dict): dictionary with the series IDs of the failed
+            downloads and their exceptions as values
+        total_secs (float): wall time in seconds for all series
+        throughput (float): number of series processed per second
+    """
+    start_time = time.perf_counter()
+    end_date = None
+    if end_date_str is not None:
+        end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d")
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+    maxdate_rng_lst = list(
+        zip(
+            rec_df["peak_search_beg"].dt.strftime("%Y-%m-%d"),
+            rec_df["peak_search_end"].dt.strftime("%Y-%m-%d"),
+        )
+    )
+    rec_label_lst = rec_df["rec_label_yr"].tolist()
+
+    def align_result(series_id, vintage_date, series_df):
+        if end_date is not None:
+            series_df = series_df[series_df["Date"] <= end_date]
+            series_df = series_df.reset_index(drop=True)
+        return multi_series.align_series_panel(
+            series_df,
+            series_id,
+            maxdate_rng_lst,
+            rec_label_lst,
+            frwd_mths_max,
+            bkwd_mths_max,
+            freq,
+        )
+
+    # The downloads, their errors, and the throughput are recorded as the
+    # instrument stage multi_series_async
+    with instrument.stage("multi_series_async") as stage_rec:
+        fetch_results, fetch_errors = fetch_series(
+            [(series_id, None) for series_id in series_id_lst],
+            align_result,
+            max_concurrency,
+            rate_per_sec,
+            timeout,
+            fred_url,
+        )
+        results = {
+            fetch_key[0]: panel for fetch_key, panel in fetch_results.items()
+        }
+        errors = {fetch_key[0]: exc for fetch_key, exc in fetch_errors.items()}
+        total_secs = time.perf_counter() - start_time
+        throughput = len(series_id_lst) / total_secs
+        stage_rec["rows"] = len(results)
+        stage_rec["errors"] = {
+            series_id: repr(exc) for series_id, exc in errors.items()
+        }
+        stage_rec["throughput"] = throughput
+
+    return results, errors, total_secs, throughput
+
+
+def backfill_vintages(
+    vintage_date_lst,
+    series_id="PAYEMS",
+    store_path=None,
+    max_concurrency=MAX_CONCURRENCY,
+    rate_per_sec=RATE_PER_SEC,
+    timeout=TIMEOUT_SECS,
+    fred_url=None,
+):
+    """
+    This function downloads past vintages of a series concurrently and
+    stores them in its vintage store. The downloads finish in any order, and
+    the vintages are appended from old to new. Vintages older than the
+    latest stored vintage (e.g., than the bundled vintage that the default
+    store starts with) are inserted among the stored vintages (see
+    vintage_store.append_vintage()). A vintage whose download fails is
+    skipped and can be backfilled again later.
+
+    Args:
+        vintage_date_lst (list): list of vintage dates in 'YYYY-mm-dd'
+            format
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        store_path (str): path of the store file. If None, the default path
+            from vintage_store.get_store_path()
+        max_concurrency (int): maximum number of downloads in flight
+        rate_per_sec (float): maximum number of download starts per second
+        timeout (float): timeout in seconds of each download
+        fred_url (str): URL of the FRED CSV download. If None,
+            fred_client.FRED_CSV_URL
+
+    Other functions and files called by this function:
+        fetch_series()
+        vintage_store.get_store_path()
+        vintage_store.append_vintage()
+
+    Files created by this function:
+        vintage_cache/[series_id].bin (if store_path is None)
+
+    Returns:
+        num_records (int): number of records appended to the store
+        errors (dict): dictionary with the (series_id, vintage_date) keys of
+            the failed downloads and their exceptions as values
+    """
+    if store_path is None:
+        store_path = vintage_store.get_store_path(series_id)
+    vintage_date_lst = sorted(vintage_date_lst)
+    results, errors = fetch_series(
+        [(series_id, vintage_date) for vintage_date in vintage_date_lst],
+        None,
+        max_concurrency,
+        rate_per_sec,
+        timeout,
+        fred_url,
+    )
+    num_records = 0
+    for vintage_date in vintage_date_lst:
+        if (series_id, vintage_date) in errors:
+            continue
+        num_records += vintage_store.append_vintage(
+            results[(series_id, vintage_date)],
+            vintage_date,
+            store_path,
+            value_col=series_id,
+        )
+
+    return num_records, errors
@@ -0,0 +1,304 @@
+"""
+This module renders the normalized peak plot of usempl_npp_bokeh.py for many
+historical end dates at once, e.g., one for every jobs report release. The
+PAYEMS series and the recession registry are loaded once, each end date is a
+slice of that series, and the figures are aligned and rendered to HTML, or to
+static PNG, SVG, or PDF images with the static_image.py module, in a pool of
+worker processes.
+
+This module defines the following function(s):
+    init_batch_worker()
+    render_vintage()
+    usempl_npp_batch()
+"""
+
+# Import packages
+import concurrent.futures
+import datetime as dt
+import os
+import numpy as np
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+from usempl_npp import instrument
+from usempl_npp import static_image
+from usempl_npp import usempl_data
+from usempl_npp import usempl_npp_bokeh as usempl
+
+# Series and recession registry shared by all tasks of a worker process, set
+# once per process by init_batch_worker()
+batch_data = {}
+
+"""
+Define functions
+"""
+
+
+def init_batch_worker(usempl_df, rec_df):
+    """
+    This function stores the full PAYEMS series and the recession registry
+    in each worker process, so that they are sent to each worker once rather
+    than with every end date.
+
+    Args:
+        usempl_df (DataFrame): full series with columns Date and PAYEMS
+        rec_df (DataFrame): recession registry from
+            usempl_data.get_recession_registry()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns: None
+    """
+    batch_data["usempl_df"] = usempl_df
+    batch_data["rec_df"] = rec_df
+
+
+def render_vintage(
+    end_date_str,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    image_dir=None,
+    render_mode="lines",
+    image_format="html",
+):
+    """
+    This function aligns the PAYEMS series through end_date_str and saves the
+    normalized peak plot as HTML or as a static image. Recessions that begin
+    after the end date are left out of the plot. An end date before the
+    first month of the series raises a ValueError.
+
+    Args:
+        end_date_str (str): end date of the PAYEMS series in 'YYYY-mm-dd'
+            format, shown as the update date of the plot
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        frwd_mths_max (int): maximum number of months forward from the peak to
+            allow for the plot, to be seen by zooming out
+        bkwd_mths_max (int): maximum number of months backward from the peak to
+            allow for the plot, to be seen by zooming out
+        image_dir (str): directory of the HTML or image files
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+        image_format (str): 'html' for the Bokeh figure, or 'png', 'svg', or
+            'pdf' for the static image of the main window from
+            static_image.create_usempl_image()
+
+    Other functions and files called by this function:
+        usempl_data.get_peak_indices()
+        usempl_data.align_peaks_long()
+        usempl_npp_bokeh.create_usempl_fig()
+        static_image.create_usempl_image()
+        static_image.save_usempl_image()
+        instrument.stage()
+
+    Files created by this function:
+        images/usempl_npp_[yyyy-mm-dd].[html, png, svg, or pdf]
+
+    Returns:
+        fig_path (str): path of the saved HTML or image file
+    """
+    end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d")
+    usempl_df = batch_data["usempl_df"]
+    rec_df = batch_data["rec_df"]
+    usempl_df = usempl_df.iloc[
+        : np.searchsorted(
+            usempl_df["Date"].to_numpy(), np.datetime64(end_date), "right"
+        )
+    ]
+    if usempl_df.empty:
+        raise ValueError(
+            "The PAYEMS series has no data through " + end_date_str + "."
+        )
+    end_date_str2 = usempl_df["Date"].iloc[-1].strftime("%Y-%m-%d")
+
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    peak_idx = usempl_data.get_peak_indices(
+        usempl_df, maxdate_rng_lst, skip_empty=True
+    )
+    has_peak = peak_idx >= 0
+    usempl_pk_long = usempl_data.align_peaks_long(
+        usempl_df,
+        peak_idx[has_peak],
+        frwd_mths_max,
+        bkwd_mths_max,
+        rec_labels=rec_df["rec_label_yr"][has_peak].tolist(),
+    )
+    rec_label_yrmth_lst = rec_df["rec_label_yrmth"][has_peak].tolist()
+    fig_path = os.path.join(
+        image_dir, "usempl_npp_" + end_date_str2 + "." + image_format
+    )
+    if image_format != "html":
+        with instrument.stage("figure_build") as stage_rec:
+            fig = static_image.create_usempl_image(
+                usempl_pk_long,
+                rec_label_yrmth_lst,
+                end_date,
+                frwd_mths_main,
+                bkwd_mths_main,
+            )
+            stage_rec["rows"] = len(usempl_pk_long)
+        with instrument.stage("image_write") as stage_rec:
+            static_image.save_usempl_image(fig, fig_path, image_format)
+            stage_rec["bytes"] = os.path.getsize(fig_path)
+
+        return fig_path
+
+    with instrument.stage("figure_build") as stage_rec:
+        fig = usempl.create_usempl_fig(
+            usempl_pk_long,
+            rec_label_yrmth_lst,
+            end_date,
+            frwd_mths_main,
+            bkwd_mths_main,
+            frwd_mths_max,
+            bkwd_mths_max,
+            render_mode,
+        )
+        stage_rec["rows"] = len(usempl_pk_long)
+    fig_title = (
+        "Progression of PAYEMS in last "
+        + str(len(rec_label_yrmth_lst))
+        + " recessions"
+    )
+    with instrument.stage("html_write") as stage_rec:
+        with open(fig_path, "w", encoding="utf-8") as html_file:
+            html_file.write(file_html(fig, CDN, fig_title))
+        stage_rec["bytes"] = os.path.getsize(fig_path)
+
+    return fig_path
+
+
+def usempl_npp_batch(
+    end_date_str_lst,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    download_from_internet=True,
+    data_end_date_str=None,
+    rec_file_path=None,
+    image_dir=None,
+    max_workers=None,
+    render_mode="lines",
+    image_format="html",
+):
+    """
+    This function creates the normalized peak plot HTML or image file for
+    each end date in end_date_str_lst. The PAYEMS series is loaded once
+    through the latest end date and sliced for each end date. End dates that
+    fall in the same data month are rendered once, with the latest of those
+    end dates. End dates before the first month of the series raise a
+    ValueError before any figure is rendered.
+
+    Args:
+        end_date_str_lst (list): list of end dates in 'YYYY-mm-dd' format,
+            e.g., the jobs report release dates
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        frwd_mths_max (int): maximum number of months forward from the peak to
+            allow for the plot, to be seen by zooming out
+        bkwd_mths_max (int): maximum number of months backward from the peak to
+            allow for the plot, to be seen by zooming out
+        download_from_internet (bool): =True if download data from St. Louis
+            Federal Reserve's FRED system, otherwise read data in from local
+            directory
+        data_end_date_str (str): end date of the loaded PAYEMS series in
+            'YYYY-mm-dd' format (the usempl_[yyyy-mm-dd].csv file when
+            download_from_internet=False). If None, the latest end date in
+            end_date_str_lst
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        image_dir (str): directory of the HTML or image files. If None, the
+            images folder in this package directory
+        max_workers (int): number of worker processes. If None, the number of
+            processors on the machine. If 1, the figures are rendered serially
+            in this process
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+        image_format (str): 'html', 'png', 'svg', or 'pdf', see
+            render_vintage()
+
+    Other functions and files called by this function:
+        usempl_data.get_usempl_series()
+        usempl_data.get_recession_registry()
+        instrument.stage()
+        init_batch_worker()
+        render_vintage()
+
+    Files created by this function:
+        images/usempl_npp_[yyyy-mm-dd].[html, png, svg, or pdf]
+
+    Returns:
+        fig_path_lst (list): list of paths of the saved HTML or image files
+    """
+    if image_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        image_dir = os.path.join(cur_path, "images")
+    if not os.access(image_dir, os.F_OK):
+        os.makedirs(image_dir)
+    if data_end_date_str is None:
+        data_end_date_str = max(end_date_str_lst)
+    usempl_df, _ = usempl_data.get_usempl_series(
+        data_end_date_str, download_from_internet
+    )
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+
+    # Keep the latest end date of each data month
+    end_date_arr = np.array(sorted(end_date_str_lst), dtype="datetime64[ns]")
+    data_idx = np.searchsorted(
+        usempl_df["Date"].to_numpy(), end_date_arr, "right"
+    )
+    if data_idx[0] == 0:
+        raise ValueError(
+            "The PAYEMS series has no data through the end date(s) "
+            + ", ".join(
+                str(end_date)[:10] for end_date in end_date_arr[data_idx == 0]
+            )
+            + "."
+        )
+    is_last = np.append(data_idx[1:] != data_idx[:-1], True)
+    end_date_str_lst = [
+        str(end_date)[:10] for end_date in end_date_arr[is_last]
+    ]
+
+    render_args = (
+        frwd_mths_main,
+        bkwd_mths_main,
+        frwd_mths_max,
+        bkwd_mths_max,
+        image_dir,
+        render_mode,
+        image_format,
+    )
+    # The rendering of all figures is recorded as the instrument stage
+    # batch_render
+    with instrument.stage("batch_render") as stage_rec:
+        if max_workers == 1:
+            init_batch_worker(usempl_df, rec_df)
+            fig_path_lst = [
+                render_vintage(end_date_str, *render_args)
+                for end_date_str in end_date_str_lst
+            ]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers,
+                initializer=init_batch_worker,
+                initargs=(usempl_df, rec_df),
+            ) as executor:
+                futures = [
+                    executor.submit(render_vintage, end_date_str, *render_args)
+                    for end_date_str in end_date_str_lst
+                ]
+                fig_path_lst = [future.result() for future in futures]
+        stage_rec["rows"] = len(fig_path_lst)
+
+    return fig_path_lst
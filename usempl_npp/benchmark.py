@@ -0,0 +1,484 @@
+"""
+This module benchmarks the normalized peak plot offline. It times the
+alignment of the peaks, the CSV and .npy round trips of the normalized peak
+series, a sweep of 10,000 plot windows, the ColumnDataSource construction,
+and the HTML generation separately, and records the peak memory allocated by each step. It runs on
+the bundled data in usempl_npp/data and on synthetic series with 10 and 100
+times the number of recessions and months of the bundled data. The results
+are saved as JSON and can be compared with the results of an earlier commit
+to flag regressions.
+
+Usage:
+    python -m usempl_npp.benchmark --out bench.json [--baseline old.json]
+        [--scales 1 10 100] [--num-reps 5] [--max-ratio 1.5]
+
+This module defines the following function(s):
+    make_synthetic_series()
+    time_step()
+    benchmark_case()
+    run_benchmarks()
+    compare_benchmarks()
+    main()
+"""
+
+# Import packages
+import argparse
+import datetime as dt
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import bokeh
+from bokeh.embed import file_html
+from bokeh.models import ColumnDataSource
+from bokeh.resources import CDN
+from usempl_npp import usempl_data
+from usempl_npp import usempl_npp_bokeh
+from usempl_npp import window_sweep
+
+# Longest synthetic series, in months, that fits in the datetime64[ns] range
+# (1677-09-21 to 2262-04-11) used by the alignment engine
+MAX_SYNTH_MTHS = 7000
+
+# Number of (bkwd, frwd) plot windows of the window sweep step
+NUM_SWEEP_WINDOWS = 10000
+
+"""
+Define functions
+"""
+
+
+def make_synthetic_series(num_rec, num_mths, seed=25):
+    """
+    This function creates a synthetic monthly PAYEMS-like random walk and
+    num_rec evenly spaced three-month peak search windows over it.
+
+    Args:
+        num_rec (int): number of recessions
+        num_mths (int): number of months of the series, at most
+            MAX_SYNTH_MTHS
+        seed (int): seed of the random number generator
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        usempl_df (DataFrame): series with columns Date and PAYEMS
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date of each peak search window
+        rec_label_lst (list): list of recession labels
+    """
+    rng = np.random.default_rng(seed)
+    usempl_df = pd.DataFrame(
+        {
+            "Date": pd.date_range("1678-01-01", periods=num_mths, freq="MS"),
+            "PAYEMS": 1000.0 + rng.normal(0.0, 5.0, num_mths).cumsum(),
+        }
+    )
+    win_beg = np.linspace(0, num_mths - 3, num_rec).astype(int)
+    maxdate_rng_lst = [
+        (
+            usempl_df["Date"].iloc[beg].strftime("%Y-%m-%d"),
+            usempl_df["Date"].iloc[beg + 2].strftime("%Y-%m-%d"),
+        )
+        for beg in win_beg
+    ]
+    rec_label_lst = ["rec" + str(i) for i in range(num_rec)]
+
+    return usempl_df, maxdate_rng_lst, rec_label_lst
+
+
+def time_step(step_func, num_reps=5):
+    """
+    This function times a benchmark step and measures the peak memory that
+    it allocates.
+
+    Args:
+        step_func (function): function with no arguments to benchmark
+        num_reps (int): number of timed repetitions
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        step_result (dict): dictionary with the best wall time in seconds
+            (secs), the median wall time (median_secs), and the peak memory
+            in MB allocated by one call (peak_mb)
+        step_out: output of the last call of step_func
+    """
+    step_secs = []
+    for _ in range(num_reps):
+        start_time = time.perf_counter()
+        step_out = step_func()
+        step_secs.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    step_func()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    step_result = {
+        "secs": min(step_secs),
+        "median_secs": float(np.median(step_secs)),
+        "peak_mb": peak_bytes / 1e6,
+    }
+
+    return step_result, step_out
+
+
+def benchmark_case(
+    usempl_df,
+    maxdate_rng_lst,
+    rec_label_lst,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    num_reps=5,
+    render_mode="lines",
+):
+    """
+    This function runs the benchmark steps on one series: peak alignment
+    (wide and long), the CSV and .npy round trips of the wide normalized
+    peak DataFrame, the range index build and sweep of NUM_SWEEP_WINDOWS
+    random plot windows, the per-recession ColumnDataSource construction,
+    and the HTML generation of the figure.
+
+    Args:
+        usempl_df (DataFrame): series with columns Date and PAYEMS
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date of each peak search window
+        rec_label_lst (list): list of recession labels
+        frwd_mths_max (int): maximum number of months forward from the peak
+        bkwd_mths_max (int): maximum number of months backward from the peak
+        num_reps (int): number of timed repetitions of each step
+        render_mode (str): render mode of the figure, see
+            usempl_npp_bokeh.create_usempl_fig()
+
+    Other functions and files called by this function:
+        time_step()
+        usempl_data.get_peak_indices()
+        usempl_data.align_peaks()
+        usempl_data.align_peaks_long()
+        usempl_data.write_usempl_pk()
+        usempl_data.read_usempl_pk()
+        usempl_data.get_recession_groups()
+        window_sweep.get_sweep_matrix()
+        window_sweep.build_range_index()
+        window_sweep.sweep_windows()
+        usempl_npp_bokeh.create_usempl_fig()
+
+    Files created by this function: None (temporary .npy file only)
+
+    Returns:
+        case_result (dict): dictionary with the size of the case and the
+            step results of time_step() by step name
+    """
+    case_result = {
+        "num_rec": len(maxdate_rng_lst),
+        "num_mths": len(usempl_df),
+        "frwd_mths_max": frwd_mths_max,
+        "bkwd_mths_max": bkwd_mths_max,
+    }
+
+    def align_wide():
+        peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+        return usempl_data.align_peaks(
+            usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+        )[0]
+
+    def align_long():
+        peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+        return usempl_data.align_peaks_long(
+            usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max, rec_label_lst
+        )
+
+    case_result["align_wide"], usempl_pk = time_step(align_wide, num_reps)
+    case_result["align_long"], usempl_pk_long = time_step(align_long, num_reps)
+
+    def csv_round_trip():
+        csv_buffer = io.StringIO()
+        usempl_pk.to_csv(csv_buffer, index=False)
+        csv_buffer.seek(0)
+        return pd.read_csv(
+            csv_buffer,
+            parse_dates=[
+                col for col in usempl_pk.columns if col.startswith("Date")
+            ],
+        )
+
+    case_result["csv_round_trip"], _ = time_step(csv_round_trip, num_reps)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bin_path = os.path.join(tmp_dir, "usempl_pk.npy")
+
+        def npy_round_trip():
+            usempl_data.write_usempl_pk(usempl_pk, bin_path)
+            return usempl_data.read_usempl_pk(bin_path, mmap=False)
+
+        case_result["npy_round_trip"], _ = time_step(npy_round_trip, num_reps)
+
+    sweep_rng = np.random.default_rng(25)
+    sweep_bkwd = sweep_rng.integers(0, bkwd_mths_max + 1, NUM_SWEEP_WINDOWS)
+    sweep_frwd = sweep_rng.integers(0, frwd_mths_max + 1, NUM_SWEEP_WINDOWS)
+
+    def sweep():
+        range_index = window_sweep.build_range_index(
+            *window_sweep.get_sweep_matrix(usempl_pk)
+        )
+        return window_sweep.sweep_windows(range_index, sweep_bkwd, sweep_frwd)
+
+    case_result["window_sweep"], _ = time_step(sweep, num_reps)
+
+    def build_cds():
+        return [
+            ColumnDataSource(
+                usempl_pk_rec[
+                    ["mths_frm_peak", "Date", "PAYEMS", "usempl_dv_pk"]
+                ]
+            )
+            for usempl_pk_rec in usempl_data.get_recession_groups(
+                usempl_pk_long
+            ).values()
+        ]
+
+    case_result["cds"], _ = time_step(build_cds, num_reps)
+
+    def build_html():
+        fig = usempl_npp_bokeh.create_usempl_fig(
+            usempl_pk_long,
+            rec_label_lst,
+            dt.datetime(2023, 7, 1),
+            frwd_mths_max=frwd_mths_max,
+            bkwd_mths_max=bkwd_mths_max,
+            render_mode=render_mode,
+        )
+        return file_html(fig, CDN, "usempl_npp")
+
+    case_result["html"], html = time_step(build_html, num_reps)
+    case_result["html"]["bytes"] = len(html)
+
+    return case_result
+
+
+def run_benchmarks(
+    scale_lst=(1, 10, 100), num_reps=5, render_mode="lines", out_path=None
+):
+    """
+    This function runs the benchmark on the bundled 2023-07-01 data and on
+    synthetic series with scale times the 15 recessions and the number of
+    months of the bundled series. Synthetic series longer than
+    MAX_SYNTH_MTHS months are cut to MAX_SYNTH_MTHS months.
+
+    Args:
+        scale_lst (list): list of scale factors of the synthetic series
+        num_reps (int): number of timed repetitions of each step
+        render_mode (str): render mode of the figure, see
+            usempl_npp_bokeh.create_usempl_fig()
+        out_path (str): path of the JSON results file. If None, the results
+            are not saved
+
+    Other functions and files called by this function:
+        usempl_data.get_usempl_series()
+        usempl_data.get_recession_registry()
+        make_synthetic_series()
+        benchmark_case()
+
+    Files created by this function:
+        [out_path].json
+
+    Returns:
+        bench (dict): dictionary with the run metadata (meta) and the case
+            results of benchmark_case() by case name (results)
+    """
+    usempl_df, _ = usempl_data.get_usempl_series("2023-07-01", False)
+    rec_df = usempl_data.get_recession_registry()
+    maxdate_rng_lst = list(
+        zip(
+            rec_df["peak_search_beg"].dt.strftime("%Y-%m-%d"),
+            rec_df["peak_search_end"].dt.strftime("%Y-%m-%d"),
+        )
+    )
+    results = {
+        "bundled": benchmark_case(
+            usempl_df,
+            maxdate_rng_lst,
+            rec_df["rec_label_yr"].tolist(),
+            num_reps=num_reps,
+            render_mode=render_mode,
+        )
+    }
+    for scale in scale_lst:
+        case_name = "synthetic_x" + str(scale)
+        print("Benchmarking", case_name)
+        results[case_name] = benchmark_case(
+            *make_synthetic_series(
+                15 * scale, min(len(usempl_df) * scale, MAX_SYNTH_MTHS)
+            ),
+            num_reps=num_reps,
+            render_mode=render_mode,
+        )
+
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.split(os.path.abspath(__file__))[0],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        git_commit = ""
+    bench = {
+        "meta": {
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "bokeh": bokeh.__version__,
+            "machine": platform.machine(),
+            "num_reps": num_reps,
+            "render_mode": render_mode,
+        },
+        "results": results,
+    }
+    if out_path is not None:
+        with open(out_path, "w", encoding="utf-8") as out_file:
+            json.dump(bench, out_file, indent=2)
+
+    return bench
+
+
+def compare_benchmarks(bench, bench_base, max_ratio=1.5, min_secs=0.001):
+    """
+    This function compares benchmark results with baseline results, e.g.,
+    from an earlier commit, and lists the steps that became slower or use
+    more memory by more than the factor max_ratio. Steps faster than
+    min_secs in the baseline are only compared on memory, since their wall
+    times are dominated by noise.
+
+    Args:
+        bench (dict): benchmark results from run_benchmarks()
+        bench_base (dict): baseline benchmark results from run_benchmarks()
+        max_ratio (float): largest allowed ratio of new to baseline wall time
+            or peak memory
+        min_secs (float): smallest baseline wall time that is compared
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        regressions (list): list of tuples (case name, step name, metric,
+            baseline value, new value) of each regression
+    """
+    regressions = []
+    for case_name, case_result in bench["results"].items():
+        case_base = bench_base["results"].get(case_name)
+        if case_base is None:
+            continue
+        for step_name, step_result in case_result.items():
+            step_base = case_base.get(step_name)
+            if not isinstance(step_result, dict) or step_base is None:
+                continue
+            for metric in ["secs", "peak_mb"]:
+                if metric == "secs" and step_base[metric] < min_secs:
+                    continue
+                if step_result[metric] > max_ratio * step_base[metric]:
+                    regressions.append(
+                        (
+                            case_name,
+                            step_name,
+                            metric,
+                            step_base[metric],
+                            step_result[metric],
+                        )
+                    )
+
+    return regressions
+
+
+def main(argv=None):
+    """
+    This function is the command line interface of the benchmark. It prints
+    the results, saves them as JSON, and exits with status 1 if a baseline is
+    given and a step regressed.
+
+    Args:
+        argv (list): list of command line arguments. If None, sys.argv[1:]
+
+    Other functions and files called by this function:
+        run_benchmarks()
+        compare_benchmarks()
+
+    Files created by this function:
+        [out].json
+
+    Returns:
+        regressions (list): list of regressions from compare_benchmarks()
+    """
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the normalized peak plot"
+    )
+    parser.add_argument("--out", help="path of the JSON results file")
+    parser.add_argument("--baseline", help="path of baseline JSON results")
+    parser.add_argument("--scales", type=int, nargs="*", default=[1, 10, 100])
+    parser.add_argument("--num-reps", type=int, default=5)
+    parser.add_argument("--max-ratio", type=float, default=1.5)
+    parser.add_argument(
+        "--render-mode",
+        choices=["lines", "multi_line", "compact"],
+        default="lines",
+    )
+    args = parser.parse_args(argv)
+
+    bench = run_benchmarks(
+        args.scales, args.num_reps, args.render_mode, args.out
+    )
+    for case_name, case_result in bench["results"].items():
+        print(
+            case_name,
+            "(" + str(case_result["num_rec"]),
+            "recessions,",
+            str(case_result["num_mths"]),
+            "months)",
+        )
+        for step_name, step_result in case_result.items():
+            if isinstance(step_result, dict):
+                print(
+                    "   ",
+                    step_name,
+                    round(1000 * step_result["secs"], 2),
+                    "ms,",
+                    round(step_result["peak_mb"], 2),
+                    "MB",
+                )
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as base_file:
+            bench_base = json.load(base_file)
+        regressions = compare_benchmarks(bench, bench_base, args.max_ratio)
+        for case_name, step_name, metric, base_val, new_val in regressions:
+            print(
+                "Regression in",
+                case_name,
+                step_name,
+                metric + ":",
+                round(base_val, 4),
+                "->",
+                round(new_val, 4),
+            )
+
+    return regressions
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    if main():
+        sys.exit(1)
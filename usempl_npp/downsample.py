@@ -0,0 +1,230 @@
+"""
+This module downsamples the lines of the normalized peak plot to a budget
+of points per line while keeping their shape, so that series observed
+weekly or daily (thousands of points per recession) can be drawn in the
+browser without sending every point. Two methods are available: the
+Largest-Triangle-Three-Buckets (LTTB) method, which keeps in each bucket of
+points the point that spans the largest triangle with the points kept in
+the neighboring buckets, and min/max decimation, which keeps the minimum and
+the maximum of each bucket. Both methods keep the first and last point of
+each line. The full-resolution points are restored in the browser on
+zoom-in, see usempl_npp_bokeh.create_usempl_fig().
+
+This module defines the following function(s):
+    get_lttb_indices()
+    get_minmax_indices()
+    downsample_long()
+    get_detail_data()
+"""
+
+# Import packages
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+"""
+Define functions
+"""
+
+
+def get_lttb_indices(x_vals, y_vals, num_points):
+    """
+    This function selects num_points points of a line with the
+    Largest-Triangle-Three-Buckets method. The interior points are split
+    into num_points - 2 buckets of consecutive points, and from each bucket
+    the point is kept that forms the largest triangle with the point kept in
+    the previous bucket and the average point of the next bucket.
+
+    Args:
+        x_vals (array_like): (N,) float array of increasing x-values
+        y_vals (array_like): (N,) float array of y-values
+        num_points (int): number of points to keep, at least 3
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        keep_idx (array_like): (min(N, num_points),) increasing integer array
+            of the indices of the kept points
+    """
+    x_vals = np.asarray(x_vals, dtype=np.float64)
+    y_vals = np.asarray(y_vals, dtype=np.float64)
+    num_obs = len(x_vals)
+    if num_points >= num_obs:
+        return np.arange(num_obs)
+    if num_points < 3:
+        raise ValueError("num_points must be at least 3.")
+
+    # Bucket k holds the points bucket_beg[k] to bucket_beg[k + 1] - 1, and
+    # the last bucket is the last point
+    num_buckets = num_points - 2
+    bucket_beg = np.append(
+        1
+        + np.floor(
+            np.arange(num_buckets + 1) * (num_obs - 2) / num_buckets
+        ).astype(np.int64),
+        num_obs,
+    )
+    bucket_size = np.diff(bucket_beg)
+    avg_x = np.add.reduceat(x_vals, bucket_beg[:-1]) / bucket_size
+    avg_y = np.add.reduceat(y_vals, bucket_beg[:-1]) / bucket_size
+
+    keep_idx = np.empty(num_points, dtype=np.int64)
+    keep_idx[0] = 0
+    keep_idx[-1] = num_obs - 1
+    prev_idx = 0
+    for k in range(num_buckets):
+        beg, end = bucket_beg[k], bucket_beg[k + 1]
+        prev_x = x_vals[prev_idx]
+        prev_y = y_vals[prev_idx]
+        tri_area = np.abs(
+            (prev_x - avg_x[k + 1]) * (y_vals[beg:end] - prev_y)
+            - (prev_x - x_vals[beg:end]) * (avg_y[k + 1] - prev_y)
+        )
+        prev_idx = beg + int(np.argmax(tri_area))
+        keep_idx[k + 1] = prev_idx
+
+    return keep_idx
+
+
+def get_minmax_indices(x_vals, y_vals, num_points):
+    """
+    This function selects at most num_points points of a line by min/max
+    decimation. The points are split into (num_points - 2) // 2 buckets of
+    consecutive points, and the minimum and maximum of each bucket are kept
+    with the first and last point, so that no peak or trough is lost.
+
+    Args:
+        x_vals (array_like): (N,) float array of increasing x-values
+        y_vals (array_like): (N,) float array of y-values
+        num_points (int): maximum number of points to keep, at least 4
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        keep_idx (array_like): increasing integer array of the indices of
+            the kept points, at most min(N, num_points) of them
+    """
+    y_vals = np.asarray(y_vals, dtype=np.float64)
+    num_obs = len(x_vals)
+    if num_points >= num_obs:
+        return np.arange(num_obs)
+    if num_points < 4:
+        raise ValueError("num_points must be at least 4.")
+
+    # Equal buckets of bucket_size points, the last one padded with NaN
+    num_buckets = (num_points - 2) // 2
+    bucket_size = -(-num_obs // num_buckets)
+    num_buckets = -(-num_obs // bucket_size)
+    y_buckets = np.full(num_buckets * bucket_size, np.nan)
+    y_buckets[:num_obs] = y_vals
+    y_buckets = y_buckets.reshape(num_buckets, bucket_size)
+    bucket_beg = np.arange(num_buckets) * bucket_size
+    keep_idx = np.unique(
+        np.concatenate(
+            [
+                [0, num_obs - 1],
+                bucket_beg + np.nanargmin(y_buckets, axis=1),
+                bucket_beg + np.nanargmax(y_buckets, axis=1),
+            ]
+        )
+    )
+
+    return keep_idx
+
+
+def downsample_long(
+    usempl_pk_long,
+    max_points,
+    method="lttb",
+    x_col="mths_frm_peak",
+    y_col="usempl_dv_pk",
+):
+    """
+    This function downsamples each recession of the long normalized peak
+    DataFrame with more than max_points rows to at most max_points rows.
+    The rows of each recession stay contiguous and in order.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame with the
+            rows of each recession contiguous and sorted by x_col
+        max_points (int): maximum number of points per recession
+        method (str): 'lttb' for get_lttb_indices() or 'minmax' for
+            get_minmax_indices()
+        x_col (str): name of the x-value column
+        y_col (str): name of the y-value column
+
+    Other functions and files called by this function:
+        get_lttb_indices()
+        get_minmax_indices()
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk_down (DataFrame): downsampled long normalized peak
+            DataFrame with the columns of usempl_pk_long
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(
+            "method must be 'lttb' or 'minmax', not " + repr(method)
+        )
+    get_indices = get_lttb_indices if method == "lttb" else get_minmax_indices
+    rec_codes = usempl_pk_long["recession_id"].cat.codes.to_numpy()
+    num_rec = len(usempl_pk_long["recession_id"].cat.categories)
+    rec_bounds = np.searchsorted(rec_codes, np.arange(num_rec + 1))
+    x_vals = usempl_pk_long[x_col].to_numpy(dtype=np.float64)
+    y_vals = usempl_pk_long[y_col].to_numpy(dtype=np.float64)
+    keep_pos = [
+        rec_beg
+        + get_indices(
+            x_vals[rec_beg:rec_end], y_vals[rec_beg:rec_end], max_points
+        )
+        for rec_beg, rec_end in zip(rec_bounds[:-1], rec_bounds[1:])
+    ]
+    usempl_pk_down = usempl_pk_long.iloc[np.concatenate(keep_pos)]
+
+    return usempl_pk_down
+
+
+def get_detail_data(usempl_pk_long, rec_cols):
+    """
+    This function packs the full-resolution columns of each recession into
+    the JSON-serializable layout that the zoom callback of
+    usempl_npp_bokeh.create_usempl_fig() loads from its detail_url, one list
+    per recession for each column. Dates are given in milliseconds since the
+    epoch, as Bokeh sends them to the browser, and float32 values with the
+    fewest decimals that identify them.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame
+        rec_cols (list): list of the column names to pack
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        detail_data (dict): dictionary with the column names as keys and
+            lists of one list of values per recession as values
+    """
+    rec_codes = usempl_pk_long["recession_id"].cat.codes.to_numpy()
+    num_rec = len(usempl_pk_long["recession_id"].cat.categories)
+    rec_bounds = np.searchsorted(rec_codes, np.arange(num_rec + 1))
+    detail_data = {}
+    for rec_col in rec_cols:
+        col_vals = usempl_pk_long[rec_col].to_numpy()
+        if np.issubdtype(col_vals.dtype, np.datetime64):
+            col_vals = col_vals.astype("datetime64[ms]").astype(np.int64)
+        elif col_vals.dtype == np.float32:
+            # Shortest decimals that round-trip to the same float32 values
+            col_vals = col_vals.astype(str).astype(np.float64)
+        col_vals = col_vals.tolist()
+        detail_data[rec_col] = [
+            col_vals[rec_beg:rec_end]
+            for rec_beg, rec_end in zip(rec_bounds[:-1], rec_bounds[1:])
+        ]
+
+    return detail_data
@@ -0,0 +1,337 @@
+"""
+This module keeps a persistent local copy of monthly FRED time series (e.g.,
+PAYEMS) and updates it incrementally. Each call asks FRED only for the
+observations after the last cached month (plus a short overlap to pick up
+BLS revisions to recent months), merges them into the local copy, and
+rewrites the cache file only if something changed. The cache file is shared
+across calls and processes, and its parsed contents are memoized within a
+process until the file changes on disk. By default the series are downloaded
+with fred_client.py, which sends the validators of the last download along
+with each request, so that an unchanged series costs only an empty 304
+response.
+
+This module defines the following function(s):
+    get_cache_path()
+    read_cache()
+    write_cache()
+    read_validators()
+    write_validators()
+    get_release_date()
+    get_fred_series()
+"""
+
+# Import packages
+import datetime as dt
+import email.utils
+import json
+import os
+import pandas as pd
+from usempl_npp import instrument
+
+# Start date of the first download of a series, so that the cache always holds
+# the full history of the series
+FRED_START_DATE = dt.datetime(1900, 1, 1)
+
+# In-process memo of parsed cache files, keyed by cache file path with the
+# file's (mtime_ns, size) signature so that writes by other processes are seen
+_cache_memo = {}
+
+"""
+Define functions
+"""
+
+
+def get_cache_path(series_id, cache_dir=None):
+    """
+    This function returns the path of the cache file of a FRED series and
+    makes sure that the cache directory exists.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        cache_dir (str): directory of the cache files. If None, the cache is
+            kept in data/fred_cache in this package directory
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        cache_path (str): path of the cache file fred_cache/[series_id].csv
+    """
+    if cache_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        cache_dir = os.path.join(cur_path, "data", "fred_cache")
+    if not os.access(cache_dir, os.F_OK):
+        os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, series_id + ".csv")
+
+    return cache_path
+
+
+def read_cache(cache_path, series_id):
+    """
+    This function reads a cached FRED series, reusing the parsed DataFrame
+    from an earlier call in this process if the file has not changed since.
+
+    Args:
+        cache_path (str): path of the cache file
+        series_id (str): FRED series ID, used as the value column name
+
+    Other functions and files called by this function:
+        fred_cache/[series_id].csv
+
+    Files created by this function: None
+
+    Returns:
+        cache_df (DataFrame): cached series with columns Date and series_id,
+            sorted from old to new, empty if there is no cache file yet
+    """
+    if not os.access(cache_path, os.F_OK):
+        return pd.DataFrame(
+            {
+                "Date": pd.Series(dtype="datetime64[ns]"),
+                series_id: pd.Series(dtype=float),
+            }
+        )
+    stat = os.stat(cache_path)
+    file_sig = (stat.st_mtime_ns, stat.st_size)
+    memo = _cache_memo.get(cache_path)
+    if memo is not None and memo[0] == file_sig:
+        return memo[1]
+    cache_df = pd.read_csv(
+        cache_path,
+        names=["Date", series_id],
+        parse_dates=["Date"],
+        skiprows=1,
+        na_values=[".", "na", "NaN"],
+        dtype={series_id: float},
+    )
+    _cache_memo[cache_path] = (file_sig, cache_df)
+
+    return cache_df
+
+
+def write_cache(cache_df, cache_path):
+    """
+    This function writes a cached FRED series to disk. The file is written to
+    a temporary file first and then moved into place, so that other
+    processes never read a partially written cache.
+
+    Args:
+        cache_df (DataFrame): series with columns Date and series ID
+        cache_path (str): path of the cache file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        fred_cache/[series_id].csv
+
+    Returns: None
+    """
+    tmp_path = cache_path + "." + str(os.getpid()) + ".tmp"
+    cache_df.to_csv(tmp_path, index=False, date_format="%Y-%m-%d")
+    os.replace(tmp_path, cache_path)
+    stat = os.stat(cache_path)
+    _cache_memo[cache_path] = ((stat.st_mtime_ns, stat.st_size), cache_df)
+
+
+def read_validators(cache_path):
+    """
+    This function reads the HTTP validators (ETag and Last-Modified) of the
+    last download of a cached FRED series.
+
+    Args:
+        cache_path (str): path of the cache file
+
+    Other functions and files called by this function:
+        fred_cache/[series_id].json
+
+    Files created by this function: None
+
+    Returns:
+        validators (dict): dictionary with the etag and last_modified values,
+            empty if there are none
+    """
+    validators_path = os.path.splitext(cache_path)[0] + ".json"
+    if not os.access(validators_path, os.F_OK):
+        return {}
+    with open(validators_path, "r", encoding="utf-8") as validators_file:
+        validators = json.load(validators_file)
+
+    return validators
+
+
+def write_validators(validators, cache_path):
+    """
+    This function saves the HTTP validators of the last download of a FRED
+    series next to its cache file.
+
+    Args:
+        validators (dict): dictionary with the etag and last_modified values
+        cache_path (str): path of the cache file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        fred_cache/[series_id].json
+
+    Returns: None
+    """
+    validators_path = os.path.splitext(cache_path)[0] + ".json"
+    tmp_path = validators_path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as validators_file:
+        json.dump(validators, validators_file)
+    os.replace(tmp_path, validators_path)
+
+
+def get_release_date(series_id="PAYEMS", cache_dir=None):
+    """
+    This function returns the date on which FRED last changed a cached
+    series, from the Last-Modified validator of its last download. This is
+    the vintage date of the cached series, unlike the download date.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        cache_dir (str): directory of the cache files. If None, the cache is
+            kept in data/fred_cache in this package directory
+
+    Other functions and files called by this function:
+        get_cache_path()
+        read_validators()
+
+    Files created by this function: None
+
+    Returns:
+        release_date (date): date (UTC) of the Last-Modified validator, or
+            None if FRED did not report one
+    """
+    last_modified = read_validators(get_cache_path(series_id, cache_dir)).get(
+        "last_modified"
+    )
+    if not last_modified:
+        return None
+    try:
+        release_date = email.utils.parsedate_to_datetime(last_modified).date()
+    except (TypeError, ValueError):
+        return None
+
+    return release_date
+
+
+def get_fred_series(
+    series_id="PAYEMS",
+    start_date=dt.datetime(1939, 1, 1),
+    end_date=None,
+    cache_dir=None,
+    revision_mths=2,
+    reader=None,
+    fred_url=None,
+):
+    """
+    This function returns a monthly FRED series from start_date through
+    end_date, downloading only the observations that are not yet in the
+    local cache. The first call for a series downloads its full history. If
+    the cache already extends through end_date, no request is sent at all.
+    Otherwise FRED is asked only for the months after the last cached month,
+    starting revision_mths months earlier so that revisions to the most
+    recent months replace the cached values. With the default FRED client,
+    the full series is requested conditionally instead: if it has not changed
+    since the last download, FRED sends an empty 304 response and nothing is
+    parsed or written; otherwise the downloaded series replaces the cache,
+    including any revisions of older months. A download is recorded as the
+    instrument stage 'fred_fetch' with the series ID, whether the series was
+    unchanged, and the bytes received.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        start_date (datetime): first date of the returned series
+        end_date (datetime): last date of the returned series. If None, the
+            series runs through the most recent available month
+        cache_dir (str): directory of the cache files. If None, the cache is
+            kept in data/fred_cache in this package directory
+        revision_mths (int): number of most recent cached months to download
+            again to pick up data revisions
+        reader (class): FRED reader class with the pandas_datareader
+            FredReader interface, reader(symbols=, start=, end=).read(). If
+            None, the conditional download of fred_client.fetch_fred_csv() is
+            used
+        fred_url (str): URL of the FRED CSV download used when reader is
+            None. If None, fred_client.FRED_CSV_URL
+
+    Other functions and files called by this function:
+        get_cache_path()
+        read_cache()
+        write_cache()
+        read_validators()
+        write_validators()
+        instrument.stage()
+        fred_client.fetch_fred_csv()
+        fred_cache/[series_id].csv
+
+    Files created by this function:
+        fred_cache/[series_id].csv
+        fred_cache/[series_id].json
+
+    Returns:
+        series_df (DataFrame): series with columns Date and series_id from
+            start_date through end_date, sorted from old to new
+    """
+    if end_date is None:
+        end_date = dt.datetime.today()
+    start_date = pd.Timestamp(start_date)
+    end_date = pd.Timestamp(end_date)
+    cache_path = get_cache_path(series_id, cache_dir)
+    cache_df = read_cache(cache_path, series_id)
+
+    if cache_df.empty:
+        fetch_start = FRED_START_DATE
+    elif cache_df["Date"].iloc[-1] >= end_date:
+        fetch_start = None
+    else:
+        fetch_start = cache_df["Date"].iloc[-1] - pd.DateOffset(
+            months=revision_mths
+        )
+
+    if fetch_start is not None and reader is None:
+        # Imported here so that reading the cache does not load requests,
+        # which only a download needs
+        from usempl_npp import fred_client
+
+        # Send the validators only if there is a cache that they describe
+        validators = read_validators(cache_path) if not cache_df.empty else {}
+        with instrument.stage("fred_fetch", series_id=series_id) as stage_rec:
+            new_df, new_validators, num_bytes = fred_client.fetch_fred_csv(
+                series_id, validators, fred_url
+            )
+            stage_rec["unchanged"] = new_df is None
+            stage_rec["bytes"] = num_bytes
+            if new_df is not None:
+                stage_rec["rows"] = len(new_df)
+        if new_df is not None:
+            if not new_df.equals(cache_df):
+                write_cache(new_df, cache_path)
+            write_validators(new_validators, cache_path)
+            cache_df = new_df
+    elif fetch_start is not None:
+        # Download only the new (and recently revised) months
+        new_df = reader(symbols=series_id, start=fetch_start, end=end_date)
+        new_df = pd.DataFrame(new_df.read()).sort_index()
+        new_df = new_df.rename_axis("Date").reset_index()
+        new_df.columns = ["Date", series_id]
+        new_df[series_id] = new_df[series_id].astype(float)
+        new_df = new_df.dropna()
+        merged_df = pd.concat(
+            [cache_df[cache_df["Date"] < fetch_start], new_df],
+            ignore_index=True,
+        )
+        merged_df = merged_df.drop_duplicates(subset="Date", keep="last")
+        merged_df = merged_df.reset_index(drop=True)
+        if not merged_df.equals(cache_df):
+            write_cache(merged_df, cache_path)
+        cache_df = merged_df
+
+    series_df = cache_df[
+        (cache_df["Date"] >= start_date) & (cache_df["Date"] <= end_date)
+    ].reset_index(drop=True)
+
+    return series_df
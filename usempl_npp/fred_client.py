@@ -0,0 +1,152 @@
+"""
+This module downloads monthly series from the St. Louis Federal Reserve's
+FRED system (https://fred.stlouisfed.org) as CSV files. Requests go through
+one pooled HTTP session per process, so that repeated downloads reuse open
+connections. Failed requests are retried with exponential backoff. Each
+download returns the ETag and Last-Modified validators of the response, and
+a request that sends them back is answered by FRED with an empty 304 Not
+Modified response if the series has not changed since.
+
+This module defines the following function(s):
+    get_session()
+    fetch_fred_csv()
+"""
+
+# Import packages
+import io
+import os
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# FRED CSV download URL, the one that pandas_datareader's FredReader uses
+FRED_CSV_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv"
+
+# Retries of failed requests. The wait before the k-th retry is
+# BACKOFF_FACTOR * 2 ** (k - 1) seconds, or the server's Retry-After time
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Pooled sessions by (process ID, max_retries, backoff_factor), so that a
+# forked worker process never shares the connections of its parent
+_session_pool = {}
+
+"""
+Define functions
+"""
+
+
+def get_session(max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    This function returns the pooled HTTP session of this process, creating
+    it on first use.
+
+    Args:
+        max_retries (int): maximum number of retries of a failed request
+        backoff_factor (float): backoff factor in seconds of the waits
+            between retries
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        session (requests.Session): pooled HTTP session with retries
+    """
+    session_key = (os.getpid(), max_retries, backoff_factor)
+    session = _session_pool.get(session_key)
+    if session is None:
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=16, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session_pool[session_key] = session
+
+    return session
+
+
+def fetch_fred_csv(
+    series_id,
+    validators=None,
+    fred_url=None,
+    timeout=30,
+    session=None,
+    vintage_date=None,
+):
+    """
+    This function downloads the full history of a FRED series as CSV, or
+    of the vintage of the series on vintage_date. If validators from an
+    earlier download are given and FRED answers 304 Not Modified, nothing is
+    transferred or parsed and series_df is None.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        validators (dict): dictionary with the etag and last_modified values
+            of an earlier download. If None, the series is always downloaded
+        fred_url (str): URL of the FRED CSV download. If None, FRED_CSV_URL
+        timeout (float): timeout in seconds of each connection attempt and
+            read
+        session (requests.Session): HTTP session. If None, the pooled session
+            from get_session()
+        vintage_date (str): vintage date in 'YYYY-mm-dd' format of the series
+            as it was published on that date. If None, the current series
+
+    Other functions and files called by this function:
+        get_session()
+
+    Files created by this function: None
+
+    Returns:
+        series_df (DataFrame): series with columns Date and series_id, sorted
+            from old to new, or None if the series has not changed
+        validators (dict): dictionary with the etag and last_modified values
+            of this download, to be sent with the next request
+        num_bytes (int): number of bytes of the response body
+    """
+    if fred_url is None:
+        fred_url = FRED_CSV_URL
+    if session is None:
+        session = get_session()
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    params = {"id": series_id}
+    if vintage_date is not None:
+        params["vintage_date"] = vintage_date
+    resp = session.get(
+        fred_url, params=params, headers=headers, timeout=timeout
+    )
+    if resp.status_code == 304:
+        return None, validators, 0
+    resp.raise_for_status()
+
+    series_df = pd.read_csv(
+        io.BytesIO(resp.content),
+        names=["Date", series_id],
+        parse_dates=["Date"],
+        skiprows=1,
+        na_values=[".", "na", "NaN"],
+    )
+    series_df[series_id] = series_df[series_id].astype(float)
+    series_df = series_df.dropna().sort_values(by="Date")
+    series_df = series_df.reset_index(drop=True)
+    validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+
+    return series_df, validators, len(resp.content)
@@ -0,0 +1,228 @@
+"""
+This module records the wall time, rows processed, and bytes written of the
+stages of the normalized peak plot (download, annual merge, backcast
+splice, alignment, CSV and binary writes, figure build, HTML write).
+Code marks a stage with the stage() context manager. The records of all
+stages that run inside a record_stages() block are collected into a
+machine-readable report, and every record is also passed to the registered
+stage callbacks, e.g., to write them to a production log. A record_stages()
+block can optionally run cProfile and tracemalloc.
+
+The active reports and the stage callbacks are context variables, so a
+stage is only recorded by the reports and callbacks of its own thread (or
+asyncio task). Stages of the refresh and request threads of the plot
+service therefore never leak into a report opened in another thread. Code
+that hands work to another thread can carry them along by running it in
+contextvars.copy_context(), as asyncio.to_thread() does.
+
+Example:
+    from usempl_npp import instrument, usempl_data
+
+    with instrument.record_stages(trace_memory=True) as report:
+        usempl_data.get_usempl_data(end_date_str="2023-07-01",
+                                    download_from_internet=False)
+    instrument.write_report(report, "usempl_report.json")
+
+This module defines the following function(s):
+    add_stage_callback()
+    remove_stage_callback()
+    stage()
+    record_stages()
+    write_report()
+"""
+
+# Import packages
+import contextlib
+import contextvars
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+
+# Reports of the active record_stages() blocks of the current context,
+# innermost last
+_active_reports = contextvars.ContextVar("active_reports", default=())
+
+# Functions of the current context that are called with the record of every
+# finished stage
+_stage_callbacks = contextvars.ContextVar("stage_callbacks", default=())
+
+"""
+Define functions
+"""
+
+
+def add_stage_callback(callback):
+    """
+    This function registers a function that is called with the record of
+    every finished stage of the current thread or asyncio task (and of the
+    threads and tasks it starts afterwards with a copy of its context),
+    whether or not a record_stages() block is active.
+
+    Args:
+        callback (function): function of one argument, the stage record
+            dictionary (see stage())
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns: None
+    """
+    if callback not in _stage_callbacks.get():
+        _stage_callbacks.set(_stage_callbacks.get() + (callback,))
+
+
+def remove_stage_callback(callback):
+    """
+    This function unregisters a function registered by add_stage_callback().
+
+    Args:
+        callback (function): registered stage callback
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns: None
+    """
+    if callback in _stage_callbacks.get():
+        _stage_callbacks.set(
+            tuple(
+                stage_callback
+                for stage_callback in _stage_callbacks.get()
+                if stage_callback != callback
+            )
+        )
+
+
+@contextlib.contextmanager
+def stage(name, **info):
+    """
+    This function is a context manager that times one stage. The code in the
+    block can add the number of rows processed and bytes written (or any
+    other JSON-serializable value) to the yielded stage record. The record is
+    added to the reports of the active record_stages() blocks and passed to
+    the stage callbacks when the block exits. If there are neither, the
+    stage costs only two clock reads.
+
+    Args:
+        name (str): stage name, e.g., 'download'
+        info (dict): initial values of the stage record, e.g., rows=15
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        stage_rec (dict): stage record with the stage name, rows, and bytes,
+            completed with the start time (secs after the start of the
+            innermost report), the wall time in seconds (secs), and, if the
+            report traces memory, the peak memory in MB (peak_mb)
+    """
+    stage_rec = {"name": name, "rows": None, "bytes": None}
+    stage_rec.update(info)
+    active_reports = _active_reports.get()
+    trace_memory = bool(active_reports) and tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    try:
+        yield stage_rec
+    finally:
+        stage_rec["secs"] = time.perf_counter() - start_time
+        if trace_memory:
+            stage_rec["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        for report in active_reports:
+            stage_rec.setdefault("start", start_time - report["_start_time"])
+            report["stages"].append(stage_rec)
+        for callback in _stage_callbacks.get():
+            callback(stage_rec)
+
+
+@contextlib.contextmanager
+def record_stages(profile=False, trace_memory=False, profile_lines=25):
+    """
+    This function is a context manager that collects the records of all
+    stages that run in the block into a report. Blocks can be nested, and a
+    stage is recorded in every active report of its context.
+
+    Args:
+        profile (bool): =True if run cProfile over the block and add the
+            profile_lines functions with the largest cumulative times to the
+            report
+        trace_memory (bool): =True if run tracemalloc over the block and
+            record the peak memory of each stage (the peak of a stage that
+            contains other stages covers only the part after its last inner
+            stage)
+        profile_lines (int): number of functions in the profile
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        report (dict): report with the list of stage records (stages) in the
+            order in which they finished, the total wall time in seconds of
+            the block (total_secs), the peak memory in MB of the block
+            (peak_mb, if trace_memory), and the profile (profile, if
+            profile), a list of dictionaries with the function, ncalls,
+            tottime, and cumtime of the slowest functions
+    """
+    report = {"stages": [], "_start_time": time.perf_counter()}
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    reports_token = _active_reports.set(_active_reports.get() + (report,))
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield report
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _active_reports.reset(reports_token)
+        report["total_secs"] = time.perf_counter() - report.pop("_start_time")
+        if trace_memory:
+            report["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        if start_tracing:
+            tracemalloc.stop()
+        if profiler is not None:
+            prof_stats = pstats.Stats(profiler).sort_stats("cumulative")
+            report["profile"] = [
+                {
+                    "function": file_name
+                    + ":"
+                    + str(line_num)
+                    + "("
+                    + func_name
+                    + ")",
+                    "ncalls": func_stats[1],
+                    "tottime": func_stats[2],
+                    "cumtime": func_stats[3],
+                }
+                for (file_name, line_num, func_name), func_stats in sorted(
+                    prof_stats.stats.items(), key=lambda item: -item[1][3]
+                )[:profile_lines]
+            ]
+
+
+def write_report(report, file_path):
+    """
+    This function saves a report from record_stages() as JSON.
+
+    Args:
+        report (dict): report from record_stages()
+        file_path (str): path of the JSON file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        [file_path].json
+
+    Returns: None
+    """
+    with open(file_path, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2, default=str)
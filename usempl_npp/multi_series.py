@@ -0,0 +1,313 @@
+"""
+This module runs the normalized peak analysis of usempl_data.py over
+many FRED series at once (e.g., PAYEMS, UNRATE, INDPRO, or sector and state
+payrolls). Monthly series are aligned on months from peak, and weekly or
+daily series on periods of their own frequency (e.g., 'W-SAT' for ICSA or
+'B' for business days). Each series is loaded and aligned on the peaks of the
+same recession registry in a pool of worker processes, and the time spent
+on each series and the overall throughput are reported.
+
+This module defines the following function(s):
+    load_series()
+    align_series_panel()
+    get_series_panel()
+    get_multi_series_panels()
+"""
+
+# Import packages
+import concurrent.futures
+import datetime as dt
+import os
+import time
+import pandas as pd
+from usempl_npp import fred_cache
+from usempl_npp import instrument
+from usempl_npp import usempl_data
+
+"""
+Define functions
+"""
+
+
+def load_series(series_id, end_date=None, data_dir=None):
+    """
+    This function loads a series either from a local CSV file or from FRED
+    through the local FRED cache.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'UNRATE'
+        end_date (datetime): last date of the series. If None, the series runs
+            through the most recent available month
+        data_dir (str): directory of local [series_id].csv files with columns
+            Date and value. If None, the series is downloaded from FRED
+
+    Other functions and files called by this function:
+        fred_cache.get_fred_series()
+        [series_id].csv
+
+    Files created by this function:
+        fred_cache/[series_id].csv (if data_dir is None)
+
+    Returns:
+        series_df (DataFrame): series with columns Date and series_id, sorted
+            from old to new
+    """
+    if data_dir is None:
+        return fred_cache.get_fred_series(
+            series_id,
+            start_date=fred_cache.FRED_START_DATE,
+            end_date=end_date,
+        )
+    series_df = pd.read_csv(
+        os.path.join(data_dir, series_id + ".csv"),
+        names=["Date", series_id],
+        parse_dates=["Date"],
+        skiprows=1,
+        na_values=[".", "na", "NaN"],
+    )
+    series_df = series_df.dropna().sort_values(by="Date")
+    if end_date is not None:
+        series_df = series_df[series_df["Date"] <= end_date]
+
+    return series_df.reset_index(drop=True)
+
+
+def align_series_panel(
+    series_df,
+    series_id,
+    maxdate_rng_lst,
+    rec_label_lst,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    freq="M",
+):
+    """
+    This function builds the long normalized peak DataFrame of one loaded
+    series. Recessions whose peak search window has no observations (e.g.,
+    recessions before the series starts) are left out. The periods from
+    peak column is mths_frm_peak for freq 'M' and pers_frm_peak otherwise.
+
+    Args:
+        series_df (DataFrame): series with columns Date and series_id, sorted
+            from old to new
+        series_id (str): FRED series ID, e.g., 'UNRATE'
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date within which range we define the peak value at the
+            beginning of each recession
+        rec_label_lst (list): list of recession labels, one per window
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month
+        freq (str): pandas frequency of the periods from peak, e.g., 'M',
+            'W-SAT', or 'B'. frwd_mths_max and bkwd_mths_max are numbers of
+            these periods
+
+    Other functions and files called by this function:
+        usempl_data.get_peak_indices()
+        usempl_data.align_peaks_long()
+
+    Files created by this function: None
+
+    Returns:
+        series_pk_long (DataFrame): long DataFrame with columns recession_id,
+            mths_frm_peak (or pers_frm_peak), Date, series_id, and dv_pk
+        peak_vals (list): list of peak value of each included recession
+        peak_dates (list): list of string date (YYYY-mm-dd) of peak value of
+            each included recession
+    """
+    peak_idx = usempl_data.get_peak_indices(
+        series_df, maxdate_rng_lst, value_col=series_id, skip_empty=True
+    )
+    has_peak = peak_idx >= 0
+    series_pk_long = usempl_data.align_peaks_long(
+        series_df,
+        peak_idx[has_peak],
+        frwd_mths_max,
+        bkwd_mths_max,
+        rec_labels=[
+            rec_label
+            for rec_label, rec_has_peak in zip(rec_label_lst, has_peak)
+            if rec_has_peak
+        ],
+        value_col=series_id,
+        dv_pk_col="dv_pk",
+        freq=freq,
+        period_col="mths_frm_peak" if freq == "M" else "pers_frm_peak",
+    )
+    peak_vals = series_df[series_id].to_numpy()[peak_idx[has_peak]].tolist()
+    peak_dates = (
+        series_df["Date"].iloc[peak_idx[has_peak]].dt.strftime("%Y-%m-%d")
+    ).tolist()
+
+    return series_pk_long, peak_vals, peak_dates
+
+
+def get_series_panel(
+    series_id,
+    maxdate_rng_lst,
+    rec_label_lst,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date=None,
+    data_dir=None,
+    freq="M",
+):
+    """
+    This function loads one series and builds its long normalized peak
+    DataFrame with align_series_panel(). This is the task that
+    get_multi_series_panels() runs in each worker process.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'UNRATE'
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date within which range we define the peak value at the
+            beginning of each recession
+        rec_label_lst (list): list of recession labels, one per window
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month
+        end_date (datetime): last date of the series. If None, the series runs
+            through the most recent available month
+        data_dir (str): directory of local [series_id].csv files. If None,
+            the series is downloaded from FRED
+        freq (str): pandas frequency of the periods from peak, see
+            align_series_panel()
+
+    Other functions and files called by this function:
+        load_series()
+        align_series_panel()
+
+    Files created by this function:
+        fred_cache/[series_id].csv (if data_dir is None)
+
+    Returns:
+        series_pk_long (DataFrame): long DataFrame with columns recession_id,
+            mths_frm_peak (or pers_frm_peak), Date, series_id, and dv_pk
+        peak_vals (list): list of peak value of each included recession
+        peak_dates (list): list of string date (YYYY-mm-dd) of peak value of
+            each included recession
+        elapsed_secs (float): wall time in seconds to load and align the
+            series
+    """
+    start_time = time.perf_counter()
+    series_df = load_series(series_id, end_date, data_dir)
+    series_pk_long, peak_vals, peak_dates = align_series_panel(
+        series_df,
+        series_id,
+        maxdate_rng_lst,
+        rec_label_lst,
+        frwd_mths_max,
+        bkwd_mths_max,
+        freq,
+    )
+    elapsed_secs = time.perf_counter() - start_time
+
+    return series_pk_long, peak_vals, peak_dates, elapsed_secs
+
+
+def get_multi_series_panels(
+    series_id_lst,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str=None,
+    data_dir=None,
+    rec_file_path=None,
+    max_workers=None,
+    freq="M",
+):
+    """
+    This function computes the long normalized peak DataFrame of each series
+    in series_id_lst in a pool of worker processes. All series are aligned on
+    the recessions of the same recession registry.
+
+    Args:
+        series_id_lst (list): list of FRED series IDs, e.g., ['PAYEMS',
+            'UNRATE', 'INDPRO']
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month
+        end_date_str (str): end date of the series in 'YYYY-mm-dd' format. If
+            None, the series run through the most recent available month
+        data_dir (str): directory of local [series_id].csv files with columns
+            Date and value. If None, the series are downloaded from FRED
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        max_workers (int): number of worker processes. If None, the number of
+            processors on the machine. If 1, the series are computed serially
+            in this process
+        freq (str): pandas frequency of the periods from peak, see
+            align_series_panel()
+
+    Other functions and files called by this function:
+        usempl_data.get_recession_registry()
+        instrument.stage()
+        get_series_panel()
+
+    Files created by this function:
+        fred_cache/[series_id].csv (if data_dir is None)
+
+    Returns:
+        results (dict): dictionary with series IDs as keys and tuples of
+            (series_pk_long, peak_vals, peak_dates, elapsed_secs) from
+            get_series_panel() as values, in the order of series_id_lst
+        total_secs (float): wall time in seconds for all series
+        throughput (float): number of series processed per second
+    """
+    start_time = time.perf_counter()
+    end_date = None
+    if end_date_str is not None:
+        end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d")
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+    maxdate_rng_lst = list(
+        zip(
+            rec_df["peak_search_beg"].dt.strftime("%Y-%m-%d"),
+            rec_df["peak_search_end"].dt.strftime("%Y-%m-%d"),
+        )
+    )
+    task_args = (
+        maxdate_rng_lst,
+        rec_df["rec_label_yr"].tolist(),
+        frwd_mths_max,
+        bkwd_mths_max,
+        end_date,
+        data_dir,
+        freq,
+    )
+
+    # The wall times of the series and the throughput are recorded as the
+    # instrument stage multi_series
+    with instrument.stage(
+        "multi_series", rows=len(series_id_lst)
+    ) as stage_rec:
+        if max_workers == 1:
+            results = {
+                series_id: get_series_panel(series_id, *task_args)
+                for series_id in series_id_lst
+            }
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers
+            ) as executor:
+                futures = {
+                    series_id: executor.submit(
+                        get_series_panel, series_id, *task_args
+                    )
+                    for series_id in series_id_lst
+                }
+                results = {
+                    series_id: future.result()
+                    for series_id, future in futures.items()
+                }
+
+        total_secs = time.perf_counter() - start_time
+        throughput = len(series_id_lst) / total_secs
+        stage_rec["series_secs"] = {
+            series_id: elapsed_secs
+            for series_id, (_, _, _, elapsed_secs) in results.items()
+        }
+        stage_rec["throughput"] = throughput
+
+    return results, total_secs, throughput
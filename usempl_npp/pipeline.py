@@ -0,0 +1,669 @@
+"""
+This module runs the normalized peak plot as a three-stage pipeline, fetch
+(PAYEMS series) -> align (normalized peak series) -> render (HTML plot), with
+a command line interface. Each stage saves a hash of its inputs and
+parameters in a state file and skips its work when the hash has not changed
+since its last run, so that a scheduled refresh with no new BLS release
+finishes almost instantly. Each stage runs the stages before it first. With
+--report, the timings of the stages that ran (see instrument.py) are saved
+as JSON.
+
+Usage (after pip install, or with python -m usempl_npp.pipeline):
+    usempl-npp fetch [--end-date YYYY-mm-dd] [--offline]
+    usempl-npp align [--frwd-mths-max 135] [--bkwd-mths-max 48]
+    usempl-npp render [--frwd-mths-main 53] [--bkwd-mths-main 5]
+        [--render-mode lines]
+    usempl-npp render --report report.json [--profile] [--trace-memory]
+
+This module defines the following function(s):
+    get_file_hash()
+    get_stage_hash()
+    read_state()
+    write_state()
+    is_stage_current()
+    get_pipeline_dir()
+    run_fetch()
+    run_align()
+    run_render()
+    main()
+"""
+
+# Import packages
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import pandas as pd
+from usempl_npp import instrument
+from usempl_npp import usempl_data
+
+# Version of the stage outputs. Changing it makes every stage run again.
+PIPELINE_VERSION = 1
+
+"""
+Define functions
+"""
+
+
+def get_file_hash(file_path):
+    """
+    This function computes the SHA-256 hash of the contents of a file.
+
+    Args:
+        file_path (str): path of the file
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        file_hash (str): hexadecimal SHA-256 hash of the file contents
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def get_stage_hash(stage_params, file_path_lst=()):
+    """
+    This function computes the hash of the inputs of a pipeline stage from
+    its parameters and the contents of its input files.
+
+    Args:
+        stage_params (dict): JSON-serializable parameters of the stage
+        file_path_lst (list): list of paths of the input files of the stage
+
+    Other functions and files called by this function:
+        get_file_hash()
+
+    Files created by this function: None
+
+    Returns:
+        stage_hash (str): hexadecimal SHA-256 hash of the stage inputs
+    """
+    stage_inputs = {
+        "version": PIPELINE_VERSION,
+        "params": stage_params,
+        "files": [get_file_hash(file_path) for file_path in file_path_lst],
+    }
+    stage_hash = hashlib.sha256(
+        json.dumps(stage_inputs, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    return stage_hash
+
+
+def read_state(state_path):
+    """
+    This function reads the pipeline state file.
+
+    Args:
+        state_path (str): path of the state file
+
+    Other functions and files called by this function:
+        pipeline_state.json
+
+    Files created by this function: None
+
+    Returns:
+        state (dict): dictionary with stage names as keys and dictionaries of
+            input_hash and output path as values, empty if there is no state
+            file yet
+    """
+    if not os.access(state_path, os.F_OK):
+        return {}
+    with open(state_path, "r", encoding="utf-8") as state_file:
+        state = json.load(state_file)
+
+    return state
+
+
+def write_state(state, state_path):
+    """
+    This function writes the pipeline state file. The file is written to a
+    temporary file first and then moved into place.
+
+    Args:
+        state (dict): pipeline state from read_state()
+        state_path (str): path of the state file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        pipeline_state.json
+
+    Returns: None
+    """
+    tmp_path = state_path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+
+def is_stage_current(state, stage, stage_hash):
+    """
+    This function checks whether a stage already ran with the same inputs
+    and its output file still exists.
+
+    Args:
+        state (dict): pipeline state from read_state()
+        stage (str): stage name, 'fetch', 'align', or 'render'
+        stage_hash (str): hash of the current inputs of the stage
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        stage_current (bool): =True if the stage can be skipped
+    """
+    stage_state = state.get(stage, {})
+    stage_current = stage_state.get("input_hash") == stage_hash and (
+        os.access(stage_state.get("output", ""), os.F_OK)
+    )
+
+    return stage_current
+
+
+def get_pipeline_dir(pipeline_dir=None):
+    """
+    This function returns the directory of the pipeline state and stage
+    output files and makes sure that it exists.
+
+    Args:
+        pipeline_dir (str): directory of the pipeline files. If None, the
+            data/pipeline folder in this package directory
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        pipeline_dir (str): directory of the pipeline files
+    """
+    if pipeline_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        pipeline_dir = os.path.join(cur_path, "data", "pipeline")
+    if not os.access(pipeline_dir, os.F_OK):
+        os.makedirs(pipeline_dir, exist_ok=True)
+
+    return pipeline_dir
+
+
+def run_fetch(
+    end_date_str="today", download_from_internet=True, pipeline_dir=None
+):
+    """
+    This function runs the fetch stage. It loads the PAYEMS series through
+    end_date_str (through the local FRED cache if downloading) and saves it
+    only if it differs from the series saved by the last run, so that the
+    later stages see unchanged inputs when there is no new data.
+
+    Args:
+        end_date_str (str): either 'today' or the end date of PAYEMS time
+            series in 'YYYY-mm-dd' format
+        download_from_internet (bool): =True if download data from
+            fred.stlouisfed.org, otherwise read data in from local directory
+        pipeline_dir (str): directory of the pipeline files. If None, the
+            data/pipeline folder in this package directory
+
+    Other functions and files called by this function:
+        get_pipeline_dir()
+        read_state()
+        write_state()
+        usempl_data.get_usempl_series()
+
+    Files created by this function:
+        pipeline/usempl.csv
+        pipeline/pipeline_state.json
+
+    Returns:
+        series_path (str): path of the saved PAYEMS series
+        stage_ran (bool): =True if the saved series changed
+    """
+    if end_date_str == "today":
+        end_date_str = dt.date.today().strftime("%Y-%m-%d")
+    pipeline_dir = get_pipeline_dir(pipeline_dir)
+    state_path = os.path.join(pipeline_dir, "pipeline_state.json")
+    series_path = os.path.join(pipeline_dir, "usempl.csv")
+    state = read_state(state_path)
+
+    # The fetch stage cannot know whether there are new data without asking
+    # FRED, so it always loads the series and compares the result
+    usempl_df, end_date_str2 = usempl_data.get_usempl_series(
+        end_date_str, download_from_internet
+    )
+    series_csv = usempl_df.to_csv(index=False, date_format="%Y-%m-%d")
+    stage_hash = get_stage_hash(
+        {"series": hashlib.sha256(series_csv.encode("utf-8")).hexdigest()}
+    )
+    if is_stage_current(state, "fetch", stage_hash):
+        print("fetch: PAYEMS series through", end_date_str2, "is unchanged")
+        return series_path, False
+
+    with open(series_path, "w", encoding="utf-8") as series_file:
+        series_file.write(series_csv)
+    state["fetch"] = {
+        "input_hash": stage_hash,
+        "output": series_path,
+        "end_date_str": end_date_str2,
+    }
+    write_state(state, state_path)
+    print("fetch: saved PAYEMS series through", end_date_str2)
+
+    return series_path, True
+
+
+def run_align(
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str="today",
+    download_from_internet=True,
+    rec_file_path=None,
+    pipeline_dir=None,
+):
+    """
+    This function runs the align stage after the fetch stage. It aligns the
+    saved PAYEMS series on the peak of each recession in the recession
+    registry and saves the normalized peak series, unless the series, the
+    registry, and the months from peak are the same as in its last run. If
+    only the series changed, e.g., a new month and revisions of recent
+    months, the saved normalized peak series are patched with the new and
+    revised observations instead of aligning the full series again. If the
+    patch fails (e.g., a month of the saved series is missing), its
+    alignment_update stage record holds the error and the full series is
+    aligned again in the alignment stage.
+
+    Args:
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month
+        end_date_str (str): either 'today' or the end date of PAYEMS time
+            series in 'YYYY-mm-dd' format
+        download_from_internet (bool): =True if download data from
+            fred.stlouisfed.org, otherwise read data in from local directory
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        pipeline_dir (str): directory of the pipeline files. If None, the
+            data/pipeline folder in this package directory
+
+    Other functions and files called by this function:
+        run_fetch()
+        get_stage_hash()
+        usempl_data.get_recession_registry()
+        usempl_data.get_peak_indices()
+        usempl_data.align_peaks()
+        usempl_data.read_usempl_pk()
+        usempl_data.get_usempl_delta()
+        usempl_data.update_usempl_pk()
+        usempl_data.write_usempl_pk()
+        instrument.stage()
+
+    Files created by this function:
+        pipeline/usempl.csv
+        pipeline/usempl_aligned.csv
+        pipeline/usempl_pk.npy
+        pipeline/pipeline_state.json
+
+    Returns:
+        pk_path (str): path of the saved normalized peak series
+        stage_ran (bool): =True if the normalized peak series were computed
+    """
+    series_path, _ = run_fetch(
+        end_date_str, download_from_internet, pipeline_dir
+    )
+    pipeline_dir = get_pipeline_dir(pipeline_dir)
+    state_path = os.path.join(pipeline_dir, "pipeline_state.json")
+    pk_path = os.path.join(pipeline_dir, "usempl_pk.npy")
+    aligned_path = os.path.join(pipeline_dir, "usempl_aligned.csv")
+    if rec_file_path is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        rec_file_path = os.path.join(cur_path, "data", "recessions.csv")
+    state = read_state(state_path)
+    stage_hash = get_stage_hash(
+        {"frwd_mths_max": frwd_mths_max, "bkwd_mths_max": bkwd_mths_max},
+        [series_path, rec_file_path],
+    )
+    if is_stage_current(state, "align", stage_hash):
+        print("align: normalized peak series are unchanged")
+        return pk_path, False
+
+    usempl_df = pd.read_csv(series_path, parse_dates=["Date"]).dropna()
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+    maxdate_rng_lst = list(
+        zip(rec_df["peak_search_beg"], rec_df["peak_search_end"])
+    )
+    # The saved normalized peak series can be patched if they were aligned
+    # with the same registry and months from peak from a saved series
+    base_hash = get_stage_hash(
+        {"frwd_mths_max": frwd_mths_max, "bkwd_mths_max": bkwd_mths_max},
+        [rec_file_path],
+    )
+    usempl_pk = None
+    if (
+        state.get("align", {}).get("base_hash") == base_hash
+        and os.access(pk_path, os.F_OK)
+        and os.access(aligned_path, os.F_OK)
+    ):
+        usempl_df_old = pd.read_csv(aligned_path, parse_dates=["Date"])
+        with instrument.stage("alignment_update") as stage_rec:
+            try:
+                delta_df = usempl_data.get_usempl_delta(
+                    usempl_df_old.dropna(), usempl_df
+                )
+                usempl_pk, _, _, rec_updated = usempl_data.update_usempl_pk(
+                    usempl_data.read_usempl_pk(pk_path, mmap=False),
+                    delta_df,
+                    maxdate_rng_lst,
+                    usempl_df,
+                )
+            except ValueError as err:
+                # A series with missing months is aligned again in full, and
+                # the update stage records why
+                usempl_pk = None
+                stage_rec["error"] = str(err)
+            else:
+                stage_rec["rows"] = len(delta_df)
+                stage_rec["num_rec"] = len(rec_updated)
+                align_msg = (
+                    "align: patched "
+                    + str(len(rec_updated))
+                    + " recession(s) with "
+                    + str(len(delta_df))
+                    + " new or revised month(s)"
+                )
+    if usempl_pk is None:
+        with instrument.stage("alignment") as stage_rec:
+            peak_idx = usempl_data.get_peak_indices(usempl_df, maxdate_rng_lst)
+            usempl_pk, _, _ = usempl_data.align_peaks(
+                usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+            )
+            stage_rec["rows"] = len(usempl_pk) * len(peak_idx)
+            stage_rec["num_rec"] = len(peak_idx)
+        align_msg = (
+            "align: saved normalized peak series of "
+            + str(len(peak_idx))
+            + " recessions"
+        )
+    with instrument.stage("pk_npy_write") as stage_rec:
+        usempl_data.write_usempl_pk(usempl_pk, pk_path)
+        stage_rec["rows"] = len(usempl_pk)
+        stage_rec["bytes"] = os.path.getsize(pk_path)
+    shutil.copyfile(series_path, aligned_path)
+    state["align"] = {
+        "input_hash": stage_hash,
+        "base_hash": base_hash,
+        "output": pk_path,
+    }
+    write_state(state, state_path)
+    print(align_msg)
+
+    return pk_path, True
+
+
+def run_render(
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str="today",
+    download_from_internet=True,
+    rec_file_path=None,
+    render_mode="lines",
+    pipeline_dir=None,
+    image_dir=None,
+):
+    """
+    This function runs the render stage after the fetch and align stages.
+    It saves the normalized peak plot as HTML, unless the normalized peak
+    series, the registry, the plot parameters, and the actual end date of the
+    PAYEMS series are the same as in its last run. The requested end date is
+    not hashed, so a daily run with 'today' re-renders only on new data.
+
+    Args:
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        frwd_mths_max (int): maximum number of months forward from the peak to
+            allow for the plot, to be seen by zooming out
+        bkwd_mths_max (int): maximum number of months backward from the peak to
+            allow for the plot, to be seen by zooming out
+        end_date_str (str): either 'today' or the end date of PAYEMS time
+            series in 'YYYY-mm-dd' format. The actual end date of the series
+            is shown as the update date
+        download_from_internet (bool): =True if download data from
+            fred.stlouisfed.org, otherwise read data in from local directory
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+        pipeline_dir (str): directory of the pipeline files. If None, the
+            data/pipeline folder in this package directory
+        image_dir (str): directory of the HTML file. If None, the images
+            folder in this package directory
+
+    Other functions and files called by this function:
+        run_align()
+        get_stage_hash()
+        usempl_data.get_recession_registry()
+        usempl_data.read_usempl_pk()
+        usempl_data.usempl_pk_to_long()
+        usempl_npp_bokeh.create_usempl_fig()
+        instrument.stage()
+
+    Files created by this function:
+        pipeline/usempl.csv
+        pipeline/usempl_pk.npy
+        pipeline/pipeline_state.json
+        images/usempl_npp_[yyyy-mm-dd].html
+
+    Returns:
+        html_path (str): path of the saved HTML file
+        stage_ran (bool): =True if the plot was rendered
+    """
+    if end_date_str == "today":
+        end_date_str = dt.date.today().strftime("%Y-%m-%d")
+    pk_path, _ = run_align(
+        frwd_mths_max,
+        bkwd_mths_max,
+        end_date_str,
+        download_from_internet,
+        rec_file_path,
+        pipeline_dir,
+    )
+    pipeline_dir = get_pipeline_dir(pipeline_dir)
+    state_path = os.path.join(pipeline_dir, "pipeline_state.json")
+    if image_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        image_dir = os.path.join(cur_path, "images")
+    if not os.access(image_dir, os.F_OK):
+        os.makedirs(image_dir)
+    if rec_file_path is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        rec_file_path = os.path.join(cur_path, "data", "recessions.csv")
+    state = read_state(state_path)
+    end_date_str2 = state["fetch"]["end_date_str"]
+    html_path = os.path.join(
+        image_dir, "usempl_npp_" + end_date_str2 + ".html"
+    )
+    stage_hash = get_stage_hash(
+        {
+            "frwd_mths_main": frwd_mths_main,
+            "bkwd_mths_main": bkwd_mths_main,
+            "frwd_mths_max": frwd_mths_max,
+            "bkwd_mths_max": bkwd_mths_max,
+            "end_date_str": end_date_str2,
+            "render_mode": render_mode,
+            "html_path": html_path,
+        },
+        [pk_path, rec_file_path],
+    )
+    if is_stage_current(state, "render", stage_hash):
+        print("render: plot", html_path, "is unchanged")
+        return html_path, False
+
+    # Bokeh is only imported when a plot is actually rendered
+    from bokeh.embed import file_html
+    from bokeh.resources import CDN
+    from usempl_npp import usempl_npp_bokeh
+
+    rec_df = usempl_data.get_recession_registry(rec_file_path)
+    usempl_pk_long = usempl_data.usempl_pk_to_long(
+        usempl_data.read_usempl_pk(pk_path), rec_df["rec_label_yr"].tolist()
+    )
+    with instrument.stage("figure_build") as stage_rec:
+        fig = usempl_npp_bokeh.create_usempl_fig(
+            usempl_pk_long,
+            rec_df["rec_label_yrmth"].tolist(),
+            dt.datetime.strptime(end_date_str2, "%Y-%m-%d"),
+            frwd_mths_main,
+            bkwd_mths_main,
+            frwd_mths_max,
+            bkwd_mths_max,
+            render_mode,
+        )
+        stage_rec["rows"] = len(usempl_pk_long)
+    fig_title = (
+        "Progression of PAYEMS in last " + str(len(rec_df)) + " recessions"
+    )
+    with instrument.stage("html_write") as stage_rec:
+        with open(html_path, "w", encoding="utf-8") as html_file:
+            html_file.write(file_html(fig, CDN, fig_title))
+        stage_rec["bytes"] = os.path.getsize(html_path)
+    state["render"] = {"input_hash": stage_hash, "output": html_path}
+    write_state(state, state_path)
+    print("render: saved plot", html_path)
+
+    return html_path, True
+
+
+def main(argv=None):
+    """
+    This function is the command line interface of the pipeline. Each
+    subcommand runs its stage and the stages before it.
+
+    Args:
+        argv (list): list of command line arguments. If None, sys.argv[1:]
+
+    Other functions and files called by this function:
+        instrument.record_stages()
+        run_fetch()
+        run_align()
+        run_render()
+        instrument.write_report()
+
+    Files created by this function:
+        pipeline/usempl.csv
+        pipeline/usempl_pk.npy
+        pipeline/pipeline_state.json
+        images/usempl_npp_[yyyy-mm-dd].html
+        [report].json
+
+    Returns:
+        out_path (str): path of the output file of the last stage
+    """
+    parser = argparse.ArgumentParser(
+        prog="usempl-npp",
+        description="Normalized peak plot of U.S. nonfarm employment "
+        + "(PAYEMS) in the last 15 recessions",
+    )
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+    fetch_parser = subparsers.add_parser(
+        "fetch", help="download or load the PAYEMS series"
+    )
+    align_parser = subparsers.add_parser(
+        "align", help="align the series on the recession peaks"
+    )
+    render_parser = subparsers.add_parser(
+        "render", help="save the normalized peak plot as HTML"
+    )
+    for stage_parser in [fetch_parser, align_parser, render_parser]:
+        stage_parser.add_argument(
+            "--end-date",
+            default="today",
+            help="end date of the series in YYYY-mm-dd format",
+        )
+        stage_parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="read the series from the local data directory",
+        )
+        stage_parser.add_argument(
+            "--pipeline-dir", help="directory of the pipeline files"
+        )
+        stage_parser.add_argument(
+            "--report", help="path of the JSON report of the stage timings"
+        )
+        stage_parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="add a cProfile summary to the report",
+        )
+        stage_parser.add_argument(
+            "--trace-memory",
+            action="store_true",
+            help="add the peak memory of each stage to the report",
+        )
+    for stage_parser in [align_parser, render_parser]:
+        stage_parser.add_argument("--frwd-mths-max", type=int, default=135)
+        stage_parser.add_argument("--bkwd-mths-max", type=int, default=48)
+        stage_parser.add_argument(
+            "--rec-file", help="path of the recession registry CSV file"
+        )
+    render_parser.add_argument("--frwd-mths-main", type=int, default=53)
+    render_parser.add_argument("--bkwd-mths-main", type=int, default=5)
+    render_parser.add_argument(
+        "--render-mode",
+        choices=["lines", "multi_line", "compact"],
+        default="lines",
+    )
+    render_parser.add_argument(
+        "--image-dir", help="directory of the HTML file"
+    )
+    args = parser.parse_args(argv)
+
+    with instrument.record_stages(
+        profile=args.profile, trace_memory=args.trace_memory
+    ) as report:
+        if args.stage == "fetch":
+            out_path, _ = run_fetch(
+                args.end_date, not args.offline, args.pipeline_dir
+            )
+        elif args.stage == "align":
+            out_path, _ = run_align(
+                args.frwd_mths_max,
+                args.bkwd_mths_max,
+                args.end_date,
+                not args.offline,
+                args.rec_file,
+                args.pipeline_dir,
+            )
+        else:
+            out_path, _ = run_render(
+                args.frwd_mths_main,
+                args.bkwd_mths_main,
+                args.frwd_mths_max,
+                args.bkwd_mths_max,
+                args.end_date,
+                not args.offline,
+                args.rec_file,
+                args.render_mode,
+                args.pipeline_dir,
+                args.image_dir,
+            )
+    if args.report is not None:
+        instrument.write_report(report, args.report)
+
+    return out_path
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
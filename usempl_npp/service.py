@@ -0,0 +1,902 @@
+"""
+This module serves the normalized peak plot over HTTP for users who want
+different main windows. The long normalized peak series is loaded once and
+kept in memory, each plot is rendered to HTML on its first request, and the
+rendered plots are kept in a least recently used (LRU) cache bounded by the
+total size of their HTML. The cache key holds the window parameters, the
+render mode, and the data version (a hash of the normalized peak series), so
+that a data refresh never serves a stale plot. A background thread reloads
+the series periodically, which costs one conditional FRED request when no
+new month has been released (see fred_client.py). Several service processes
+can share one memory-mapped copy of the series (--panel-file): one process
+loads and writes it, and the others attach to it with --attach-panel and
+pick up each new version on their own refresh (see shared_panel.py).
+
+Usage (after pip install, or with python -m usempl_npp.service):
+    usempl-npp-serve [--port 8000] [--cache-mb 64] [--refresh-mins 60]
+        [--panel-file panel.bin [--attach-panel]]
+
+    GET /plot?frwd_mths_main=53&bkwd_mths_main=5&render_mode=lines
+        HTML plot, with the X-Cache (hit or miss) and X-Data-Version headers
+        (with &max_points=500, the lines are downsampled to 500 points in
+        the first view, see usempl_npp_bokeh.create_usempl_fig())
+    GET /detail?data_version=...&render_mode=lines
+        JSON of the full-resolution points, fetched by a downsampled plot
+    GET /metrics
+        JSON cache hit/miss, eviction, render, and refresh metrics
+
+This module defines the following function(s):
+    get_data_version()
+    load_panel()
+    make_service()
+    set_panel()
+    refresh_panel()
+    render_plot_html()
+    get_plot_html()
+    get_detail_json()
+    get_metrics()
+    start_refresh_thread()
+    make_request_handler()
+    serve()
+    main()
+"""
+
+# Import packages
+import argparse
+import collections
+import datetime as dt
+import hashlib
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.parse
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+from usempl_npp import downsample
+from usempl_npp import instrument
+from usempl_npp import shared_panel
+from usempl_npp import usempl_data
+from usempl_npp import usempl_npp_bokeh as usempl
+
+RENDER_MODES = ("lines", "multi_line", "compact")
+
+"""
+Define functions
+"""
+
+
+def get_data_version(usempl_pk_long, end_date_str):
+    """
+    This function computes the data version of a long normalized peak
+    series, a short hash of its end date, recessions, and values, so that a
+    revised month changes the version as well as a new month.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            usempl_data.get_usempl_data(output_format='long')
+        end_date_str (str): end date of the PAYEMS series in 'YYYY-mm-dd'
+            format
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        data_version (str): 12-character hexadecimal data version
+    """
+    version_hash = hashlib.sha256(end_date_str.encode("utf-8"))
+    version_hash.update(
+        "|".join(usempl_pk_long["recession_id"].cat.categories).encode("utf-8")
+    )
+    version_hash.update(usempl_pk_long["recession_id"].cat.codes.to_numpy())
+    version_hash.update(usempl_pk_long["PAYEMS"].to_numpy().tobytes())
+
+    return version_hash.hexdigest()[:12]
+
+
+def load_panel(
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str="today",
+    download_from_internet=True,
+    rec_file_path=None,
+    panel_path=None,
+    publish_panel=True,
+):
+    """
+    This function loads the long normalized peak series that the service
+    renders its plots from. With panel_path, the series is shared by the
+    service processes through a memory-mapped panel file (see
+    shared_panel.py): a publishing process loads the series and writes the
+    file when its data version changes, and the other processes attach to
+    the file without loading the series themselves. A process that does not
+    publish still loads and publishes the series if the file does not exist
+    yet.
+
+    Args:
+        frwd_mths_max (int): maximum number of months forward from the peak
+        bkwd_mths_max (int): maximum number of months backward from the peak
+        end_date_str (str): either 'today' or the end date of the PAYEMS
+            series in 'YYYY-mm-dd' format
+        download_from_internet (bool): =True if download data from St. Louis
+            Federal Reserve's FRED system, otherwise read data in from local
+            directory
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        panel_path (str): path of the shared panel file. If None, the series
+            is kept in the memory of this process only
+        publish_panel (bool): =True if load the series and write it to the
+            shared panel file, =False if attach to the file written by
+            another process
+
+    Other functions and files called by this function:
+        usempl_data.get_usempl_data()
+        get_data_version()
+        shared_panel.attach_shared_panel()
+        shared_panel.write_shared_panel()
+
+    Files created by this function:
+        fred_cache/PAYEMS.csv
+        vintage_cache/PAYEMS.bin
+        [panel_path] (if panel_path)
+
+    Returns:
+        panel (dict): dictionary with the long normalized peak series
+            (usempl_pk_long), the recession labels (rec_label_yrmth_lst), the
+            end date (end_date), the months from peak limits (frwd_mths_max,
+            bkwd_mths_max), and the data version (data_version)
+    """
+    if (
+        panel_path is not None
+        and not publish_panel
+        and os.access(panel_path, os.F_OK)
+    ):
+        usempl_pk_long, panel_meta = shared_panel.attach_shared_panel(
+            panel_path
+        )
+        if (panel_meta["frwd_mths_max"], panel_meta["bkwd_mths_max"]) != (
+            frwd_mths_max,
+            bkwd_mths_max,
+        ):
+            raise ValueError(
+                "The shared panel "
+                + panel_path
+                + " has frwd_mths_max="
+                + str(panel_meta["frwd_mths_max"])
+                + " and bkwd_mths_max="
+                + str(panel_meta["bkwd_mths_max"])
+                + "."
+            )
+        panel = {
+            "usempl_pk_long": usempl_pk_long,
+            "rec_label_yrmth_lst": panel_meta["rec_label_yrmth_lst"],
+            "end_date": dt.datetime.strptime(
+                panel_meta["end_date_str"], "%Y-%m-%d"
+            ),
+            "frwd_mths_max": frwd_mths_max,
+            "bkwd_mths_max": bkwd_mths_max,
+            "data_version": panel_meta["data_version"],
+        }
+
+        return panel
+
+    if end_date_str == "today":
+        end_date_str = dt.date.today().strftime("%Y-%m-%d")
+    (
+        usempl_pk_long,
+        end_date_str2,
+        peak_vals,
+        peak_dates,
+        _,
+        rec_label_yrmth_lst,
+        _,
+        _,
+    ) = usempl_data.get_usempl_data(
+        frwd_mths_max,
+        bkwd_mths_max,
+        end_date_str,
+        download_from_internet,
+        output_format="long",
+        rec_file_path=rec_file_path,
+        verbose=False,
+    )
+    data_version = get_data_version(usempl_pk_long, end_date_str2)
+    if panel_path is not None:
+        # Write the file only for new data, so that the attached processes
+        # keep their mappings, and serve the mapped copy in this process too
+        if (
+            not os.access(panel_path, os.F_OK)
+            or shared_panel.attach_shared_panel(panel_path)[1]["data_version"]
+            != data_version
+        ):
+            panel_meta = {
+                "rec_label_yrmth_lst": rec_label_yrmth_lst,
+                "peak_vals": [float(peak_val) for peak_val in peak_vals],
+                "peak_dates": peak_dates,
+                "end_date_str": end_date_str2,
+                "frwd_mths_max": frwd_mths_max,
+                "bkwd_mths_max": bkwd_mths_max,
+                "data_version": data_version,
+            }
+            shared_panel.write_shared_panel(
+                usempl_pk_long, panel_meta, panel_path
+            )
+        usempl_pk_long = shared_panel.attach_shared_panel(panel_path)[0]
+    panel = {
+        "usempl_pk_long": usempl_pk_long,
+        "rec_label_yrmth_lst": rec_label_yrmth_lst,
+        "end_date": dt.datetime.strptime(end_date_str2, "%Y-%m-%d"),
+        "frwd_mths_max": frwd_mths_max,
+        "bkwd_mths_max": bkwd_mths_max,
+        "data_version": data_version,
+    }
+
+    return panel
+
+
+def make_service(panel_loader, max_cache_mb=64.0):
+    """
+    This function creates the state of a plot service and loads its first
+    panel.
+
+    Args:
+        panel_loader (function): function without arguments that returns a
+            panel dictionary like load_panel()
+        max_cache_mb (float): maximum total size in MB of the HTML of the
+            cached plots
+
+    Other functions and files called by this function:
+        set_panel()
+
+    Files created by this function: None
+
+    Returns:
+        service (dict): service state with the panel, the LRU cache of
+            rendered HTML by (data_version, frwd_mths_main, bkwd_mths_main,
+            render_mode, max_points), the full-resolution JSON of the panel
+            by render_mode, the locks, and the metrics counters
+    """
+    service = {
+        "panel_loader": panel_loader,
+        "panel": None,
+        "cache": collections.OrderedDict(),
+        "cache_bytes": 0,
+        "detail_json": {},
+        "max_cache_bytes": int(max_cache_mb * 1e6),
+        "lock": threading.Lock(),
+        "render_lock": threading.Lock(),
+        "stop_event": threading.Event(),
+        "metrics": {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "render_secs": 0.0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "data_updates": 0,
+        },
+    }
+    set_panel(service, panel_loader())
+
+    return service
+
+
+def set_panel(service, panel):
+    """
+    This function replaces the panel of a plot service and drops the cached
+    plots and full-resolution JSON of earlier data versions.
+
+    Args:
+        service (dict): service state from make_service()
+        panel (dict): panel dictionary like load_panel()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        updated (bool): =True if the data version changed
+    """
+    with service["lock"]:
+        old_panel = service["panel"]
+        if (
+            old_panel is not None
+            and old_panel["data_version"] == panel["data_version"]
+        ):
+            return False
+        service["panel"] = panel
+        for cache_key in list(service["cache"]):
+            if cache_key[0] != panel["data_version"]:
+                html_bytes = service["cache"].pop(cache_key)
+                service["cache_bytes"] -= len(html_bytes)
+        service["detail_json"] = {}
+        if old_panel is not None:
+            service["metrics"]["data_updates"] += 1
+
+    return True
+
+
+def refresh_panel(service):
+    """
+    This function reloads the panel of a plot service. The reload is
+    recorded as the instrument stage 'panel_refresh' with the data version
+    and whether it changed. An error, e.g., an unreachable FRED server, is
+    counted and recorded in the stage, and the service keeps serving its
+    current panel.
+
+    Args:
+        service (dict): service state from make_service()
+
+    Other functions and files called by this function:
+        instrument.stage()
+        set_panel()
+
+    Files created by this function: None
+
+    Returns:
+        updated (bool): =True if the data version changed
+    """
+    with instrument.stage("panel_refresh") as stage_rec:
+        try:
+            panel = service["panel_loader"]()
+        except Exception as err:
+            with service["lock"]:
+                service["metrics"]["refresh_errors"] += 1
+            stage_rec["error"] = repr(err)
+            return False
+        updated = set_panel(service, panel)
+        with service["lock"]:
+            service["metrics"]["refreshes"] += 1
+        stage_rec["data_version"] = panel["data_version"]
+        stage_rec["updated"] = updated
+
+    return updated
+
+
+def render_plot_html(
+    panel,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    render_mode="lines",
+    max_points=None,
+):
+    """
+    This function renders the normalized peak plot of a panel as a
+    standalone HTML document.
+
+    Args:
+        panel (dict): panel dictionary like load_panel()
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+        max_points (int): maximum number of points per line in the first
+            view. The full-resolution points are fetched from the /detail
+            path of the service on zoom-in. If None, all points are drawn
+
+    Other functions and files called by this function:
+        usempl_npp_bokeh.create_usempl_fig()
+        instrument.stage()
+
+    Files created by this function: None
+
+    Returns:
+        html_str (str): HTML document of the plot
+    """
+    with instrument.stage("figure_build") as stage_rec:
+        fig = usempl.create_usempl_fig(
+            panel["usempl_pk_long"],
+            panel["rec_label_yrmth_lst"],
+            panel["end_date"],
+            frwd_mths_main,
+            bkwd_mths_main,
+            panel["frwd_mths_max"],
+            panel["bkwd_mths_max"],
+            render_mode,
+            max_points=max_points,
+            detail_url=(
+                "detail?"
+                + urllib.parse.urlencode(
+                    {
+                        "data_version": panel["data_version"],
+                        "render_mode": render_mode,
+                    }
+                )
+            ),
+        )
+        stage_rec["rows"] = len(panel["usempl_pk_long"])
+    fig_title = (
+        "Progression of PAYEMS in last "
+        + str(len(panel["rec_label_yrmth_lst"]))
+        + " recessions"
+    )
+    with instrument.stage("html_render") as stage_rec:
+        html_str = file_html(fig, CDN, fig_title)
+        stage_rec["bytes"] = len(html_str)
+
+    return html_str
+
+
+def get_plot_html(
+    service,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    render_mode="lines",
+    max_points=None,
+):
+    """
+    This function returns the HTML of a plot from the LRU cache of a plot
+    service, rendering and caching it on a miss. Renders run one at a time,
+    so that concurrent requests for the same new plot render it once. The
+    least recently used plots are evicted when the cache exceeds its size.
+
+    Args:
+        service (dict): service state from make_service()
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+        max_points (int): maximum number of points per line in the first
+            view, see render_plot_html(). If None, all points are drawn
+
+    Other functions and files called by this function:
+        render_plot_html()
+
+    Files created by this function: None
+
+    Returns:
+        html_bytes (bytes): UTF-8 encoded HTML document of the plot
+        data_version (str): data version of the plot
+        cache_hit (bool): =True if the plot was served from the cache
+    """
+    with service["lock"]:
+        panel = service["panel"]
+    cache_key = (
+        panel["data_version"],
+        int(frwd_mths_main),
+        int(bkwd_mths_main),
+        render_mode,
+        max_points,
+    )
+    with service["lock"]:
+        html_bytes = service["cache"].get(cache_key)
+        if html_bytes is not None:
+            service["cache"].move_to_end(cache_key)
+            service["metrics"]["hits"] += 1
+            return html_bytes, panel["data_version"], True
+
+    with service["render_lock"]:
+        # Another request may have rendered the plot while this one waited
+        with service["lock"]:
+            html_bytes = service["cache"].get(cache_key)
+            if html_bytes is not None:
+                service["cache"].move_to_end(cache_key)
+                service["metrics"]["hits"] += 1
+                return html_bytes, panel["data_version"], True
+        start_time = time.perf_counter()
+        html_bytes = render_plot_html(
+            panel, frwd_mths_main, bkwd_mths_main, render_mode, max_points
+        ).encode("utf-8")
+        render_secs = time.perf_counter() - start_time
+
+    with service["lock"]:
+        service["metrics"]["misses"] += 1
+        service["metrics"]["render_secs"] += render_secs
+        # A plot of a replaced panel is returned but not cached
+        if (
+            service["panel"]["data_version"] == panel["data_version"]
+            and len(html_bytes) <= service["max_cache_bytes"]
+        ):
+            service["cache"][cache_key] = html_bytes
+            service["cache_bytes"] += len(html_bytes)
+            while service["cache_bytes"] > service["max_cache_bytes"]:
+                _, old_bytes = service["cache"].popitem(last=False)
+                service["cache_bytes"] -= len(old_bytes)
+                service["metrics"]["evictions"] += 1
+
+    return html_bytes, panel["data_version"], False
+
+
+def get_detail_json(service, render_mode="lines"):
+    """
+    This function returns the full-resolution points of the panel of a plot
+    service as the JSON that the zoom callback of a downsampled plot
+    fetches, building it once per data version and render mode.
+
+    Args:
+        service (dict): service state from make_service()
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            usempl_npp_bokeh.create_usempl_fig()
+
+    Other functions and files called by this function:
+        usempl_npp_bokeh.get_source_cols()
+        downsample.get_detail_data()
+
+    Files created by this function: None
+
+    Returns:
+        detail_bytes (bytes): UTF-8 encoded JSON of the full-resolution
+            points from downsample.get_detail_data()
+        data_version (str): data version of the points
+    """
+    with service["lock"]:
+        panel = service["panel"]
+        detail_bytes = service["detail_json"].get(render_mode)
+    if detail_bytes is None:
+        detail_bytes = json.dumps(
+            downsample.get_detail_data(
+                panel["usempl_pk_long"], usempl.get_source_cols(render_mode)
+            )
+        ).encode("utf-8")
+        with service["lock"]:
+            if service["panel"] is panel:
+                service["detail_json"][render_mode] = detail_bytes
+
+    return detail_bytes, panel["data_version"]
+
+
+def get_metrics(service):
+    """
+    This function returns the cache and refresh metrics of a plot service.
+
+    Args:
+        service (dict): service state from make_service()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        metrics (dict): dictionary of the hits, misses, hit_ratio, evictions,
+            number of cached plots (entries), cache_bytes, max_cache_bytes,
+            total render_secs, refreshes, refresh_errors, data_updates,
+            data_version, and data end_date
+    """
+    with service["lock"]:
+        metrics = dict(service["metrics"])
+        metrics["entries"] = len(service["cache"])
+        metrics["cache_bytes"] = service["cache_bytes"]
+        metrics["max_cache_bytes"] = service["max_cache_bytes"]
+        metrics["data_version"] = service["panel"]["data_version"]
+        metrics["end_date"] = service["panel"]["end_date"].strftime("%Y-%m-%d")
+    num_requests = metrics["hits"] + metrics["misses"]
+    metrics["hit_ratio"] = (
+        metrics["hits"] / num_requests if num_requests > 0 else None
+    )
+
+    return metrics
+
+
+def start_refresh_thread(service, refresh_secs=3600.0, stage_callback=None):
+    """
+    This function starts a daemon thread that reloads the panel of a plot
+    service every refresh_secs seconds until service['stop_event'] is set.
+    The thread starts with an empty instrument context, so its stages are
+    not recorded in any report of the thread that started it.
+
+    Args:
+        service (dict): service state from make_service()
+        refresh_secs (float): number of seconds between reloads
+        stage_callback (function): stage callback registered in the refresh
+            thread (see instrument.add_stage_callback()), e.g., to log the
+            panel_refresh stages. If None, no callback
+
+    Other functions and files called by this function:
+        instrument.add_stage_callback()
+        refresh_panel()
+
+    Files created by this function: None
+
+    Returns:
+        refresh_thread (threading.Thread): started refresh thread
+    """
+
+    def refresh_loop():
+        if stage_callback is not None:
+            instrument.add_stage_callback(stage_callback)
+        while not service["stop_event"].wait(refresh_secs):
+            refresh_panel(service)
+
+    refresh_thread = threading.Thread(
+        target=refresh_loop, name="usempl-npp-refresh", daemon=True
+    )
+    refresh_thread.start()
+
+    return refresh_thread
+
+
+def make_request_handler(service):
+    """
+    This function creates the HTTP request handler class of a plot service.
+
+    Args:
+        service (dict): service state from make_service()
+
+    Other functions and files called by this function:
+        get_plot_html()
+        get_metrics()
+
+    Files created by this function: None
+
+    Returns:
+        PlotRequestHandler (class): http.server request handler class
+    """
+
+    class PlotRequestHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_body(self, status, body, content_type, headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for header_name, header_val in headers:
+                self.send_header(header_name, header_val)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/metrics":
+                body = json.dumps(get_metrics(service)).encode("utf-8")
+                self.send_body(200, body, "application/json")
+                return
+            query = urllib.parse.parse_qs(url.query)
+            render_mode = query.get("render_mode", ["lines"])[0]
+            if url.path == "/detail":
+                if render_mode not in RENDER_MODES:
+                    self.send_body(400, b"unknown render_mode\n", "text/plain")
+                    return
+                detail_bytes, data_version = get_detail_json(
+                    service, render_mode
+                )
+                # The points of a replaced panel are no longer served
+                if query.get("data_version", [data_version])[0] != (
+                    data_version
+                ):
+                    self.send_body(410, b"data version gone\n", "text/plain")
+                    return
+                self.send_body(
+                    200,
+                    detail_bytes,
+                    "application/json",
+                    [("X-Data-Version", data_version)],
+                )
+                return
+            if url.path not in ("/", "/plot"):
+                self.send_body(404, b"not found\n", "text/plain")
+                return
+
+            panel = service["panel"]
+            try:
+                frwd_mths_main = int(query.get("frwd_mths_main", ["53"])[0])
+                bkwd_mths_main = int(query.get("bkwd_mths_main", ["5"])[0])
+                max_points = query.get("max_points", [None])[0]
+                if max_points is not None:
+                    max_points = int(max_points)
+            except ValueError:
+                self.send_body(
+                    400,
+                    b"months and max_points must be integers\n",
+                    "text/plain",
+                )
+                return
+            if not (
+                0 < frwd_mths_main <= panel["frwd_mths_max"]
+                and 0 <= bkwd_mths_main <= panel["bkwd_mths_max"]
+                and render_mode in RENDER_MODES
+                and (max_points is None or max_points >= 4)
+            ):
+                err_msg = (
+                    "frwd_mths_main must be in 1-"
+                    + str(panel["frwd_mths_max"])
+                    + ", bkwd_mths_main in 0-"
+                    + str(panel["bkwd_mths_max"])
+                    + ", render_mode one of "
+                    + ", ".join(RENDER_MODES)
+                    + ", and max_points at least 4\n"
+                )
+                self.send_body(400, err_msg.encode("utf-8"), "text/plain")
+                return
+
+            html_bytes, data_version, cache_hit = get_plot_html(
+                service,
+                frwd_mths_main,
+                bkwd_mths_main,
+                render_mode,
+                max_points,
+            )
+            self.send_body(
+                200,
+                html_bytes,
+                "text/html; charset=utf-8",
+                [
+                    ("X-Cache", "hit" if cache_hit else "miss"),
+                    ("X-Data-Version", data_version),
+                ],
+            )
+
+        def log_message(self, *args):
+            pass
+
+    return PlotRequestHandler
+
+
+def serve(
+    host="127.0.0.1",
+    port=8000,
+    max_cache_mb=64.0,
+    refresh_secs=3600.0,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    download_from_internet=True,
+    end_date_str="today",
+    rec_file_path=None,
+    panel_path=None,
+    publish_panel=True,
+):
+    """
+    This function runs the plot service until it is interrupted.
+
+    Args:
+        host (str): host name or IP address to listen on
+        port (int): port to listen on
+        max_cache_mb (float): maximum total size in MB of the cached plots
+        refresh_secs (float): number of seconds between data reloads. If 0,
+            the data are loaded once
+        frwd_mths_max (int): maximum number of months forward from the peak
+        bkwd_mths_max (int): maximum number of months backward from the peak
+        download_from_internet (bool): =True if download data from St. Louis
+            Federal Reserve's FRED system, otherwise read data in from local
+            directory
+        end_date_str (str): either 'today' or the end date of the PAYEMS
+            series in 'YYYY-mm-dd' format
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        panel_path (str): path of the panel file shared with other service
+            processes, see load_panel(). If None, no file is shared
+        publish_panel (bool): =True if this process loads the series and
+            writes the shared panel file, =False if it attaches to the file
+
+    Other functions and files called by this function:
+        load_panel()
+        make_service()
+        start_refresh_thread()
+        make_request_handler()
+
+    Files created by this function:
+        fred_cache/PAYEMS.csv
+        vintage_cache/PAYEMS.bin
+        [panel_path] (if panel_path)
+
+    Returns: None
+    """
+
+    def panel_loader():
+        return load_panel(
+            frwd_mths_max,
+            bkwd_mths_max,
+            end_date_str,
+            download_from_internet,
+            rec_file_path,
+            panel_path,
+            publish_panel,
+        )
+
+    def log_refresh(stage_rec):
+        if stage_rec["name"] != "panel_refresh":
+            return
+        if "error" in stage_rec:
+            print("refresh of the plot data failed:", stage_rec["error"])
+        elif stage_rec["updated"]:
+            print("plot data updated to version", stage_rec["data_version"])
+
+    service = make_service(panel_loader, max_cache_mb)
+    if refresh_secs > 0:
+        start_refresh_thread(service, refresh_secs, log_refresh)
+    server = http.server.ThreadingHTTPServer(
+        (host, port), make_request_handler(service)
+    )
+    print(
+        "Serving the normalized peak plot on http://"
+        + host
+        + ":"
+        + str(server.server_port)
+        + "/plot"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service["stop_event"].set()
+        server.server_close()
+
+
+def main(argv=None):
+    """
+    This function is the command line interface of the plot service.
+
+    Args:
+        argv (list): list of command line arguments. If None, sys.argv[1:]
+
+    Other functions and files called by this function:
+        serve()
+
+    Files created by this function:
+        fred_cache/PAYEMS.csv
+        vintage_cache/PAYEMS.bin
+        [panel_path] (if panel_path)
+
+    Returns: None
+    """
+    parser = argparse.ArgumentParser(
+        prog="usempl-npp-serve",
+        description="HTTP service of the normalized peak plot of U.S. "
+        + "nonfarm employment (PAYEMS) in the last 15 recessions",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=64.0,
+        help="maximum total size in MB of the cached plots",
+    )
+    parser.add_argument(
+        "--refresh-mins",
+        type=float,
+        default=60.0,
+        help="minutes between data reloads, 0 to load the data once",
+    )
+    parser.add_argument("--frwd-mths-max", type=int, default=135)
+    parser.add_argument("--bkwd-mths-max", type=int, default=48)
+    parser.add_argument(
+        "--end-date",
+        default="today",
+        help="end date of the series in YYYY-mm-dd format",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="read the series from the local data directory",
+    )
+    parser.add_argument(
+        "--rec-file", help="path of the recession registry CSV file"
+    )
+    parser.add_argument(
+        "--panel-file",
+        help="path of the memory-mapped panel file shared with other "
+        + "service processes",
+    )
+    parser.add_argument(
+        "--attach-panel",
+        action="store_true",
+        help="attach to the panel file written by another service process "
+        + "instead of loading the series",
+    )
+    args = parser.parse_args(argv)
+
+    serve(
+        args.host,
+        args.port,
+        args.cache_mb,
+        args.refresh_mins * 60,
+        args.frwd_mths_max,
+        args.bkwd_mths_max,
+        not args.offline,
+        args.end_date,
+        args.rec_file,
+        args.panel_file,
+        not args.attach_panel,
+    )
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
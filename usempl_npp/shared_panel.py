@@ -0,0 +1,162 @@
+"""
+This module shares one long normalized peak DataFrame among several worker
+processes, e.g., the processes of the plot service behind one load balancer.
+The panel is written once to a binary file that holds a JSON metadata
+header (column layout, recession labels, peak values and dates, end date)
+followed by each column as one contiguous, 64-byte aligned array. Each
+worker memory-maps the file read-only and builds its DataFrame on top of the
+mapped arrays without copying them, so the operating system keeps one copy
+of the panel in its page cache however many workers are attached. A new
+panel is written to a temporary file that replaces the old one, so attached
+workers keep a consistent panel until they attach again.
+
+This module defines the following function(s):
+    write_shared_panel()
+    attach_shared_panel()
+"""
+
+# Import packages
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# File header: magic bytes and the length in bytes of the JSON metadata as a
+# little-endian 8-byte integer. Columns start at multiples of PANEL_ALIGN
+# bytes
+PANEL_HEADER = b"usempl panel\n"
+PANEL_ALIGN = 64
+
+# In-process memo of attached panel files, keyed by panel file path with the
+# file's (inode, mtime_ns, size) signature so that a replaced file is
+# attached again
+_panel_memo = {}
+
+"""
+Define functions
+"""
+
+
+def write_shared_panel(usempl_pk_long, panel_meta, panel_path):
+    """
+    This function writes the long normalized peak DataFrame and its metadata
+    to a shared panel file. Categorical columns are stored as their integer
+    codes with the categories in the metadata. The file is written next to
+    panel_path and then renamed to panel_path, so that a worker never
+    attaches a partly written file.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            usempl_data.get_usempl_data(output_format='long')
+        panel_meta (dict): JSON-serializable metadata of the panel, e.g., the
+            recession labels, peak values, and peak dates
+        panel_path (str): path of the shared panel file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        [panel_path]
+
+    Returns:
+        num_bytes (int): size in bytes of the shared panel file
+    """
+    col_arr_lst = []
+    col_meta_lst = []
+    for col in usempl_pk_long.columns:
+        col_meta = {"name": col}
+        if isinstance(usempl_pk_long[col].dtype, pd.CategoricalDtype):
+            col_arr = usempl_pk_long[col].cat.codes.to_numpy()
+            col_meta["categories"] = usempl_pk_long[
+                col
+            ].cat.categories.tolist()
+        else:
+            col_arr = usempl_pk_long[col].to_numpy()
+        col_meta["dtype"] = col_arr.dtype.str
+        col_arr_lst.append(np.ascontiguousarray(col_arr))
+        col_meta_lst.append(col_meta)
+
+    # Column offsets depend on the metadata length, so lay out the columns
+    # from an upper bound of the header length and pad the header to it
+    def get_meta_bytes(data_start):
+        offset = data_start
+        for col_meta, col_arr in zip(col_meta_lst, col_arr_lst):
+            col_meta["offset"] = offset
+            offset += -(-col_arr.nbytes // PANEL_ALIGN) * PANEL_ALIGN
+        file_meta = {
+            "num_rows": len(usempl_pk_long),
+            "columns": col_meta_lst,
+            "meta": panel_meta,
+        }
+        return json.dumps(file_meta).encode("utf-8")
+
+    meta_len = len(get_meta_bytes(0)) + 16 * len(col_meta_lst)
+    data_start = -(-(len(PANEL_HEADER) + 8 + meta_len) // PANEL_ALIGN) * (
+        PANEL_ALIGN
+    )
+    meta_bytes = get_meta_bytes(data_start).ljust(meta_len)
+
+    tmp_path = panel_path + ".tmp" + str(os.getpid())
+    with open(tmp_path, "wb") as panel_file:
+        panel_file.write(PANEL_HEADER)
+        panel_file.write(meta_len.to_bytes(8, "little"))
+        panel_file.write(meta_bytes)
+        for col_meta, col_arr in zip(col_meta_lst, col_arr_lst):
+            panel_file.write(b"\0" * (col_meta["offset"] - panel_file.tell()))
+            panel_file.write(col_arr.tobytes())
+        num_bytes = panel_file.tell()
+    os.replace(tmp_path, panel_path)
+
+    return num_bytes
+
+
+def attach_shared_panel(panel_path):
+    """
+    This function memory-maps a shared panel file read-only and returns its
+    long normalized peak DataFrame, whose columns are views of the mapped
+    file, and its metadata. A file that has not changed since an earlier
+    call in this process is not mapped again.
+
+    Args:
+        panel_path (str): path of the shared panel file
+
+    Other functions and files called by this function:
+        [panel_path]
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk_long (DataFrame): read-only long normalized peak DataFrame
+        panel_meta (dict): metadata of the panel from write_shared_panel()
+    """
+    stat = os.stat(panel_path)
+    file_sig = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    memo = _panel_memo.get(panel_path)
+    if memo is not None and memo[0] == file_sig:
+        return memo[1], memo[2]
+
+    panel_map = np.memmap(panel_path, dtype=np.uint8, mode="r")
+    if bytes(panel_map[: len(PANEL_HEADER)]) != PANEL_HEADER:
+        raise ValueError(panel_path + " is not a shared panel file.")
+    meta_beg = len(PANEL_HEADER) + 8
+    meta_len = int.from_bytes(
+        panel_map[len(PANEL_HEADER) : meta_beg], "little"
+    )
+    file_meta = json.loads(bytes(panel_map[meta_beg : meta_beg + meta_len]))
+    num_rows = file_meta["num_rows"]
+    col_dict = {}
+    for col_meta in file_meta["columns"]:
+        col_dtype = np.dtype(col_meta["dtype"])
+        col_arr = panel_map[
+            col_meta["offset"] : col_meta["offset"]
+            + num_rows * col_dtype.itemsize
+        ].view(col_dtype)
+        if "categories" in col_meta:
+            col_arr = pd.Categorical.from_codes(
+                col_arr, categories=col_meta["categories"]
+            )
+        col_dict[col_meta["name"]] = col_arr
+    usempl_pk_long = pd.DataFrame(col_dict, copy=False)
+    panel_meta = file_meta["meta"]
+    _panel_memo[panel_path] = (file_sig, usempl_pk_long, panel_meta)
+
+    return usempl_pk_long, panel_meta
@@ -0,0 +1,330 @@
+"""
+This module renders the normalized peak plot of usempl_npp_bokeh.py as a
+static PNG, SVG, or PDF image with Matplotlib, e.g., for the thumbnails of
+email digests and report PDFs. The image is drawn from the same long
+normalized peak DataFrame, legend labels, line colors, and main plot window
+as the Bokeh figure, by the non-interactive Agg (raster) and vector backends
+of Matplotlib, so no browser or browser driver is needed. The figures are
+built with the object-oriented Figure API instead of pyplot, so nothing is
+kept open between renders.
+
+This module defines the following function(s):
+    create_usempl_image()
+    save_usempl_image()
+    usempl_npp_image()
+"""
+
+# Import packages
+import datetime as dt
+import os
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from usempl_npp import instrument
+from usempl_npp import usempl_data
+from usempl_npp import usempl_npp_bokeh
+
+# Image formats written by save_usempl_image()
+IMAGE_FORMATS = ("png", "svg", "pdf")
+
+"""
+Define functions
+"""
+
+
+def create_usempl_image(
+    usempl_pk_long,
+    rec_label_yrmth_lst,
+    end_date,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    width_px=800,
+    height_px=500,
+    dpi=100,
+    thumbnail=False,
+):
+    """
+    This function creates the Matplotlib figure of the normalized peak plot
+    of the main window from the long normalized peak DataFrame. The x- and
+    y-ranges, line colors, and line widths (in pixels) are those of
+    usempl_npp_bokeh.create_usempl_fig(). With thumbnail=True, the legend,
+    axis labels, and source note are left out, one short title is kept, and
+    the line widths and fonts are scaled to the image width.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            get_usempl_data(output_format='long')
+        rec_label_yrmth_lst (list): list of string start year and month and
+            end year and month of each recession, used in the legend
+        end_date (datetime): date through which the plot is updated, shown in
+            the source note below the figure
+        frwd_mths_main (int): number of months forward from the peak to plot
+        bkwd_mths_main (int): number of months backward from the peak to plot
+        width_px (int): width of the image in pixels
+        height_px (int): height of the image in pixels
+        dpi (int): pixels per inch of the image
+        thumbnail (bool): =True if draw the small version of the plot
+
+    Other functions and files called by this function:
+        usempl_data.get_recession_groups()
+        usempl_npp_bokeh.get_line_styles()
+
+    Files created by this function: None
+
+    Returns:
+        fig (Matplotlib Figure): normalized peak plot figure
+    """
+    rec_groups = usempl_data.get_recession_groups(usempl_pk_long)
+    num_rec = len(rec_groups)
+    line_colors, line_widths = usempl_npp_bokeh.get_line_styles(num_rec)
+
+    # Main window with 10% buffers, as in the Bokeh figure
+    usempl_dv_pk_main = usempl_pk_long["usempl_dv_pk"][
+        (usempl_pk_long["mths_frm_peak"] >= -bkwd_mths_main)
+        & (usempl_pk_long["mths_frm_peak"] <= frwd_mths_main)
+    ]
+    min_main_val = float(usempl_dv_pk_main.min())
+    max_main_val = float(usempl_dv_pk_main.max())
+    datarange_main_vals = max_main_val - min_main_val
+    datarange_main_mths = int(frwd_mths_main + bkwd_mths_main)
+    fig_buffer_pct = 0.10
+
+    # Line widths are given in points, and the fonts of a thumbnail shrink
+    # with its width
+    pt_per_px = 72.0 / dpi
+    if thumbnail:
+        pt_per_px *= min(1.0, width_px / 800)
+        font_size = max(5.0, 10.0 * width_px / 800)
+    else:
+        font_size = 10.0
+
+    fig = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    if thumbnail:
+        fig.subplots_adjust(left=0.1, right=0.98, top=0.88, bottom=0.1)
+    else:
+        fig.subplots_adjust(left=0.09, right=0.76, top=0.86, bottom=0.15)
+    ax = fig.add_subplot()
+    for i, (rec_label_yrmth, usempl_pk_rec) in enumerate(
+        zip(rec_label_yrmth_lst, rec_groups.values())
+    ):
+        ax.plot(
+            usempl_pk_rec["mths_frm_peak"].to_numpy(),
+            usempl_pk_rec["usempl_dv_pk"].to_numpy(),
+            color=line_colors[i],
+            linewidth=line_widths[i] * pt_per_px,
+            alpha=0.7,
+            label=rec_label_yrmth,
+        )
+    ax.axhline(
+        1.0,
+        color="black",
+        linewidth=2 * pt_per_px,
+        linestyle="--",
+        alpha=0.5,
+    )
+    ax.set_xlim(
+        -bkwd_mths_main - fig_buffer_pct * datarange_main_mths,
+        frwd_mths_main + fig_buffer_pct * datarange_main_mths,
+    )
+    ax.set_ylim(
+        min_main_val - fig_buffer_pct * datarange_main_vals,
+        max_main_val + fig_buffer_pct * datarange_main_vals,
+    )
+    ax.tick_params(labelsize=0.8 * font_size)
+
+    updated_date_str = (
+        end_date.strftime("%B")
+        + " "
+        + end_date.strftime("%d").lstrip("0")
+        + ", "
+        + end_date.strftime("%Y")
+    )
+    if thumbnail:
+        ax.set_title(
+            "PAYEMS in last "
+            + str(num_rec)
+            + " recessions, "
+            + updated_date_str,
+            fontsize=font_size,
+            fontweight="bold",
+        )
+    else:
+        ax.set_xlabel("Months from Peak", fontsize=font_size)
+        ax.set_ylabel("PAYEMS as fraction of Peak", fontsize=font_size)
+        fig.suptitle(
+            "Progression of U.S. total nonfarm employment\n"
+            + "(PAYEMS, seasonally adjusted) in last "
+            + str(num_rec)
+            + " recessions",
+            fontsize=1.4 * font_size,
+            fontweight="bold",
+        )
+        ax.legend(
+            loc="center left",
+            bbox_to_anchor=(1.02, 0.5),
+            fontsize=0.8 * font_size,
+            frameon=False,
+        )
+        fig.text(
+            0.01,
+            0.01,
+            "Source: Richard W. Evans (@RickEcon), "
+            + "historical PAYEMS data from FRED and BLS, "
+            + "updated "
+            + updated_date_str
+            + ".",
+            fontsize=0.8 * font_size,
+            fontstyle="italic",
+        )
+
+    return fig
+
+
+def save_usempl_image(fig, image_path, image_format=None):
+    """
+    This function saves the Matplotlib figure of the normalized peak plot
+    as a PNG, SVG, or PDF file. The creation date is left out of the SVG and
+    PDF metadata and the SVG element ids are hashed with a fixed salt, so
+    the same figure always gives the same file.
+
+    Args:
+        fig (Matplotlib Figure): figure from create_usempl_image()
+        image_path (str): path of the image file
+        image_format (str): 'png', 'svg', or 'pdf'. If None, the extension
+            of image_path
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        [image_path]
+
+    Returns: None
+    """
+    if image_format is None:
+        image_format = os.path.splitext(image_path)[1].lstrip(".").lower()
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(
+            "image_format must be 'png', 'svg', or 'pdf', not "
+            + repr(image_format)
+        )
+    if image_format == "png":
+        metadata = None
+    else:
+        metadata = {"Date": None}
+    with matplotlib.rc_context({"svg.hashsalt": "usempl_npp"}):
+        fig.savefig(image_path, format=image_format, metadata=metadata)
+
+
+def usempl_npp_image(
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    usempl_end_date="today",
+    download_from_internet=True,
+    image_format="png",
+    thumbnail=False,
+    image_dir=None,
+    verbose=False,
+):
+    """
+    This function saves the static image of the normalized peak plot of the
+    last 15 recessions in the United States, the counterpart of
+    usempl_npp_bokeh.usempl_npp() without a browser.
+
+    Args:
+        frwd_mths_main (int): number of months forward from the peak to plot
+        bkwd_mths_main (int): number of months backward from the peak to plot
+        frwd_mths_max (int): maximum number of months forward from the peak of
+            the aligned data
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            of the aligned data
+        usempl_end_date (str): either 'today' or the end date of PAYEMS time
+            series in 'YYYY-mm-dd' format
+        download_from_internet (bool): =True if download data from St. Louis
+            Federal Reserve's FRED system
+            (https://fred.stlouisfed.org/series/PAYEMS), otherwise read data in
+            from local directory
+        image_format (str): 'png', 'svg', or 'pdf'
+        thumbnail (bool): =True if save the 400 x 250 pixel thumbnail
+            instead of the 800 x 500 pixel image
+        image_dir (str): directory of the image file. If None, the images
+            folder in this package directory
+        verbose (bool): =True if print the end date and the peak value and
+            date of each recession, which are also recorded by the stages of
+            get_usempl_data()
+
+    Other functions and files called by this function:
+        usempl_data.get_usempl_data()
+        create_usempl_image()
+        save_usempl_image()
+        instrument.stage()
+
+    Files created by this function:
+        images/usempl_npp_[yyyy-mm-dd].[png, svg, or pdf]
+
+    Returns:
+        image_path (str): path of the saved image file
+        end_date_str (str): end date of the PAYEMS series in 'YYYY-mm-dd'
+            format
+    """
+    if image_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        image_dir = os.path.join(cur_path, "images")
+    if not os.access(image_dir, os.F_OK):
+        os.makedirs(image_dir)
+
+    if usempl_end_date == "today":
+        end_date = dt.date.today()
+    else:
+        end_date = dt.datetime.strptime(usempl_end_date, "%Y-%m-%d")
+    end_date_str = end_date.strftime("%Y-%m-%d")
+
+    (
+        usempl_pk_long,
+        end_date_str2,
+        _,
+        _,
+        _,
+        rec_label_yrmth_lst,
+        _,
+        _,
+    ) = usempl_data.get_usempl_data(
+        int(frwd_mths_max),
+        int(bkwd_mths_max),
+        end_date_str,
+        download_from_internet,
+        output_format="long",
+        verbose=verbose,
+    )
+
+    with instrument.stage("figure_build") as stage_rec:
+        if thumbnail:
+            fig = create_usempl_image(
+                usempl_pk_long,
+                rec_label_yrmth_lst,
+                end_date,
+                int(frwd_mths_main),
+                int(bkwd_mths_main),
+                width_px=400,
+                height_px=250,
+                thumbnail=True,
+            )
+        else:
+            fig = create_usempl_image(
+                usempl_pk_long,
+                rec_label_yrmth_lst,
+                end_date,
+                int(frwd_mths_main),
+                int(bkwd_mths_main),
+            )
+        stage_rec["rows"] = len(usempl_pk_long)
+    image_path = os.path.join(
+        image_dir, "usempl_npp_" + end_date_str2 + "." + image_format
+    )
+    with instrument.stage("image_write") as stage_rec:
+        save_usempl_image(fig, image_path, image_format)
+        stage_rec["bytes"] = os.path.getsize(image_path)
+
+    return image_path, end_date_str
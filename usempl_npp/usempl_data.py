@@ -0,0 +1,1280 @@
+"""
+This module downloads the U.S. total nonfarm payrolls seasonally adjusted
+(PAYEMS) monthly time series from the St. Louis Federal Reserve's FRED system
+(https://fred.stlouisfed.org/series/PAYEMS) or loads it from this directory and
+organizes it into 15 series, one for each of the last 15 recessions--from the
+current 2020 Coronavirus recession to the Great Depression of 1929. It holds
+the data side of the normalized peak plot and does not import Bokeh, so that
+it can be imported cheaply by processes that do not render plots. Each
+downloaded vintage of the series is kept in the vintage store of
+vintage_store.py.
+
+This module defines the following function(s):
+    get_peak_indices()
+    get_period_ordinals()
+    align_peak_matrix()
+    align_peaks()
+    get_usempl_delta()
+    update_usempl_pk()
+    build_usempl_pk_long()
+    align_peaks_long()
+    usempl_pk_to_long()
+    get_recession_groups()
+    write_usempl_pk()
+    read_usempl_pk()
+    get_recession_registry()
+    get_registry_key()
+    get_usempl_backcast()
+    get_usempl_series()
+    get_usempl_data()
+"""
+
+# Import packages
+import numpy as np
+import pandas as pd
+import datetime as dt
+import hashlib
+import os
+from usempl_npp import fred_cache
+from usempl_npp import instrument
+from usempl_npp import vintage_store
+
+# Version of the 1919-1938 monthly backcast. Changing it makes
+# get_usempl_backcast() compute the backcast again.
+BACKCAST_VERSION = 1
+
+# Monthly backcasts computed or loaded in this process, by backcast key
+_backcast_memo = {}
+
+# Business days are counted from this Monday, so that business day ordinals
+# are consecutive across weekends
+BDAY_EPOCH = np.datetime64("1970-01-05", "D")
+
+"""
+Define functions
+"""
+
+
+def get_peak_indices(
+    usempl_df, maxdate_rng_lst, value_col="PAYEMS", skip_empty=False
+):
+    """
+    This function finds the row index of the peak PAYEMS value within each of
+    the search windows in maxdate_rng_lst in one vectorized pass. The window
+    bounds are located by binary search on the sorted Date column, and the
+    peak is the maximum PAYEMS value in each window. As in the original
+    boolean-mask search, ties are broken in favor of the latest date.
+
+    Args:
+        usempl_df (DataFrame): data with columns Date and PAYEMS, sorted by
+            Date from oldest to newest
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date within which range we define the peak PAYEMS value at
+            the beginning of each recession
+        value_col (str): name of the value column of usempl_df
+        skip_empty (bool): =True if return a row index of -1 for windows
+            without observations, otherwise raise a ValueError
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        peak_idx (array_like): (R,) integer array of the row index in
+            usempl_df of the peak PAYEMS value for each of the R windows
+    """
+    dates = usempl_df["Date"].to_numpy()
+    values = usempl_df[value_col].to_numpy(dtype=float)
+    win_beg = pd.to_datetime([rng[0] for rng in maxdate_rng_lst]).to_numpy()
+    win_end = pd.to_datetime([rng[1] for rng in maxdate_rng_lst]).to_numpy()
+    lo = np.searchsorted(dates, win_beg, side="left")
+    hi = np.searchsorted(dates, win_end, side="right")
+    win_len = hi - lo
+    # Gather every window into one padded (R x max_len) matrix. Padding and
+    # missing values are set to -inf so that they can never be the maximum
+    offsets = np.arange(max(int(win_len.max()), 1))
+    win_idx = np.minimum(lo[:, None] + offsets, len(values) - 1)
+    win_vals = values[win_idx]
+    win_vals[(offsets >= win_len[:, None]) | np.isnan(win_vals)] = -np.inf
+    is_empty = np.isneginf(win_vals.max(axis=1))
+    if is_empty.any() and not skip_empty:
+        empty_rng = [
+            rng
+            for rng, win_max in zip(maxdate_rng_lst, win_vals.max(axis=1))
+            if np.isneginf(win_max)
+        ]
+        raise ValueError(
+            "No "
+            + value_col
+            + " observations in peak search window(s) "
+            + str(empty_rng)
+            + "."
+        )
+    # Take the argmax over the reversed rows to select the latest peak date
+    last_max = offsets[-1] - np.argmax(win_vals[:, ::-1], axis=1)
+    peak_idx = np.where(is_empty, -1, lo + last_max)
+
+    return peak_idx
+
+
+def get_period_ordinals(dates, freq="M"):
+    """
+    This function converts dates into integer period ordinals of a pandas
+    frequency, so that the number of periods between two dates is the
+    difference of their ordinals. Months ('M'), calendar days ('D'), and
+    business days ('B', Monday to Friday) are computed directly in NumPy,
+    and any other pandas period frequency (e.g., 'W-FRI', 'Q', 'A') through
+    pandas periods.
+
+    Args:
+        dates (array_like): (N,) datetime64 array without NaT
+        freq (str): pandas frequency of the periods, e.g., 'M', 'B', 'D',
+            'W-FRI', or 'Q'
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        per_ord (array_like): (N,) integer array of the period ordinal of
+            each date
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    if freq == "M":
+        per_ord = dates.astype("datetime64[M]").astype(np.int64)
+    elif freq == "D":
+        per_ord = dates.astype("datetime64[D]").astype(np.int64)
+    elif freq == "B":
+        days = dates.astype("datetime64[D]")
+        if not np.is_busday(days).all():
+            raise ValueError(
+                "Dates on weekends have no business day period, e.g., "
+                + str(days[~np.is_busday(days)][0])
+                + "."
+            )
+        per_ord = np.busday_count(BDAY_EPOCH, days)
+    else:
+        per_ord = pd.DatetimeIndex(dates).to_period(freq).asi8
+
+    return per_ord
+
+
+def align_peak_matrix(
+    usempl_df,
+    peak_idx,
+    frwd_mths_max,
+    bkwd_mths_max,
+    value_col="PAYEMS",
+    freq="M",
+):
+    """
+    This function is the alignment engine behind align_peaks() and
+    align_peaks_long(). Every observation gets the integer ordinal of its
+    period of frequency freq, the series is scattered onto a dense grid of
+    periods (missing periods are NaN/NaT), and the (recession x
+    periods-from-peak) matrices of dates and values are then gathered from
+    that grid with a single NumPy fancy-indexing step. Periods that fall
+    outside the data are NaN-padded.
+
+    Args:
+        usempl_df (DataFrame): data with columns Date and PAYEMS, sorted by
+            Date from oldest to newest with at most one observation per
+            period of frequency freq
+        peak_idx (array_like): (R,) integer array of the row index in
+            usempl_df of the peak PAYEMS value of each recession
+        frwd_mths_max (int): maximum number of periods (months if freq is
+            'M') forward from the peak period to plot
+        bkwd_mths_max (int): maximum number of periods (months if freq is
+            'M') backward from the peak period to plot
+        value_col (str): name of the value column of usempl_df
+        freq (str): pandas frequency of the periods from peak, e.g., 'M',
+            'B', 'W-FRI', or 'Q', see get_period_ordinals()
+
+    Other functions and files called by this function:
+        get_period_ordinals()
+
+    Files created by this function: None
+
+    Returns:
+        mths_frm_peak (array_like): (N,) integer array of periods from peak
+        rec_dates (array_like): (R, N) datetime64 array of the date of each
+            recession at each period from peak
+        rec_vals (array_like): (R, N) float array of the PAYEMS value of
+            each recession at each period from peak
+        peak_val_arr (array_like): (R,) float array of peak PAYEMS values
+    """
+    dates = usempl_df["Date"].to_numpy(dtype="datetime64[ns]")
+    values = usempl_df[value_col].to_numpy(dtype=float)
+    peak_idx = np.asarray(peak_idx, dtype=np.int64)
+
+    # Integer period ordinal of every observation and its position on a
+    # dense grid of periods running from the first to the last period of the
+    # data
+    per_ord = get_period_ordinals(dates, freq)
+    if (np.diff(per_ord) <= 0).any():
+        raise ValueError(
+            "The series must be sorted by Date with at most one observation "
+            + "per period of frequency "
+            + repr(freq)
+            + "."
+        )
+    grid_beg = per_ord.min()
+    grid_len = per_ord.max() - grid_beg + 1
+    grid_vals = np.full(grid_len, np.nan)
+    grid_vals[per_ord - grid_beg] = values
+    grid_dates = np.full(grid_len, np.datetime64("NaT"), dtype=dates.dtype)
+    grid_dates[per_ord - grid_beg] = dates
+
+    # One gather of the (R x N) matrix of grid positions, masked at the edges
+    mths_frm_peak = np.arange(-bkwd_mths_max, frwd_mths_max + 1, dtype=int)
+    grid_pos = (per_ord[peak_idx] - grid_beg)[:, None] + mths_frm_peak
+    in_grid = (grid_pos >= 0) & (grid_pos < grid_len)
+    grid_pos = np.clip(grid_pos, 0, grid_len - 1)
+    rec_vals = np.where(in_grid, grid_vals[grid_pos], np.nan)
+    rec_dates = np.where(in_grid, grid_dates[grid_pos], np.datetime64("NaT"))
+    peak_val_arr = values[peak_idx]
+
+    return mths_frm_peak, rec_dates, rec_vals, peak_val_arr
+
+
+def align_peaks(usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max):
+    """
+    This function builds the wide normalized peak DataFrame for all
+    recessions at once from the matrices of align_peak_matrix().
+
+    Args:
+        usempl_df (DataFrame): data with columns Date and PAYEMS, sorted by
+            Date from oldest to newest with at most one observation per month
+        peak_idx (array_like): (R,) integer array of the row index in
+            usempl_df of the peak PAYEMS value of each recession
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month to plot
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month to plot
+
+    Other functions and files called by this function:
+        align_peak_matrix()
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk (DataFrame): N x (1 + 3R) DataFrame of mths_frm_peak,
+            Date{i}, PAYEMS{i}, and usempl_dv_pk{i} for each of the R
+            recessions for the periods specified by bkwd_mths_max and
+            frwd_mths_max
+        peak_vals (list): list of peak PAYEMS value of each recession
+        peak_dates (list): list of string date (YYYY-mm-dd) of peak PAYEMS
+            value of each recession
+    """
+    mths_frm_peak, rec_dates, rec_vals, peak_val_arr = align_peak_matrix(
+        usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+    )
+    rec_dv_pk = rec_vals / peak_val_arr[:, None]
+
+    usempl_pk_dict = {"mths_frm_peak": mths_frm_peak}
+    for i in range(len(peak_idx)):
+        usempl_pk_dict[f"Date{i}"] = rec_dates[i]
+        usempl_pk_dict[f"PAYEMS{i}"] = rec_vals[i]
+        usempl_pk_dict[f"usempl_dv_pk{i}"] = rec_dv_pk[i]
+    usempl_pk = pd.DataFrame(usempl_pk_dict)
+
+    peak_vals = list(usempl_df["PAYEMS"].to_numpy()[peak_idx])
+    peak_dates = [
+        pd.Timestamp(peak_date).strftime("%Y-%m-%d")
+        for peak_date in usempl_df["Date"].to_numpy()[peak_idx]
+    ]
+
+    return usempl_pk, peak_vals, peak_dates
+
+
+def get_usempl_delta(usempl_df_old, usempl_df):
+    """
+    This function finds the observations of a new vintage of the PAYEMS
+    series that are new or revised relative to an older vintage.
+
+    Args:
+        usempl_df_old (DataFrame): older series with columns Date and PAYEMS
+        usempl_df (DataFrame): newer series with columns Date and PAYEMS
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        delta_df (DataFrame): observations of usempl_df with a Date that is
+            not in usempl_df_old or a different PAYEMS value, sorted by Date
+    """
+    old_dates = usempl_df_old["Date"].to_numpy(dtype="datetime64[ns]")
+    dates = usempl_df["Date"].to_numpy(dtype="datetime64[ns]")
+    if not np.isin(old_dates, dates).all():
+        raise ValueError(
+            "The newer PAYEMS series is missing dates of the older series."
+        )
+    old_vals = pd.Series(
+        usempl_df_old["PAYEMS"].to_numpy(dtype=float), index=old_dates
+    )
+    prev_vals = old_vals.reindex(dates).to_numpy()
+    vals = usempl_df["PAYEMS"].to_numpy(dtype=float)
+    is_changed = (prev_vals != vals) & ~(np.isnan(prev_vals) & np.isnan(vals))
+    delta_df = pd.DataFrame(
+        {"Date": dates[is_changed], "PAYEMS": vals[is_changed]}
+    )
+    delta_df = delta_df.sort_values(by="Date").reset_index(drop=True)
+
+    return delta_df
+
+
+def update_usempl_pk(usempl_pk, delta_df, maxdate_rng_lst, usempl_df=None):
+    """
+    This function patches the wide normalized peak DataFrame with new or
+    revised observations instead of aligning the full series again. Each
+    observation is written into the cells of the recessions whose window
+    holds its month. If an observation falls in the peak search window of a
+    recession, the peak is searched again in the patched window. A revised
+    peak value only rescales the usempl_dv_pk column of that recession. A
+    moved peak, or a peak search window that is not inside the months from
+    peak of usempl_pk, realigns that recession from usempl_df. The result is
+    identical to align_peaks() on the updated series.
+
+    Args:
+        usempl_pk (DataFrame): N x (1 + 3R) normalized peak DataFrame from
+            align_peaks() or read_usempl_pk()
+        delta_df (DataFrame): new or revised observations with columns Date
+            and PAYEMS, e.g., from get_usempl_delta()
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date of the peak search window of each recession
+        usempl_df (DataFrame): full updated series with columns Date and
+            PAYEMS, only needed to realign a recession. If None, a
+            realignment raises a ValueError
+
+    Other functions and files called by this function:
+        get_peak_indices()
+        align_peak_matrix()
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk (DataFrame): updated N x (1 + 3R) normalized peak DataFrame
+        peak_vals (list): list of peak PAYEMS value of each recession
+        peak_dates (list): list of string date (YYYY-mm-dd) of peak PAYEMS
+            value of each recession
+        rec_updated (list): list of the indices of the updated recessions
+    """
+    usempl_pk = usempl_pk.copy()
+    mths_frm_peak = usempl_pk["mths_frm_peak"].to_numpy()
+    bkwd_mths_max = -int(mths_frm_peak[0])
+    frwd_mths_max = int(mths_frm_peak[-1])
+    num_rec = len(maxdate_rng_lst)
+    peak_dates = usempl_pk[[f"Date{i}" for i in range(num_rec)]].to_numpy(
+        dtype="datetime64[ns]"
+    )[bkwd_mths_max]
+    peak_vals = usempl_pk[[f"PAYEMS{i}" for i in range(num_rec)]].to_numpy(
+        dtype=float
+    )[bkwd_mths_max]
+    peak_mth = peak_dates.astype("datetime64[M]").astype(np.int64)
+    delta_dates = delta_df["Date"].to_numpy(dtype="datetime64[ns]")
+    delta_vals = delta_df["PAYEMS"].to_numpy(dtype=float)
+    delta_mth = delta_dates.astype("datetime64[M]").astype(np.int64)
+    win_beg = np.array(
+        [rng[0] for rng in maxdate_rng_lst], dtype="datetime64[ns]"
+    )
+    win_end = np.array(
+        [rng[1] for rng in maxdate_rng_lst], dtype="datetime64[ns]"
+    )
+
+    # (R x D) row of each observation in the window of each recession
+    delta_row = delta_mth[None, :] - peak_mth[:, None] + bkwd_mths_max
+    in_panel = (delta_row >= 0) & (delta_row < len(usempl_pk))
+    in_search = (delta_dates[None, :] >= win_beg[:, None]) & (
+        delta_dates[None, :] <= win_end[:, None]
+    )
+    rec_updated = np.nonzero(in_panel.any(axis=1) | in_search.any(axis=1))[0]
+    win_row_beg = (
+        win_beg.astype("datetime64[M]").astype(np.int64)
+        - peak_mth
+        + bkwd_mths_max
+    )
+    win_row_end = (
+        win_end.astype("datetime64[M]").astype(np.int64)
+        - peak_mth
+        + bkwd_mths_max
+    )
+    for i in rec_updated:
+        rec_dates = usempl_pk[f"Date{i}"].to_numpy(copy=True)
+        rec_vals = usempl_pk[f"PAYEMS{i}"].to_numpy(copy=True)
+        rec_dates[delta_row[i, in_panel[i]]] = delta_dates[in_panel[i]]
+        rec_vals[delta_row[i, in_panel[i]]] = delta_vals[in_panel[i]]
+        # Search the peak again in the patched peak search window, which
+        # needs the full series if the window is not inside usempl_pk
+        realign = False
+        if in_search[i].any():
+            if win_row_beg[i] < 0 or win_row_end[i] >= len(usempl_pk):
+                realign = True
+            else:
+                win_rows = np.arange(win_row_beg[i], win_row_end[i] + 1)
+                win_vals = rec_vals[win_rows]
+                win_vals = np.where(
+                    (rec_dates[win_rows] >= win_beg[i])
+                    & (rec_dates[win_rows] <= win_end[i])
+                    & ~np.isnan(win_vals),
+                    win_vals,
+                    -np.inf,
+                )
+                # Latest date among ties, as in get_peak_indices()
+                peak_row = win_rows[-1] - np.argmax(win_vals[::-1])
+                realign = peak_row != bkwd_mths_max
+                peak_vals[i] = rec_vals[peak_row]
+        if realign:
+            if usempl_df is None:
+                raise ValueError(
+                    "Recession "
+                    + str(i)
+                    + " must be aligned again from the full series "
+                    + "usempl_df, because its peak moved or its peak search "
+                    + "window is not inside the normalized peak series."
+                )
+            peak_idx = get_peak_indices(usempl_df, [(win_beg[i], win_end[i])])
+            _, rec_dates, rec_vals, peak_val_arr = align_peak_matrix(
+                usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+            )
+            rec_dates = rec_dates[0]
+            rec_vals = rec_vals[0]
+            peak_vals[i] = peak_val_arr[0]
+            peak_dates[i] = usempl_df["Date"].to_numpy()[peak_idx[0]]
+        usempl_pk[f"Date{i}"] = rec_dates
+        usempl_pk[f"PAYEMS{i}"] = rec_vals
+        usempl_pk[f"usempl_dv_pk{i}"] = rec_vals / peak_vals[i]
+
+    peak_dates = [
+        pd.Timestamp(peak_date).strftime("%Y-%m-%d")
+        for peak_date in peak_dates
+    ]
+
+    return usempl_pk, list(peak_vals), peak_dates, list(rec_updated)
+
+
+def build_usempl_pk_long(
+    mths_frm_peak,
+    rec_dates,
+    rec_vals,
+    peak_val_arr,
+    rec_labels=None,
+    value_col="PAYEMS",
+    dv_pk_col="usempl_dv_pk",
+    period_col="mths_frm_peak",
+):
+    """
+    This function packs the (recession x periods-from-peak) matrices into
+    the long (tidy) normalized peak DataFrame. Periods without data are
+    dropped, and the rows of each recession are contiguous and sorted by
+    periods from peak, so that get_recession_groups() can return each
+    recession as a zero-copy slice.
+
+    Args:
+        mths_frm_peak (array_like): (N,) integer array of periods from peak
+        rec_dates (array_like): (R, N) datetime64 array of the date of each
+            recession at each period from peak
+        rec_vals (array_like): (R, N) float array of the PAYEMS value of
+            each recession at each period from peak
+        peak_val_arr (array_like): (R,) float array of peak PAYEMS values
+        rec_labels (list): list of R unique recession labels used as the
+            categories of recession_id. If None, the labels are '0' to 'R-1'
+        value_col (str): name of the value column
+        dv_pk_col (str): name of the value as fraction of peak column
+        period_col (str): name of the periods from peak column
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk_long (DataFrame): long DataFrame with columns recession_id
+            (categorical), mths_frm_peak (int16, or int32 for more than
+            32,767 periods from peak), Date, PAYEMS (float32), and
+            usempl_dv_pk (float32)
+    """
+    num_rec = rec_vals.shape[0]
+    if rec_labels is None:
+        rec_labels = [str(i) for i in range(num_rec)]
+    has_data = ~np.isnan(rec_vals) & ~np.isnat(rec_dates)
+    rec_idx, mth_idx = np.nonzero(has_data)
+    period_dtype = np.int16
+    if len(mths_frm_peak) and np.abs(mths_frm_peak).max() > 32767:
+        period_dtype = np.int32
+    usempl_pk_long = pd.DataFrame(
+        {
+            "recession_id": pd.Categorical.from_codes(
+                rec_idx, categories=rec_labels
+            ),
+            period_col: mths_frm_peak[mth_idx].astype(period_dtype),
+            "Date": rec_dates[has_data],
+            value_col: rec_vals[has_data].astype(np.float32),
+            dv_pk_col: (rec_vals[has_data] / peak_val_arr[rec_idx]).astype(
+                np.float32
+            ),
+        }
+    )
+
+    return usempl_pk_long
+
+
+def align_peaks_long(
+    usempl_df,
+    peak_idx,
+    frwd_mths_max,
+    bkwd_mths_max,
+    rec_labels=None,
+    value_col="PAYEMS",
+    dv_pk_col="usempl_dv_pk",
+    freq="M",
+    period_col="mths_frm_peak",
+):
+    """
+    This function builds the long (tidy) normalized peak DataFrame for all
+    recessions at once, without building the wide DataFrame first. With a
+    freq other than 'M', e.g., 'B' for a daily series of business days or
+    'W-FRI' for a weekly series, the recessions are aligned on periods of
+    that frequency from the peak in the same vectorized pass.
+
+    Args:
+        usempl_df (DataFrame): data with columns Date and PAYEMS, sorted by
+            Date from oldest to newest with at most one observation per
+            period of frequency freq
+        peak_idx (array_like): (R,) integer array of the row index in
+            usempl_df of the peak PAYEMS value of each recession
+        frwd_mths_max (int): maximum number of periods forward from the peak
+            period to plot
+        bkwd_mths_max (int): maximum number of periods backward from the
+            peak period to plot
+        rec_labels (list): list of R unique recession labels. If None, the
+            labels are '0' to 'R-1'
+        value_col (str): name of the value column of usempl_df and of the
+            returned DataFrame
+        dv_pk_col (str): name of the value as fraction of peak column of the
+            returned DataFrame
+        freq (str): pandas frequency of the periods from peak, see
+            get_period_ordinals()
+        period_col (str): name of the periods from peak column of the
+            returned DataFrame
+
+    Other functions and files called by this function:
+        align_peak_matrix()
+        build_usempl_pk_long()
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk_long (DataFrame): long DataFrame with columns recession_id,
+            period_col, Date, value_col, and dv_pk_col
+    """
+    return build_usempl_pk_long(
+        *align_peak_matrix(
+            usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max, value_col, freq
+        ),
+        rec_labels=rec_labels,
+        value_col=value_col,
+        dv_pk_col=dv_pk_col,
+        period_col=period_col,
+    )
+
+
+def usempl_pk_to_long(usempl_pk, rec_labels=None):
+    """
+    This function converts the wide normalized peak DataFrame into the long
+    (tidy) normalized peak DataFrame.
+
+    Args:
+        usempl_pk (DataFrame): N x (1 + 3R) normalized peak DataFrame
+        rec_labels (list): list of R unique recession labels. If None, the
+            labels are '0' to 'R-1'
+
+    Other functions and files called by this function:
+        build_usempl_pk_long()
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk_long (DataFrame): long DataFrame with columns recession_id,
+            mths_frm_peak, Date, PAYEMS, and usempl_dv_pk
+    """
+    num_rec = (usempl_pk.shape[1] - 1) // 3
+    mths_frm_peak = usempl_pk["mths_frm_peak"].to_numpy()
+    rec_dates = np.stack(
+        [
+            usempl_pk[f"Date{i}"].to_numpy(dtype="datetime64[ns]")
+            for i in range(num_rec)
+        ]
+    )
+    rec_vals = np.stack(
+        [usempl_pk[f"PAYEMS{i}"].to_numpy(dtype=float) for i in range(num_rec)]
+    )
+    peak_val_arr = rec_vals[:, mths_frm_peak == 0][:, 0]
+
+    return build_usempl_pk_long(
+        mths_frm_peak, rec_dates, rec_vals, peak_val_arr, rec_labels
+    )
+
+
+def get_recession_groups(usempl_pk_long):
+    """
+    This function splits the long normalized peak DataFrame into one
+    DataFrame per recession. Because the rows of each recession are
+    contiguous, each recession is a positional slice (a view) of
+    usempl_pk_long rather than a copy.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            build_usempl_pk_long()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        rec_groups (dict): dictionary with recession labels as keys and
+            DataFrame slices of usempl_pk_long as values, in recession order
+    """
+    rec_codes = usempl_pk_long["recession_id"].cat.codes.to_numpy()
+    rec_labels = usempl_pk_long["recession_id"].cat.categories
+    rec_bounds = np.searchsorted(rec_codes, np.arange(len(rec_labels) + 1))
+    rec_groups = {
+        rec_label: usempl_pk_long.iloc[rec_bounds[i] : rec_bounds[i + 1]]
+        for i, rec_label in enumerate(rec_labels)
+    }
+
+    return rec_groups
+
+
+def write_usempl_pk(usempl_pk, file_path):
+    """
+    This function saves the wide normalized peak DataFrame in a binary
+    columnar .npy file. The file holds a single record whose fields are the
+    full columns of usempl_pk (mths_frm_peak, Date{i}, PAYEMS{i}, and
+    usempl_dv_pk{i}), so every column is stored contiguously with its own
+    dtype and can be memory-mapped when read back.
+
+    Args:
+        usempl_pk (DataFrame): N x (1 + 3R) normalized peak DataFrame from
+            align_peaks()
+        file_path (str): path of the .npy file
+
+    Other functions and files called by this function: None
+
+    Files created by this function:
+        usempl_pk_[yyyy-mm-dd].npy
+
+    Returns: None
+    """
+    num_rows = usempl_pk.shape[0]
+    pk_dtype = np.dtype(
+        [(col, usempl_pk[col].dtype, (num_rows,)) for col in usempl_pk.columns]
+    )
+    pk_arr = np.empty(1, dtype=pk_dtype)
+    for col in usempl_pk.columns:
+        pk_arr[col][0] = usempl_pk[col].to_numpy()
+    np.save(file_path, pk_arr)
+
+
+def read_usempl_pk(file_path, mmap=True):
+    """
+    This function loads the wide normalized peak DataFrame from the binary
+    columnar .npy file written by write_usempl_pk().
+
+    Args:
+        file_path (str): path of the .npy file
+        mmap (bool): =True if memory-map the file instead of reading it into
+            memory before building the DataFrame
+
+    Other functions and files called by this function:
+        usempl_pk_[yyyy-mm-dd].npy
+
+    Files created by this function: None
+
+    Returns:
+        usempl_pk (DataFrame): N x (1 + 3R) normalized peak DataFrame
+    """
+    # The header lists three fields per recession, so it exceeds NumPy's
+    # default 10,000-byte header limit beyond a few hundred recessions
+    pk_arr = np.load(
+        file_path,
+        mmap_mode="r" if mmap else None,
+        max_header_size=max(10000, os.path.getsize(file_path)),
+    )
+    usempl_pk = pd.DataFrame(
+        {col: pk_arr[col][0] for col in pk_arr.dtype.names}
+    )
+
+    return usempl_pk
+
+
+def get_recession_registry(rec_file_path=None, peak_search_mths=1):
+    """
+    This function loads the recession registry, a table of NBER business
+    cycle peak and trough months with optional peak search windows, and
+    derives the recession labels and peak search windows used in the
+    normalized peak plot. A recession is added to the analysis by adding a
+    row to the table. Any edit of the table, including a moved peak search
+    window, takes effect on the next call of get_usempl_data(), which does
+    not reuse normalized peak series saved with another registry (see
+    get_registry_key()). Source: NBER, US Business Cycle Expansions and
+    Contractions <https://www.nber.org/research/data/us-business-cycle-
+    expansions-and-contractions>.
+
+    Args:
+        rec_file_path (str): path of the registry CSV file with columns peak,
+            trough, peak_search_beg, and peak_search_end in 'YYYY-mm-dd'
+            format. A blank trough means the recession is ongoing, and blank
+            search window dates default to peak_search_mths months before
+            and after the peak month. If None, the bundled
+            data/recessions.csv is used
+        peak_search_mths (int): number of months before and after the NBER
+            peak month in the default peak search window
+
+    Other functions and files called by this function:
+        recessions.csv
+
+    Files created by this function: None
+
+    Returns:
+        rec_df (DataFrame): R x 7 DataFrame of peak, trough,
+            peak_search_beg, peak_search_end, rec_label_yr, rec_label_yrmth,
+            and rec_beg_yrmth for each recession, sorted by peak
+    """
+    if rec_file_path is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        rec_file_path = os.path.join(cur_path, "data", "recessions.csv")
+    rec_df = pd.read_csv(
+        rec_file_path,
+        parse_dates=["peak", "trough", "peak_search_beg", "peak_search_end"],
+    )
+    rec_df = rec_df.sort_values(by="peak").reset_index(drop=True)
+    rec_df["peak_search_beg"] = rec_df["peak_search_beg"].fillna(
+        rec_df["peak"] - pd.DateOffset(months=peak_search_mths)
+    )
+    rec_df["peak_search_end"] = rec_df["peak_search_end"].fillna(
+        rec_df["peak"] + pd.DateOffset(months=peak_search_mths)
+    )
+
+    # Labels, e.g., '2007-2009', 'Dec 2007 - Jun 2009', and 'Dec 2007'
+    peak_yr = rec_df["peak"].dt.strftime("%Y")
+    trough_yr = rec_df["trough"].dt.strftime("%Y").fillna("present")
+    rec_df["rec_label_yr"] = peak_yr.where(
+        peak_yr == trough_yr, peak_yr + "-" + trough_yr
+    )
+    rec_df["rec_beg_yrmth"] = rec_df["peak"].dt.strftime("%b %Y")
+    rec_df["rec_label_yrmth"] = (
+        rec_df["rec_beg_yrmth"]
+        + " - "
+        + rec_df["trough"].dt.strftime("%b %Y").fillna("present")
+    )
+
+    return rec_df
+
+
+def get_registry_key(rec_df):
+    """
+    This function hashes the recession registry columns that determine the
+    normalized peak series (the peak and trough months and the peak search
+    windows) together with their labels. The key of the registry a saved
+    usempl_pk_[yyyy-mm-dd].npy file was computed with is saved next to it,
+    so that the file is not reused after the registry changes.
+
+    Args:
+        rec_df (DataFrame): recession registry from get_recession_registry()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        registry_key (str): 16-character hexadecimal sha256 key of the
+            registry
+    """
+    registry_hash = hashlib.sha256()
+    for col in [
+        "peak",
+        "trough",
+        "peak_search_beg",
+        "peak_search_end",
+        "rec_label_yr",
+    ]:
+        col_vals = rec_df[col]
+        if pd.api.types.is_datetime64_any_dtype(col_vals):
+            col_vals = col_vals.dt.strftime("%Y-%m-%d")
+        registry_hash.update(
+            "\x1f".join(col_vals.fillna("").astype(str)).encode("utf-8")
+        )
+        registry_hash.update(b"\x1e")
+    registry_key = registry_hash.hexdigest()[:16]
+
+    return registry_key
+
+
+def get_usempl_backcast(anchor_vals, ann_file_path=None, data_dir=None):
+    """
+    This function returns the monthly 1919-1938 PAYEMS backcast, the cubic
+    spline through the annual average employment of 1919-1938 (dated July 1)
+    and the first two monthly PAYEMS values (January and February 1939). The
+    backcast is computed once and saved as
+    usempl_backcast_[key].csv, where the key is a hash of the annual
+    data file, the two 1939 values, and BACKCAST_VERSION, and is then loaded
+    from that file or from the memo of this process.
+
+    Args:
+        anchor_vals (array_like): PAYEMS values of January and February 1939
+        ann_file_path (str): path of the annual 1919-1938 data file. If None,
+            the bundled data/usempl_anual_1919-1938.csv is used
+        data_dir (str): directory of the backcast files. If None, the data
+            directory of this package
+
+    Other functions and files called by this function:
+        usempl_anual_1919-1938.csv
+        usempl_backcast_[key].csv
+
+    Files created by this function:
+        usempl_backcast_[key].csv
+
+    Returns:
+        backcast_df (DataFrame): 240 x 2 DataFrame with columns Date
+            (1919-01-01 through 1938-12-01) and PAYEMS, in which the months
+            before July 1919 are NaN
+    """
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    if data_dir is None:
+        data_dir = os.path.join(cur_path, "data")
+    if ann_file_path is None:
+        ann_file_path = os.path.join(
+            cur_path, "data", "usempl_anual_1919-1938.csv"
+        )
+    anchor_vals = np.asarray(anchor_vals, dtype=np.float64)
+    if anchor_vals.shape != (2,) or np.isnan(anchor_vals).any():
+        err_msg = (
+            "anchor_vals must be the PAYEMS values of January and February "
+            + "1939, not "
+            + repr(anchor_vals)
+        )
+        raise ValueError(err_msg)
+
+    backcast_hash = hashlib.sha256(str(BACKCAST_VERSION).encode("utf-8"))
+    with open(ann_file_path, "rb") as ann_file:
+        backcast_hash.update(ann_file.read())
+    backcast_hash.update(anchor_vals.tobytes())
+    backcast_key = backcast_hash.hexdigest()[:16]
+    backcast_df = _backcast_memo.get(backcast_key)
+    if backcast_df is not None:
+        return backcast_df.copy()
+
+    backcast_path = os.path.join(
+        data_dir, "usempl_backcast_" + backcast_key + ".csv"
+    )
+    if os.access(backcast_path, os.F_OK):
+        backcast_df = pd.read_csv(
+            backcast_path, parse_dates=["Date"], float_precision="round_trip"
+        )
+    else:
+        # The spline runs over the months 1919-01 to 1939-02, with the annual
+        # values on their July months and the two 1939 values at the end.
+        # The months before July 1919 are not extrapolated and stay NaN
+        usempl_ann_df = pd.read_csv(
+            ann_file_path,
+            names=["Date", "PAYEMS"],
+            parse_dates=["Date"],
+            skiprows=1,
+            na_values=[".", "na", "NaN"],
+        )
+        month_dates = pd.date_range("1919-01-01", "1939-02-01", freq="MS")
+        month_vals = pd.Series(np.nan, index=month_dates)
+        month_vals[usempl_ann_df["Date"].to_numpy()] = usempl_ann_df[
+            "PAYEMS"
+        ].to_numpy(dtype=np.float64)
+        month_vals.iloc[-2:] = anchor_vals
+        month_vals = (
+            month_vals.reset_index(drop=True)
+            .interpolate(method="cubic")
+            .to_numpy()
+        )
+        backcast_df = pd.DataFrame(
+            {"Date": month_dates[:-2], "PAYEMS": month_vals[:-2]}
+        )
+        tmp_path = backcast_path + "." + str(os.getpid()) + ".tmp"
+        backcast_df.to_csv(tmp_path, index=False, float_format="%.17g")
+        os.replace(tmp_path, backcast_path)
+    _backcast_memo[backcast_key] = backcast_df
+
+    return backcast_df.copy()
+
+
+def get_usempl_series(
+    end_date_str="2022-12-15",
+    download_from_internet=True,
+    as_of=None,
+    store_dir=None,
+):
+    """
+    This function either downloads or reads in the U.S. total nonfarm payrolls
+    seasonally adjusted monthly data series (PAYEMS) through end_date_str.
+    A downloaded series is appended to the PAYEMS vintage store, instead of
+    being saved as another full CSV file, as the vintage of the date on
+    which FRED last changed the series (or of today if FRED does not report
+    it). A download without new or revised months appends nothing. With
+    as_of, the series is rebuilt from the vintage store as it was known on
+    that date and nothing is downloaded. Offline, the saved
+    usempl_[yyyy-mm-dd].csv file is read if it exists, and otherwise the
+    latest vintage in the store is used. The monthly series from the
+    download or the store is extended back to 1919 with the monthly backcast
+    of the annual 1919-1938 data from get_usempl_backcast().
+
+    Args:
+        end_date_str (str): end date of PAYEMS time series in 'YYYY-mm-dd'
+            format
+        download_from_internet (bool): =True if download data from
+            fred.stlouisfed.org, otherwise read data in from local directory
+        as_of (str): as-of (vintage) date in 'YYYY-mm-dd' format of the
+            series to rebuild from the vintage store. If None, the current
+            series
+        store_dir (str): directory of the vintage store. If None, the
+            data/vintage_cache folder in this package directory, which
+            starts as a copy of the bundled data/vintages store
+
+    Other functions and files called by this function:
+        instrument.stage()
+        fred_cache.get_fred_series()
+        fred_cache.get_release_date()
+        vintage_store.get_store_path()
+        vintage_store.get_vintage_dates()
+        vintage_store.append_vintage()
+        vintage_store.get_vintage()
+        get_usempl_backcast()
+        usempl_anual_1919-1938.csv
+        usempl_[yyyy-mm-dd].csv
+        vintage_cache/PAYEMS.bin
+
+    Files created by this function:
+        fred_cache/PAYEMS.csv
+        vintage_cache/PAYEMS.bin
+        usempl_backcast_[key].csv
+
+    Returns:
+        usempl_df (DataFrame): series with columns Date and PAYEMS, sorted
+            from old to new
+        end_date_str2 (str): actual end date of PAYEMS time series in
+            'YYYY-mm-dd' format
+    """
+    end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d")
+
+    # Name the current directory and make sure it has a data folder
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    data_fldr = "data"
+    data_dir = os.path.join(cur_path, data_fldr)
+    if not os.access(data_dir, os.F_OK):
+        os.makedirs(data_dir)
+
+    filename_basic = "usempl_" + end_date_str + ".csv"
+    data_file_path = os.path.join(data_dir, filename_basic)
+    store_path = vintage_store.get_store_path("PAYEMS", store_dir)
+    start_date = dt.datetime(1939, 1, 1)
+
+    if download_from_internet and as_of is None:
+        # Download the employment data directly from fred.stlouisfed.org
+        # (requires internet connection). Only the months that are newer than
+        # the local FRED cache are downloaded
+        with instrument.stage("download") as stage_rec:
+            fred_df = fred_cache.get_fred_series(
+                "PAYEMS", start_date=start_date, end_date=end_date
+            )
+            stage_rec["rows"] = len(fred_df)
+        # Only the new and revised months of this vintage are stored, dated
+        # by FRED's last change of the series. A release date before the
+        # latest stored vintage (e.g., a vintage stored by download date)
+        # updates that vintage instead
+        vintage_date = fred_cache.get_release_date("PAYEMS")
+        if vintage_date is None:
+            vintage_date = dt.date.today()
+        stored_dates = vintage_store.get_vintage_dates(store_path)
+        if stored_dates and str(vintage_date) < stored_dates[-1]:
+            vintage_date = stored_dates[-1]
+        with instrument.stage("vintage_append") as stage_rec:
+            stage_rec["rows"] = vintage_store.append_vintage(
+                fred_df, vintage_date, store_path
+            )
+            stage_rec["bytes"] = os.path.getsize(store_path)
+    elif as_of is not None or not os.access(data_file_path, os.F_OK):
+        with instrument.stage("vintage_read") as stage_rec:
+            fred_df = vintage_store.get_vintage(store_path, as_of, end_date)
+            fred_df = fred_df[fred_df["Date"] >= start_date]
+            fred_df = fred_df.reset_index(drop=True)
+            stage_rec["rows"] = len(fred_df)
+        if fred_df.empty:
+            raise ValueError(
+                "The PAYEMS vintage store "
+                + store_path
+                + " has no data through "
+                + end_date_str
+                + "."
+            )
+    else:
+        # Import the data as pandas DataFrame
+        end_date_str2 = end_date_str
+        with instrument.stage("series_csv_read") as stage_rec:
+            usempl_df = pd.read_csv(
+                data_file_path,
+                names=["Date", "PAYEMS"],
+                parse_dates=["Date"],
+                skiprows=1,
+                na_values=[".", "na", "NaN"],
+            )
+            usempl_df = usempl_df.dropna()
+            stage_rec["rows"] = len(usempl_df)
+
+        return usempl_df, end_date_str2
+
+    end_date_str2 = fred_df["Date"].iloc[-1].strftime("%Y-%m-%d")
+    # Extend the monthly series back to 1919 with the monthly backcast of
+    # the U.S. annual average nonfarm payroll employment (not seasonally
+    # adjusted) 1919-1938. These data are taken from Table 1 on page 1 of
+    # "Employment, Hours, and Earnings, United States, 1909-90, Volume I,"
+    # Bulletin of the United States Bureau of Labor Statistics, No. 2370,
+    # March 1991.
+    # <https://fraser.stlouisfed.org/title/employment-earnings-united-
+    # states-189/employment-hours-earnings-united-states-1909-90-5435/
+    # content/pdf/emp_bmark_1909_1990_v1>
+    # The backcast ends before the first monthly observation, so no sorting
+    # is needed
+    ann_data_file_path = os.path.join(data_dir, "usempl_anual_1919-1938.csv")
+    with instrument.stage("backcast_splice") as stage_rec:
+        anchor_vals = fred_df.set_index("Date")["PAYEMS"].reindex(
+            pd.to_datetime(["1939-01-01", "1939-02-01"])
+        )
+        backcast_df = get_usempl_backcast(
+            anchor_vals.to_numpy(), ann_data_file_path, data_dir
+        )
+        usempl_df = pd.concat([backcast_df, fred_df], ignore_index=True)
+        stage_rec["rows"] = len(backcast_df)
+
+    return usempl_df, end_date_str2
+
+
+def get_usempl_data(
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    end_date_str="2022-12-15",
+    download_from_internet=True,
+    output_format="wide",
+    rec_file_path=None,
+    verbose=False,
+    as_of=None,
+    save_pk_files=False,
+):
+    """
+    This function either downloads or reads in the U.S. total nonfarm payrolls
+    seasonally adjusted monthly data series (PAYEMS) and adds variables
+    mths_frm_peak and empl_dv_pk for each of the last 15 recessions. The
+    time, rows, and bytes of each stage are recorded with
+    instrument.stage(), and the alignment or binary_read stage record also
+    holds the end date and the peak dates. With as_of, the series is the vintage known on that
+    date from the PAYEMS vintage store (see get_usempl_series()).
+
+    Args:
+        frwd_mths_max (int): maximum number of months forward from the peak
+            month to plot
+        bkwd_mths_max (int): maximum number of months backward from the peak
+            month to plot
+        end_date_str (str): end date of PAYEMS time series in 'YYYY-mm-dd'
+            format
+        download_from_internet (bool): =True if download data from
+            fred.stlouisfed.org, otherwise read data in from local directory.
+            Offline and without as_of, the saved usempl_pk_[yyyy-mm-dd].npy
+            is loaded directly if it exists, covers the requested months
+            from peak, and was computed with the same recession registry
+            (its usempl_pk_[yyyy-mm-dd].key file holds get_registry_key())
+        output_format (str): ='wide' to return usempl_pk as the N x 46 wide
+            DataFrame, or ='long' to return it as the long (tidy) DataFrame
+            with columns recession_id (categorical with the rec_label_yr_lst
+            labels), mths_frm_peak (int16), Date, PAYEMS (float32), and
+            usempl_dv_pk (float32), without the months that have no data
+        rec_file_path (str): path of the recession registry CSV file. If
+            None, the bundled data/recessions.csv is used
+        verbose (bool): =True if also print the end date and the peak value
+            and date of each recession
+        as_of (str): as-of (vintage) date in 'YYYY-mm-dd' format of the
+            PAYEMS series. If None, the current series
+        save_pk_files (bool): =True if save the normalized peak series as
+            usempl_pk_[yyyy-mm-dd].csv and .npy files when they are
+            computed. Ignored with as_of
+
+    Other functions and files called by this function:
+        instrument.stage()
+        get_recession_registry()
+        get_registry_key()
+        get_usempl_series()
+        get_peak_indices()
+        align_peaks()
+        usempl_pk_to_long()
+        read_usempl_pk()
+        write_usempl_pk()
+        recessions.csv
+        usempl_pk_[yyyy-mm-dd].npy
+        usempl_pk_[yyyy-mm-dd].key
+
+    Files created by this function:
+        fred_cache/PAYEMS.csv
+        vintage_cache/PAYEMS.bin
+        usempl_pk_[yyyy-mm-dd].csv (if save_pk_files)
+        usempl_pk_[yyyy-mm-dd].npy (if save_pk_files)
+        usempl_pk_[yyyy-mm-dd].key (if save_pk_files)
+
+    Returns:
+        usempl_pk (DataFrame): N x 46 DataFrame of mths_frm_peak, Date{i},
+            PAYEMS{i}, and usempl_dv_pk{i} for each of the 15 recessions for
+            the months specified by bkwd_mths_max and frwd_mths_max, or the
+            long DataFrame if output_format='long'
+        end_date_str2 (str): actual end date of the PAYEMS time series in
+            'YYYY-mm-dd' format. Can differ from the end_date_str input to
+            this function, e.g., if the data for that month have not been
+            released yet
+        peak_vals (list): list of peak PAYEMS value at the beginning of each
+            of the last 15 recessions
+        peak_dates (list): list of string date (YYYY-mm-dd) of peak PAYEMS
+            value at the beginning of each of the last 15 recessions
+        rec_label_yr_lst (list): list of string start year and end year of each
+            of the last 15 recessions
+        rec_label_yrmth_lst (list): list of string start year and month and end
+            year and month of each of the last 15 recessions
+        rec_beg_yrmth_lst (list): list of string start year and month of each
+            of the last 15 recessions
+        maxdate_rng_lst (list): list of tuples with start string date and end
+            string date within which range we define the peak PAYEMS value at
+            the beginning of each of the last 15 recessions
+    """
+    if output_format not in ["wide", "long"]:
+        raise ValueError(
+            "output_format must be 'wide' or 'long', not '"
+            + str(output_format)
+            + "'."
+        )
+
+    # Name the current directory and make sure it has a data folder
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    data_fldr = "data"
+    data_dir = os.path.join(cur_path, data_fldr)
+    if not os.access(data_dir, os.F_OK):
+        os.makedirs(data_dir)
+
+    # Set recession-specific parameters from the recession registry
+    rec_df = get_recession_registry(rec_file_path)
+    rec_label_yr_lst = rec_df["rec_label_yr"].tolist()
+    rec_label_yrmth_lst = rec_df["rec_label_yrmth"].tolist()
+    rec_beg_yrmth_lst = rec_df["rec_beg_yrmth"].tolist()
+    maxdate_rng_lst = list(
+        zip(
+            rec_df["peak_search_beg"].dt.strftime("%Y-%m-%d"),
+            rec_df["peak_search_end"].dt.strftime("%Y-%m-%d"),
+        )
+    )
+
+    registry_key = get_registry_key(rec_df)
+
+    usempl_pk = None
+    if not download_from_internet and as_of is None:
+        bin_file_path = os.path.join(
+            data_dir, "usempl_pk_" + end_date_str + ".npy"
+        )
+        key_file_path = os.path.splitext(bin_file_path)[0] + ".key"
+        saved_key = None
+        if os.access(key_file_path, os.F_OK):
+            with open(key_file_path, "r", encoding="utf-8") as key_file:
+                saved_key = key_file.read().strip()
+        if saved_key == registry_key and os.access(bin_file_path, os.F_OK):
+            # Load the saved normalized peak series directly if they were
+            # computed with this registry and cover the requested months
+            with instrument.stage("binary_read") as stage_rec:
+                usempl_pk_saved = read_usempl_pk(bin_file_path)
+                stage_rec["rows"] = len(usempl_pk_saved)
+                mths_saved = usempl_pk_saved["mths_frm_peak"]
+                if (
+                    mths_saved.iloc[0] <= -bkwd_mths_max
+                    and mths_saved.iloc[-1] >= frwd_mths_max
+                ):
+                    usempl_pk = usempl_pk_saved[
+                        (mths_saved >= -bkwd_mths_max)
+                        & (mths_saved <= frwd_mths_max)
+                    ].reset_index(drop=True)
+                    # Peak values and dates are the values in the month of
+                    # the peak
+                    peak_row = usempl_pk[usempl_pk["mths_frm_peak"] == 0].iloc[
+                        0
+                    ]
+                    peak_vals = [
+                        peak_row[f"PAYEMS{i}"]
+                        for i in range(len(maxdate_rng_lst))
+                    ]
+                    peak_dates = [
+                        peak_row[f"Date{i}"].strftime("%Y-%m-%d")
+                        for i in range(len(maxdate_rng_lst))
+                    ]
+                    stage_rec["end_date"] = end_date_str
+                    stage_rec["peak_dates"] = peak_dates
+    if usempl_pk is None:
+        usempl_df, end_date_str2 = get_usempl_series(
+            end_date_str, download_from_internet, as_of
+        )
+    else:
+        end_date_str2 = end_date_str
+    filename_full = "usempl_pk_" + end_date_str2 + ".csv"
+    filename_bin = "usempl_pk_" + end_date_str2 + ".npy"
+
+    if verbose:
+        print("End date of U.S. employment series is", end_date_str2)
+
+    if usempl_pk is None:
+        # Create normalized peak series for each recession
+        with instrument.stage("alignment") as stage_rec:
+            peak_idx = get_peak_indices(usempl_df, maxdate_rng_lst)
+            usempl_pk, peak_vals, peak_dates = align_peaks(
+                usempl_df, peak_idx, frwd_mths_max, bkwd_mths_max
+            )
+            stage_rec["rows"] = len(usempl_pk) * len(peak_idx)
+            stage_rec["num_rec"] = len(peak_idx)
+            stage_rec["end_date"] = end_date_str2
+            stage_rec["peak_dates"] = peak_dates
+        if save_pk_files and as_of is None:
+            full_file_path = os.path.join(data_dir, filename_full)
+            with instrument.stage("pk_csv_write") as stage_rec:
+                usempl_pk.to_csv(full_file_path, index=False)
+                stage_rec["rows"] = len(usempl_pk)
+                stage_rec["bytes"] = os.path.getsize(full_file_path)
+            bin_file_path = os.path.join(data_dir, filename_bin)
+            with instrument.stage("pk_npy_write") as stage_rec:
+                write_usempl_pk(usempl_pk, bin_file_path)
+                key_file_path = os.path.splitext(bin_file_path)[0] + ".key"
+                with open(key_file_path, "w", encoding="utf-8") as key_file:
+                    key_file.write(registry_key + "\n")
+                stage_rec["rows"] = len(usempl_pk)
+                stage_rec["bytes"] = os.path.getsize(bin_file_path)
+    if verbose:
+        for i, peak_val in enumerate(peak_vals):
+            print(
+                "peak_val " + str(i) + " is",
+                peak_val,
+                "on date",
+                peak_dates[i],
+                "(Beg. rec. month:",
+                rec_beg_yrmth_lst[i],
+                ")",
+            )
+
+    if output_format == "long":
+        with instrument.stage("long_convert") as stage_rec:
+            usempl_pk = usempl_pk_to_long(usempl_pk, rec_label_yr_lst)
+            stage_rec["rows"] = len(usempl_pk)
+
+    return (
+        usempl_pk,
+        end_date_str2,
+        peak_vals,
+        peak_dates,
+        rec_label_yr_lst,
+        rec_label_yrmth_lst,
+        rec_beg_yrmth_lst,
+        maxdate_rng_lst,
+    )
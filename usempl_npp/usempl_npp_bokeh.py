@@ -1,749 +1,956 @@
-"""
-This module downloads the U.S. total nonfarm payrolls seasonally adjusted
-(PAYEMS) monthly time series from the St. Louis Federal Reserve's FRED system
-(https://fred.stlouisfed.org/series/PAYEMS) or loads it from this directory and
-organizes it into 15 series, one for each of the last 15 recessions--from the
-current 2020 Coronavirus recession to the Great Depression of 1929. It then
-creates a normalized peak plot of the PAYEMS data for each of the last 15
-recessions using the Bokeh plotting library.
-
-This module defines the following function(s):
-    get_usempl_data()
-    usempl_npp()
-"""
-# Import packages
-import numpy as np
-import pandas as pd
-import pandas_datareader as pddr
-import datetime as dt
-import os
-from bokeh.io import output_file
-from bokeh.plotting import figure, show
-from bokeh.models import ColumnDataSource, Title, Legend, HoverTool
-
-# from bokeh.models import Label
-from bokeh.palettes import Category20
-
-"""
-Define functions
-"""
-
-
-def get_usempl_data(
-    frwd_mths_max=135,
-    bkwd_mths_max=48,
-    end_date_str="2022-12-15",
-    download_from_internet=True,
-):
-    """
-    This function either downloads or reads in the U.S. total nonfarm payrolls
-    seasonally adjusted monthly data series (PAYEMS) and adds variables
-    mths_frm_peak and empl_dv_pk for each of the last 15 recessions.
-
-    Args:
-        frwd_mths_max (int): maximum number of months forward from the peak
-            month to plot
-        bckwd_mths_max (int): maximum number of months backward from the peak
-            month to plot
-        end_date_str (str): end date of PAYEMS time series in 'YYYY-mm-dd'
-            format
-        download_from_internet (bool): =True if download data from
-            fred.stlouisfed.org, otherwise read data in from local directory
-
-    Other functions and files called by this function:
-        usempl_[yyyy-mm-dd].csv
-
-    Files created by this function:
-        usempl_[yyyy-mm-dd].csv
-        usempl_pk_[yyyy-mm-dd].csv
-
-    Returns:
-        usempl_pk (DataFrame): N x 46 DataFrame of mths_frm_peak, Date{i},
-            Close{i}, and close_dv_pk{i} for each of the 15 recessions for the
-            periods specified by bkwd_days_max and frwd_days_max
-        end_date_str2 (str): actual end date of DJIA time series in
-            'YYYY-mm-dd' format. Can differ from the end_date input to this
-            function if the final data for that day have not come out yet
-            (usually 2 hours after markets close, 6:30pm EST), or if the
-            end_date is one on which markets are closed (e.g. weekends and
-            holidays). In this latter case, the pandas_datareader library
-            chooses the most recent date for which we have DJIA data.
-        peak_vals (list): list of peak DJIA value at the beginning of each of
-            the last 15 recessions
-        peak_dates (list): list of string date (YYYY-mm-dd) of peak DJIA value
-            at the beginning of each of the last 15 recessions
-        rec_label_yr_lst (list): list of string start year and end year of each
-            of the last 15 recessions
-        rec_label_yrmth_lst (list): list of string start year and month and end
-            year and month of each of the last 15 recessions
-        rec_beg_yrmth_lst (list): list of string start year and month of each
-            of the last 15 recessions
-        maxdate_rng_lst (list): list of tuples with start string date and end
-            string date within which range we define the peak DJIA value at the
-            beginning of each of the last 15 recessions
-    """
-    end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d")
-
-    # Name the current directory and make sure it has a data folder
-    cur_path = os.path.split(os.path.abspath(__file__))[0]
-    data_fldr = "data"
-    data_dir = os.path.join(cur_path, data_fldr)
-    if not os.access(data_dir, os.F_OK):
-        os.makedirs(data_dir)
-
-    filename_basic = "usempl_" + end_date_str + ".csv"
-    filename_full = "usempl_pk_" + end_date_str + ".csv"
-
-    if download_from_internet:
-        # Download the employment data directly from fred.stlouisfed.org
-        # (requires internet connection)
-        start_date = dt.datetime(1939, 1, 1)
-        usempl_df = pddr.fred.FredReader(
-            symbols="PAYEMS", start=start_date, end=end_date
-        ).read()
-        usempl_df = pd.DataFrame(usempl_df).sort_index()  # Sort old to new
-        usempl_df = usempl_df.reset_index(level=["DATE"])
-        usempl_df = usempl_df.rename(columns={"DATE": "Date"})
-        end_date_str2 = usempl_df["Date"].iloc[-1].strftime("%Y-%m-%d")
-        end_date = dt.datetime.strptime(end_date_str2, "%Y-%m-%d")
-        filename_basic = "usempl_" + end_date_str2 + ".csv"
-        filename_full = "usempl_pk_" + end_date_str2 + ".csv"
-        usempl_df.to_csv(os.path.join(data_dir, filename_basic), index=False)
-        # Merge in U.S. annual average nonfarm payroll employment (not
-        # seasonally adjusted) 1919-1938. Date values for annual data are set
-        # to July 1 of that year. These data are taken from Table 1 on page 1
-        # of "Employment, Hours, and Earnings, United States, 1909-90, Volume
-        # I," Bulletin of the United States Bureau of Labor Statistics, No.
-        # 2370, March 1991.
-        # <https://fraser.stlouisfed.org/title/employment-earnings-united-
-        # states-189/employment-hours-earnings-united-states-1909-90-5435/
-        # content/pdf/emp_bmark_1909_1990_v1>
-        filename_annual = "usempl_anual_1919-1938.csv"
-        ann_data_file_path = os.path.join(data_dir, filename_annual)
-        usempl_ann_df = pd.read_csv(
-            ann_data_file_path,
-            names=["Date", "PAYEMS"],
-            parse_dates=["Date"],
-            skiprows=1,
-            na_values=[".", "na", "NaN"],
-        )
-        # usempl_df = usempl_df.append(usempl_ann_df, ignore_index=True)
-        usempl_df = pd.concat([usempl_ann_df, usempl_df], ignore_index=True)
-        usempl_df = usempl_df.sort_values(by="Date")
-        usempl_df = usempl_df.reset_index(drop=True)
-        usempl_df.to_csv(os.path.join(data_dir, filename_basic), index=False)
-        # Add other months to annual data 1919-01-01 to 1938-12-01 and fill in
-        # artificial employment data by cubic spline interpolation
-        months_df = pd.DataFrame(
-            pd.date_range("1919-01-01", "1938-12-01", freq="MS"),
-            columns=["Date"],
-        )
-        usempl_df = pd.merge(
-            usempl_df, months_df, left_on="Date", right_on="Date", how="outer"
-        )
-        usempl_df = usempl_df.sort_values(by="Date")
-        usempl_df = usempl_df.reset_index(drop=True)
-        usempl_df["PAYEMS"].iloc[:242] = (
-            usempl_df["PAYEMS"].iloc[:242].interpolate(method="cubic")
-        )
-    else:
-        # Import the data as pandas DataFrame
-        end_date_str2 = end_date_str
-        data_file_path = os.path.join(data_dir, filename_basic)
-        usempl_df = pd.read_csv(
-            data_file_path,
-            names=["Date", "PAYEMS"],
-            parse_dates=["Date"],
-            skiprows=1,
-            na_values=[".", "na", "NaN"],
-        )
-        usempl_df = usempl_df.dropna()
-
-    print(
-        "End date of U.S. employment series is", end_date.strftime("%Y-%m-%d")
-    )
-
-    # Set recession-specific parameters
-    rec_label_yr_lst = [
-        "1929-1933",  # (Aug 1929 - Mar 1933) Great Depression
-        "1937-1938",  # (May 1937 - Jun 1938)
-        "1945",  # (Feb 1945 - Oct 1945)
-        "1948-1949",  # (Nov 1948 - Oct 1949)
-        "1953-1954",  # (Jul 1953 - May 1954)
-        "1957-1958",  # (Aug 1957 - Apr 1958)
-        "1960-1961",  # (Apr 1960 - Feb 1961)
-        "1969-1970",  # (Dec 1969 - Nov 1970)
-        "1973-1975",  # (Nov 1973 - Mar 1975)
-        "1980",  # (Jan 1980 - Jul 1980)
-        "1981-1982",  # (Jul 1981 - Nov 1982)
-        "1990-1991",  # (Jul 1990 - Mar 1991)
-        "2001",  # (Mar 2001 - Nov 2001)
-        "2007-2009",  # (Dec 2007 - Jun 2009) Great Recession
-        "2020-2020",
-    ]  # (Feb 2020 - Apr 2020) Coronavirus recession
-
-    rec_label_yrmth_lst = [
-        "Aug 1929 - Mar 1933",  # Great Depression
-        "May 1937 - Jun 1938",
-        "Feb 1945 - Oct 1945",
-        "Nov 1948 - Oct 1949",
-        "Jul 1953 - May 1954",
-        "Aug 1957 - Apr 1958",
-        "Apr 1960 - Feb 1961",
-        "Dec 1969 - Nov 1970",
-        "Nov 1973 - Mar 1975",
-        "Jan 1980 - Jul 1980",
-        "Jul 1981 - Nov 1982",
-        "Jul 1990 - Mar 1991",
-        "Mar 2001 - Nov 2001",
-        "Dec 2007 - Jun 2009",  # Great Recession
-        "Feb 2020 - Apr 2020",
-    ]  # Coronavirus recess'n
-
-    rec_beg_yrmth_lst = [
-        "Aug 1929",
-        "May 1937",
-        "Feb 1945",
-        "Nov 1948",
-        "Jul 1953",
-        "Aug 1957",
-        "Apr 1960",
-        "Dec 1969",
-        "Nov 1973",
-        "Jan 1980",
-        "Jul 1981",
-        "Jul 1990",
-        "Mar 2001",
-        "Dec 2007",
-        "Feb 2020",
-    ]
-
-    maxdate_rng_lst = [
-        ("1929-7-1", "1929-10-1"),
-        ("1937-7-1", "1937-7-1"),
-        ("1945-1-1", "1945-3-1"),
-        ("1948-9-1", "1949-1-1"),
-        ("1953-6-1", "1953-8-1"),
-        ("1957-7-1", "1957-9-1"),
-        ("1960-3-1", "1960-5-1"),
-        ("1969-11-1", "1970-3-1"),
-        ("1973-10-1", "1974-7-1"),
-        ("1979-12-1", "1980-3-1"),
-        ("1981-6-1", "1981-8-1"),
-        ("1990-6-1", "1991-8-1"),
-        ("2001-2-1", "2001-4-1"),
-        ("2007-11-1", "2008-1-1"),
-        ("2020-1-1", "2020-3-1"),
-    ]
-
-    # Create normalized peak series for each recession
-    usempl_pk = pd.DataFrame(
-        np.arange(-bkwd_mths_max, frwd_mths_max + 1, dtype=int),
-        columns=["mths_frm_peak"],
-    )
-    usempl_pk_long = usempl_df.copy()
-    peak_vals = []
-    peak_dates = []
-    for i, maxdate_rng in enumerate(maxdate_rng_lst):
-        # Identify peak closing value within two months (with only 2
-        # exceptions) of the beginning month of the recession
-        peak_val = usempl_df["PAYEMS"][
-            (usempl_df["Date"] >= maxdate_rng[0])
-            & (usempl_df["Date"] <= maxdate_rng[1])
-        ].max()
-        peak_vals.append(peak_val)
-        usempl_dv_pk_name = "usempl_dv_pk" + str(i)
-        usempl_pk_long[usempl_dv_pk_name] = usempl_pk_long["PAYEMS"] / peak_val
-        # Identify date of peak PAYEMS value within two months (with
-        # only 2 exceptions) of the beginning month of the recession
-        peak_date = usempl_df["Date"][
-            (usempl_df["Date"] >= maxdate_rng[0])
-            & (usempl_df["Date"] <= maxdate_rng[1])
-            & (usempl_df["PAYEMS"] == peak_val)
-        ].max()
-        peak_dates.append(peak_date.strftime("%Y-%m-%d"))
-        mths_frm_pk_name = "mths_frm_pk" + str(i)
-        usempl_pk_long[mths_frm_pk_name] = (
-            usempl_pk_long["Date"].dt.year - peak_date.year
-        ) * 12 + (usempl_pk_long["Date"].dt.month - peak_date.month)
-        # usempl_pk_long[mths_frm_pk_name] = (usempl_pk_long['Date'] -
-        #                                     peak_date).dt.years
-        print(
-            "peak_val " + str(i) + " is",
-            peak_val,
-            "on date",
-            peak_date.strftime("%Y-%m-%d"),
-            "(Beg. rec. month:",
-            rec_beg_yrmth_lst[i],
-            ")",
-        )
-        # I need to merge the data into this new usempl_pk DataFrame so that
-        # mths_frm_peak variable is shared across the dataframe
-        usempl_pk = pd.merge(
-            usempl_pk,
-            usempl_pk_long[
-                [mths_frm_pk_name, "Date", "PAYEMS", usempl_dv_pk_name]
-            ],
-            left_on="mths_frm_peak",
-            right_on=mths_frm_pk_name,
-            how="left",
-        )
-        usempl_pk.drop(columns=[mths_frm_pk_name], inplace=True)
-        usempl_pk.rename(
-            columns={"Date": f"Date{i}", "PAYEMS": f"PAYEMS{i}"}, inplace=True
-        )
-
-    usempl_pk.to_csv(os.path.join(data_dir, filename_full), index=False)
-
-    return (
-        usempl_pk,
-        end_date_str2,
-        peak_vals,
-        peak_dates,
-        rec_label_yr_lst,
-        rec_label_yrmth_lst,
-        rec_beg_yrmth_lst,
-        maxdate_rng_lst,
-    )
-
-
-def usempl_npp(
-    frwd_mths_main=53,
-    bkwd_mths_main=5,
-    frwd_mths_max=135,
-    bkwd_mths_max=48,
-    usempl_end_date="today",
-    download_from_internet=True,
-    html_show=True,
-):
-    """
-    This function creates the HTML and JavaScript code for the dynamic
-    visualization of the normalized peak plot of the last 15 recessions in the
-    United States, from the Great Depression (Aug. 1929 - Mar. 1933) to the
-    most recent COVID-19 recession (Feb. 2020 - present).
-
-    Args:
-        frwd_mths_main (int): number of months forward from the peak to plot in
-            the default main window of the visualization
-        bkwd_mths_maim (int): number of months backward from the peak to plot
-            in the default main window of the visualization
-        frwd_mths_max (int): maximum number of months forward from the peak to
-            allow for the plot, to be seen by zooming out
-        bkwd_mths_max (int): maximum number of months backward from the peak to
-            allow for the plot, to be seen by zooming out
-        usempl_end_date (str): either 'today' or the end date of PAYEMS time
-            series in 'YYYY-mm-dd' format
-        download_from_internet (bool): =True if download data from St. Louis
-            Federal Reserve's FRED system
-            (https://fred.stlouisfed.org/series/PAYEMS), otherwise read data in
-            from local directory
-        html_show (bool): =True if open dynamic visualization in browser once
-            created
-
-    Other functions and files called by this function:
-        get_usempl_data()
-
-    Files created by this function:
-       images/usempl_[yyyy-mm-dd].html
-
-    Returns: fig, end_date_str
-    """
-    # Create directory if images directory does not already exist
-    cur_path = os.path.split(os.path.abspath(__file__))[0]
-    image_fldr = "images"
-    image_dir = os.path.join(cur_path, image_fldr)
-    if not os.access(image_dir, os.F_OK):
-        os.makedirs(image_dir)
-
-    if usempl_end_date == "today":
-        end_date = dt.date.today()  # Go through today
-    else:
-        end_date = dt.datetime.strptime(usempl_end_date, "%Y-%m-%d")
-
-    end_date_str = end_date.strftime("%Y-%m-%d")
-
-    # Set main window and total data limits for monthly plot
-    frwd_mths_main = int(frwd_mths_main)
-    bkwd_mths_main = int(bkwd_mths_main)
-    frwd_mths_max = int(frwd_mths_max)
-    bkwd_mths_max = int(bkwd_mths_max)
-
-    (
-        usempl_pk,
-        end_date_str2,
-        peak_vals,
-        peak_dates,
-        rec_label_yr_lst,
-        rec_label_yrmth_lst,
-        rec_beg_yrmth_lst,
-        maxdate_rng_lst,
-    ) = get_usempl_data(
-        frwd_mths_max, bkwd_mths_max, end_date_str, download_from_internet
-    )
-    if end_date_str2 != end_date_str:
-        print(
-            "PAYEMS data downloaded on "
-            + end_date_str
-            + " has most "
-            + "recent PAYEMS data month of "
-            + end_date_str2
-            + "."
-        )
-    end_date2 = dt.datetime.strptime(end_date_str2, "%Y-%m-%d")
-
-    rec_cds_list = []
-    min_main_val_lst = []
-    max_main_val_lst = []
-    for i in range(15):
-        usempl_pk_rec = usempl_pk[
-            ["mths_frm_peak", f"Date{i}", f"PAYEMS{i}", f"usempl_dv_pk{i}"]
-        ].dropna()
-        usempl_pk_rec.rename(
-            columns={
-                f"Date{i}": "Date",
-                f"PAYEMS{i}": "PAYEMS",
-                f"usempl_dv_pk{i}": "usempl_dv_pk",
-            },
-            inplace=True,
-        )
-        rec_cds_list.append(ColumnDataSource(usempl_pk_rec))
-        # Find minimum and maximum usempl_dv_pk values as inputs to main plot
-        # frame size
-        min_main_val_lst.append(
-            usempl_pk_rec["usempl_dv_pk"][
-                (usempl_pk_rec["mths_frm_peak"] >= -bkwd_mths_main)
-                & (usempl_pk_rec["mths_frm_peak"] <= frwd_mths_main)
-            ].min()
-        )
-        max_main_val_lst.append(
-            usempl_pk_rec["usempl_dv_pk"][
-                (usempl_pk_rec["mths_frm_peak"] >= -bkwd_mths_main)
-                & (usempl_pk_rec["mths_frm_peak"] <= frwd_mths_main)
-            ].max()
-        )
-
-    # Create Bokeh plot of PAYEMS normalized peak plot figure
-    fig_title = "Progression of PAYEMS in last 15 recessions"
-    filename = "usempl_npp_" + end_date_str2 + ".html"
-    output_file(os.path.join(image_dir, filename), title=fig_title)
-
-    # Format the tooltip
-    tooltips = [
-        ("Date", "@Date{%F}"),
-        ("Months from peak", "$x{0.}"),
-        ("Employment", "@PAYEMS{0,0.},000"),
-        ("Fraction of peak", "@usempl_dv_pk{0.0 %}"),
-    ]
-
-    # Solve for minimum and maximum PAYEMS/Peak values in monthly main display
-    # window in order to set the appropriate xrange and yrange
-    min_main_val = min(min_main_val_lst)
-    max_main_val = max(max_main_val_lst)
-
-    datarange_main_vals = max_main_val - min_main_val
-    datarange_main_mths = int(frwd_mths_main + bkwd_mths_main)
-    fig_buffer_pct = 0.10
-    fig = figure(
-        plot_height=500,
-        plot_width=800,
-        x_axis_label="Months from Peak",
-        y_axis_label="PAYEMS as fraction of Peak",
-        y_range=(
-            min_main_val - fig_buffer_pct * datarange_main_vals,
-            max_main_val + fig_buffer_pct * datarange_main_vals,
-        ),
-        x_range=(
-            (-bkwd_mths_main - fig_buffer_pct * datarange_main_mths),
-            (frwd_mths_main + fig_buffer_pct * datarange_main_mths),
-        ),
-        tools=[
-            "save",
-            "zoom_in",
-            "zoom_out",
-            "box_zoom",
-            "pan",
-            "undo",
-            "redo",
-            "reset",
-            "hover",
-            "help",
-        ],
-        toolbar_location="left",
-    )
-    fig.title.text_font_size = "18pt"
-    fig.toolbar.logo = None
-    l0 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[0],
-        color="blue",
-        line_width=5,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l1 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[1],
-        color=Category20[13][0],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l2 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[2],
-        color=Category20[13][1],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l3 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[3],
-        color=Category20[13][2],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l4 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[4],
-        color=Category20[13][3],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l5 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[5],
-        color=Category20[13][4],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l6 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[6],
-        color=Category20[13][5],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l7 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[7],
-        color=Category20[13][6],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l8 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[8],
-        color=Category20[13][7],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l9 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[9],
-        color=Category20[13][8],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l10 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[10],
-        color=Category20[13][9],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l11 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[11],
-        color=Category20[13][10],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l12 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[12],
-        color=Category20[13][11],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l13 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[13],
-        color=Category20[13][12],
-        line_width=2,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-    l14 = fig.line(
-        x="mths_frm_peak",
-        y="usempl_dv_pk",
-        source=rec_cds_list[14],
-        color="black",
-        line_width=5,
-        alpha=0.7,
-        muted_alpha=0.15,
-    )
-
-    # Dashed vertical line at the peak PAYEMS value period
-    fig.line(
-        x=[0.0, 0.0],
-        y=[-0.5, 2.0],
-        color="black",
-        line_width=2,
-        line_dash="dashed",
-        alpha=0.5,
-    )
-
-    # Dashed horizontal line at PAYEMS as fraction of peak equals 1
-    fig.line(
-        x=[-bkwd_mths_max, frwd_mths_max],
-        y=[1.0, 1.0],
-        color="black",
-        line_width=2,
-        line_dash="dashed",
-        alpha=0.5,
-    )
-
-    # # Create the tick marks for the x-axis and set x-axis labels
-    # major_tick_labels = []
-    # major_tick_list = []
-    # for i in range(-bkwd_mths_max, frwd_mths_max + 1):
-    #     if i % 2 == 0:  # indicates even integer
-    #         major_tick_list.append(int(i))
-    #         if i < 0:
-    #             major_tick_labels.append(str(i) + 'mth')
-    #         elif i == 0:
-    #             major_tick_labels.append('peak')
-    #         elif i > 0:
-    #             major_tick_labels.append('+' + str(i) + 'mth')
-
-    # # minor_tick_list = [item for item in range(-bkwd_mths_max,
-    # #                                           frwd_mths_max + 1)]
-    # major_tick_dict = dict(zip(major_tick_list, major_tick_labels))
-    # fig.xaxis.ticker = major_tick_list
-    # fig.xaxis.major_label_overrides = major_tick_dict
-
-    # Add legend
-    legend = Legend(
-        items=[
-            (rec_label_yrmth_lst[0], [l0]),
-            (rec_label_yrmth_lst[1], [l1]),
-            (rec_label_yrmth_lst[2], [l2]),
-            (rec_label_yrmth_lst[3], [l3]),
-            (rec_label_yrmth_lst[4], [l4]),
-            (rec_label_yrmth_lst[5], [l5]),
-            (rec_label_yrmth_lst[6], [l6]),
-            (rec_label_yrmth_lst[7], [l7]),
-            (rec_label_yrmth_lst[8], [l8]),
-            (rec_label_yrmth_lst[9], [l9]),
-            (rec_label_yrmth_lst[10], [l10]),
-            (rec_label_yrmth_lst[11], [l11]),
-            (rec_label_yrmth_lst[12], [l12]),
-            (rec_label_yrmth_lst[13], [l13]),
-            (rec_label_yrmth_lst[14], [l14]),
-        ],
-        location="center",
-    )
-    fig.add_layout(legend, "right")
-
-    # # Add label to current recession low point
-    # fig.text(x=[12, 12, 12, 12], y=[0.63, 0.60, 0.57, 0.54],
-    #          text=['2020-03-23', 'DJIA: 18,591.93', '63.3% of peak',
-    #                '39 days from peak'],
-    #          text_font_size='8pt', angle=0)
-
-    # label_text = ('Recent low \n 2020-03-23 \n DJIA: 18,591.93 \n '
-    #               '63\% of peak \n 39 days from peak')
-    # fig.add_layout(Label(x=10, y=0.65, x_units='screen', text=label_text,
-    #                      render_mode='css', border_line_color='black',
-    #                      border_line_alpha=1.0,
-    #                      background_fill_color='white',
-    #                      background_fill_alpha=1.0))
-
-    # Add title and subtitle to the plot
-    fig_title2 = "Progression of U.S. total nonfarm employment"
-    fig_title3 = "(PAYEMS, seasonally adjusted) in last 15 recessions"
-    fig.add_layout(
-        Title(
-            text=fig_title3,
-            text_font_style="bold",
-            text_font_size="16pt",
-            align="center",
-        ),
-        "above",
-    )
-    fig.add_layout(
-        Title(
-            text=fig_title2,
-            text_font_style="bold",
-            text_font_size="16pt",
-            align="center",
-        ),
-        "above",
-    )
-
-    # Add source text below figure
-    updated_date_str = (
-        end_date.strftime("%B")
-        + " "
-        + end_date.strftime("%d").lstrip("0")
-        + ", "
-        + end_date.strftime("%Y")
-    )
-    fig.add_layout(
-        Title(
-            text="Source: Richard W. Evans (@RickEcon), "
-            + "historical PAYEMS data from FRED and BLS, "
-            + "updated "
-            + updated_date_str
-            + ".",
-            align="left",
-            text_font_size="3mm",
-            text_font_style="italic",
-        ),
-        "below",
-    )
-    fig.legend.click_policy = "mute"
-
-    # Add the HoverTool to the figure
-    fig.add_tools(
-        HoverTool(
-            tooltips=tooltips,
-            toggleable=False,
-            formatters={"@Date": "datetime"},
-        )
-    )
-
-    if html_show:
-        show(fig)
-
-    return fig, end_date_str
-
-
-if __name__ == "__main__":
-    # execute only if run as a script
-    fig, end_date_str = usempl_npp()
+"""
+This module creates a normalized peak plot of the U.S. total nonfarm payrolls
+seasonally adjusted (PAYEMS) data for each of the last 15 recessions--from the
+current 2020 Coronavirus recession to the Great Depression of 1929--using the
+Bokeh plotting library. The data are downloaded and organized by the
+usempl_data.py module, whose functions are also available from this module.
+The figure build and HTML write are timed as stages with the instrument.py
+module.
+
+This module defines the following function(s):
+    get_line_styles()
+    get_source_cols()
+    get_yrange_blocks()
+    create_usempl_fig()
+    usempl_npp()
+"""
+
+# Import packages
+import numpy as np
+import datetime as dt
+import json
+import os
+from bokeh.io import output_file
+from bokeh.plotting import figure, show
+from bokeh.models import (
+    ColumnDataSource,
+    Title,
+    Legend,
+    HoverTool,
+    CustomJS,
+    CustomJSHover,
+)
+
+# from bokeh.models import Label
+from bokeh.palettes import Category20
+from usempl_npp import downsample
+from usempl_npp import instrument
+
+# The data functions are re-exported so that code written against this
+# module keeps working
+from usempl_npp.usempl_data import (  # noqa: F401
+    get_peak_indices,
+    align_peak_matrix,
+    align_peaks,
+    build_usempl_pk_long,
+    align_peaks_long,
+    usempl_pk_to_long,
+    get_recession_groups,
+    write_usempl_pk,
+    read_usempl_pk,
+    get_recession_registry,
+    get_usempl_series,
+    get_usempl_data,
+)
+
+"""
+Define functions
+"""
+
+
+def get_line_styles(num_rec):
+    """
+    This function sets the line color and width of each recession. The
+    oldest (Great Depression) recession is thick blue, the most recent is
+    thick black, and the recessions in between have the Category20 colors.
+
+    Args:
+        num_rec (int): number of recessions
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        line_colors (list): list of the line color of each recession
+        line_widths (list): list of the line width in pixels of each
+            recession
+    """
+    line_colors = []
+    line_widths = []
+    for i in range(num_rec):
+        if i == 0:
+            line_colors.append("blue")
+            line_widths.append(5)
+        elif i == num_rec - 1:
+            line_colors.append("black")
+            line_widths.append(5)
+        else:
+            line_colors.append(Category20[20][(i - 1) % 20])
+            line_widths.append(2)
+
+    return line_colors, line_widths
+
+
+def get_source_cols(render_mode="lines"):
+    """
+    This function lists the columns of the long normalized peak DataFrame
+    that the figure sends to the browser for each recession.
+
+    Args:
+        render_mode (str): 'lines', 'multi_line', or 'compact', see
+            create_usempl_fig()
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        rec_cols (list): list of column names
+    """
+    if render_mode == "compact":
+        rec_cols = ["mths_frm_peak", "usempl_dv_pk"]
+    else:
+        rec_cols = ["mths_frm_peak", "Date", "PAYEMS", "usempl_dv_pk"]
+
+    return rec_cols
+
+
+def get_yrange_blocks(
+    usempl_pk_long, bkwd_mths_max, frwd_mths_max, block_mths=4
+):
+    """
+    This function computes the minimum and maximum usempl_dv_pk value of
+    each recession in blocks of block_mths months from the peak. These are
+    the leaves of the segment trees that the browser builds once to rescale
+    the y-axis to the visible months in O(log B) steps for B blocks, without
+    scanning the data.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            get_usempl_data(output_format='long')
+        bkwd_mths_max (int): maximum number of months backward from the peak
+        frwd_mths_max (int): maximum number of months forward from the peak
+        block_mths (int): number of months per block
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        block_min (array_like): (R, B) float32 array of the minimum of each
+            recession in each block, +inf for blocks without data
+        block_max (array_like): (R, B) float32 array of the maximum of each
+            recession in each block, -inf for blocks without data
+    """
+    num_rec = len(usempl_pk_long["recession_id"].cat.categories)
+    num_mths = bkwd_mths_max + frwd_mths_max + 1
+    num_blocks = -(-num_mths // block_mths)
+    # Months from peak may be fractional for weekly or daily series, so each
+    # block can hold any number of points per recession
+    rec_block = (
+        usempl_pk_long["recession_id"].cat.codes.to_numpy(),
+        np.floor(
+            (
+                usempl_pk_long["mths_frm_peak"].to_numpy(dtype=np.float64)
+                + bkwd_mths_max
+            )
+            / block_mths
+        ).astype(np.int64),
+    )
+    dv_pk = usempl_pk_long["usempl_dv_pk"].to_numpy(dtype=np.float32)
+    block_min = np.full((num_rec, num_blocks), np.inf, dtype=np.float32)
+    block_max = np.full((num_rec, num_blocks), -np.inf, dtype=np.float32)
+    np.minimum.at(block_min, rec_block, dv_pk)
+    np.maximum.at(block_max, rec_block, dv_pk)
+
+    return block_min, block_max
+
+
+def create_usempl_fig(
+    usempl_pk_long,
+    rec_label_yrmth_lst,
+    end_date,
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    render_mode="lines",
+    y_autoscale=True,
+    max_points=None,
+    downsample_method="lttb",
+    detail_url=None,
+):
+    """
+    This function creates the Bokeh figure of the normalized peak plot from
+    the long normalized peak DataFrame. With render_mode='lines', each
+    recession has its own ColumnDataSource and line renderer. With
+    render_mode='multi_line', all recessions are packed into one
+    ColumnDataSource with one row per recession and drawn by a single
+    multi_line renderer. The legend then points at empty proxy lines, and
+    muting a proxy line fades its recession through the shared line_alpha
+    column. With render_mode='compact', the multi_line source holds only the
+    months from the peak (int16) and the fractions of the peak (float32), and
+    the dates and employment levels in the tooltips are rebuilt in the
+    browser from the peak date and peak value of each recession. With
+    max_points, the lines of recessions with more points (e.g., of weekly or
+    daily series) are first drawn downsampled to max_points points, and a
+    callback on the x-range swaps in the full-resolution points around the
+    visible months once at most max_points of them per line are in view.
+
+    Args:
+        usempl_pk_long (DataFrame): long normalized peak DataFrame from
+            get_usempl_data(output_format='long')
+        rec_label_yrmth_lst (list): list of string start year and month and
+            end year and month of each recession, used in the legend
+        end_date (datetime): date through which the plot is updated, shown in
+            the source note below the figure
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_main (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        frwd_mths_max (int): maximum number of months forward from the peak to
+            allow for the plot, to be seen by zooming out
+        bkwd_mths_max (int): maximum number of months backward from the peak to
+            allow for the plot, to be seen by zooming out
+        render_mode (str): 'lines' for one line renderer per recession,
+            'multi_line' for one multi_line renderer for all recessions, or
+            'compact' for a multi_line renderer without the Date and PAYEMS
+            columns
+        y_autoscale (bool): =True if rescale the y-axis in the browser to
+            the unmuted recessions in the visible months (rounded out to
+            blocks of 4 months) whenever the x-axis range changes
+        max_points (int): maximum number of points per line in the browser.
+            If None, all points are drawn
+        downsample_method (str): 'lttb' or 'minmax', see
+            downsample.downsample_long()
+        detail_url (str): URL of the JSON file of the full-resolution points
+            from downsample.get_detail_data(), fetched on the first zoom-in.
+            If None, the full-resolution points are embedded in the figure
+
+    Other functions and files called by this function:
+        get_source_cols()
+        get_recession_groups()
+        downsample.downsample_long()
+        get_line_styles()
+        get_yrange_blocks()
+
+    Files created by this function: None
+
+    Returns:
+        fig (bokeh Figure): normalized peak plot figure
+    """
+    if render_mode not in ("lines", "multi_line", "compact"):
+        err_msg = (
+            "render_mode must be 'lines', 'multi_line', or 'compact', not "
+            + repr(render_mode)
+        )
+        raise ValueError(err_msg)
+    rec_cols = get_source_cols(render_mode)
+    rec_groups = get_recession_groups(usempl_pk_long)
+    num_rec = len(rec_groups)
+    rec_groups_full = rec_groups
+    lod_lines = max_points is not None and (
+        max(len(usempl_pk_rec) for usempl_pk_rec in rec_groups.values())
+        > max_points
+    )
+    if lod_lines:
+        rec_groups = get_recession_groups(
+            downsample.downsample_long(
+                usempl_pk_long, max_points, downsample_method
+            )
+        )
+
+    line_colors, line_widths = get_line_styles(num_rec)
+
+    # Format the tooltip
+    if render_mode == "lines":
+        tooltips = [
+            ("Date", "@Date{%F}"),
+            ("Months from peak", "$x{0.}"),
+            ("Employment", "@PAYEMS{0,0.},000"),
+            ("Fraction of peak", "@usempl_dv_pk{0.0 %}"),
+        ]
+        formatters = {"@Date": "datetime"}
+    elif render_mode == "multi_line":
+        # In a multi_line source each column value is the whole array of a
+        # recession, so the formatters pick the hovered month out of it
+        tooltips = [
+            ("Date", "@Date{custom}"),
+            ("Months from peak", "$x{0.}"),
+            ("Employment", "@PAYEMS{custom}"),
+            ("Fraction of peak", "@usempl_dv_pk{custom}"),
+        ]
+        formatters = {
+            "@Date": CustomJSHover(
+                code=(
+                    "const ms = value[special_vars.segment_index];\n"
+                    "return new Date(ms).toISOString().slice(0, 10);"
+                )
+            ),
+            "@PAYEMS": CustomJSHover(
+                code=(
+                    "const val = value[special_vars.segment_index];\n"
+                    "return Math.round(val).toLocaleString('en-US') + ',000';"
+                )
+            ),
+            "@usempl_dv_pk": CustomJSHover(
+                code=(
+                    "const val = value[special_vars.segment_index];\n"
+                    "return (100 * val).toFixed(1) + ' %';"
+                )
+            ),
+        }
+    else:
+        # The date is the peak date plus the months from the peak, and the
+        # employment level is the fraction of the peak times the peak value
+        tooltips = [
+            ("Date", "@peak_date{custom}"),
+            ("Months from peak", "$x{0.}"),
+            ("Employment", "@peak_val{custom}"),
+            ("Fraction of peak", "@usempl_dv_pk{custom}"),
+        ]
+        formatters = {
+            "@peak_date": CustomJSHover(
+                code=(
+                    "const mths = source.data['mths_frm_peak']"
+                    "[special_vars.index][special_vars.segment_index];\n"
+                    "const date = new Date(value);\n"
+                    "date.setUTCMonth(date.getUTCMonth() + mths);\n"
+                    "return date.toISOString().slice(0, 10);"
+                )
+            ),
+            "@peak_val": CustomJSHover(
+                code=(
+                    "const dv_pk = source.data['usempl_dv_pk']"
+                    "[special_vars.index][special_vars.segment_index];\n"
+                    "const val = Math.round(dv_pk * value);\n"
+                    "return val.toLocaleString('en-US') + ',000';"
+                )
+            ),
+            "@usempl_dv_pk": CustomJSHover(
+                code=(
+                    "const val = value[special_vars.segment_index];\n"
+                    "return (100 * val).toFixed(1) + ' %';"
+                )
+            ),
+        }
+
+    # Solve for minimum and maximum PAYEMS/Peak values in monthly main display
+    # window in order to set the appropriate xrange and yrange
+    usempl_dv_pk_main = usempl_pk_long["usempl_dv_pk"][
+        (usempl_pk_long["mths_frm_peak"] >= -bkwd_mths_main)
+        & (usempl_pk_long["mths_frm_peak"] <= frwd_mths_main)
+    ]
+    min_main_val = float(usempl_dv_pk_main.min())
+    max_main_val = float(usempl_dv_pk_main.max())
+
+    datarange_main_vals = max_main_val - min_main_val
+    datarange_main_mths = int(frwd_mths_main + bkwd_mths_main)
+    fig_buffer_pct = 0.10
+    fig = figure(
+        plot_height=500,
+        plot_width=800,
+        x_axis_label="Months from Peak",
+        y_axis_label="PAYEMS as fraction of Peak",
+        y_range=(
+            min_main_val - fig_buffer_pct * datarange_main_vals,
+            max_main_val + fig_buffer_pct * datarange_main_vals,
+        ),
+        x_range=(
+            (-bkwd_mths_main - fig_buffer_pct * datarange_main_mths),
+            (frwd_mths_main + fig_buffer_pct * datarange_main_mths),
+        ),
+        tools=[
+            "save",
+            "zoom_in",
+            "zoom_out",
+            "box_zoom",
+            "pan",
+            "undo",
+            "redo",
+            "reset",
+            "hover",
+            "help",
+        ],
+        toolbar_location="left",
+    )
+    fig.title.text_font_size = "18pt"
+    fig.toolbar.logo = None
+    rec_lines = []
+    if render_mode == "lines":
+        # One ColumnDataSource and line renderer per recession from the
+        # per-recession views of the long normalized peak DataFrame
+        rec_sources = [
+            ColumnDataSource(usempl_pk_rec[rec_cols])
+            for usempl_pk_rec in rec_groups.values()
+        ]
+        for i, rec_source in enumerate(rec_sources):
+            rec_lines.append(
+                fig.line(
+                    x="mths_frm_peak",
+                    y="usempl_dv_pk",
+                    source=rec_source,
+                    color=line_colors[i],
+                    line_width=line_widths[i],
+                    alpha=0.7,
+                    muted_alpha=0.15,
+                )
+            )
+    else:
+        # One ColumnDataSource row per recession, drawn by one renderer
+        rec_data = {
+            rec_col: [
+                usempl_pk_rec[rec_col].to_numpy()
+                for usempl_pk_rec in rec_groups.values()
+            ]
+            for rec_col in rec_cols
+        }
+        if render_mode == "compact":
+            # One peak value and peak date (in ms) per recession
+            rec_peak = usempl_pk_long[usempl_pk_long["mths_frm_peak"] == 0]
+            rec_data["peak_val"] = rec_peak["PAYEMS"].to_numpy(np.float64)
+            rec_data["peak_date"] = (
+                rec_peak["Date"].to_numpy().astype("datetime64[ms]")
+            ).astype(np.float64)
+        rec_data["line_color"] = line_colors
+        rec_data["line_width"] = line_widths
+        rec_data["line_alpha"] = [0.7] * num_rec
+        rec_cds = ColumnDataSource(rec_data)
+        rec_sources = [rec_cds]
+        if render_mode == "compact":
+            for formatter in formatters.values():
+                formatter.args = {"source": rec_cds}
+        fig.multi_line(
+            xs="mths_frm_peak",
+            ys="usempl_dv_pk",
+            source=rec_cds,
+            line_color="line_color",
+            line_width="line_width",
+            line_alpha="line_alpha",
+        )
+        # Empty proxy lines that share one empty source carry the legend
+        # entries. Muting a proxy line sets the alpha of its recession.
+        proxy_cds = ColumnDataSource({"x": [], "y": []})
+        for i in range(num_rec):
+            rec_lines.append(
+                fig.line(
+                    x="x",
+                    y="y",
+                    source=proxy_cds,
+                    color=line_colors[i],
+                    line_width=line_widths[i],
+                    alpha=0.7,
+                    muted_alpha=0.15,
+                )
+            )
+        mute_callback = CustomJS(
+            args={"source": rec_cds, "rec_lines": rec_lines},
+            code=(
+                "const rec_idx = rec_lines.indexOf(cb_obj);\n"
+                "source.data['line_alpha'][rec_idx] = "
+                "cb_obj.muted ? 0.15 : 0.7;\n"
+                "source.change.emit();"
+            ),
+        )
+        for rec_line in rec_lines:
+            rec_line.nonselection_glyph = None
+            rec_line.js_on_change("muted", mute_callback)
+
+    if lod_lines:
+        # On each pan or zoom (after 100 ms without another one), draw the
+        # full-resolution points from one span before to one span after the
+        # visible months if each line has at most max_points of them in view,
+        # and the downsampled lines otherwise. The full-resolution points
+        # are embedded in detail_cds or fetched from detail_url once
+        if detail_url is None:
+            detail_cds = ColumnDataSource(
+                {
+                    rec_col: [
+                        usempl_pk_rec[rec_col].to_numpy()
+                        for usempl_pk_rec in rec_groups_full.values()
+                    ]
+                    for rec_col in rec_cols
+                }
+            )
+        else:
+            detail_cds = ColumnDataSource({})
+        rec_mths = [
+            usempl_pk_rec["mths_frm_peak"].to_numpy(dtype=np.float64)
+            for usempl_pk_rec in rec_groups_full.values()
+        ]
+        lod_callback = CustomJS(
+            args={
+                "x_range": fig.x_range,
+                "sources": rec_sources,
+                "detail": detail_cds,
+                "detail_url": detail_url,
+                "rec_cols": rec_cols,
+                "is_multi": render_mode != "lines",
+                "num_full": [len(mths) for mths in rec_mths],
+                "x_min": [float(mths[0]) for mths in rec_mths],
+                "x_max": [float(mths[-1]) for mths in rec_mths],
+                "max_points": max_points,
+            },
+            code=(
+                "if (detail.lod == null) {\n"
+                "  detail.lod = {overview: sources.map((src) => src.data), "
+                "full: null, win: null, timer: null, seq: 0};\n"
+                "}\n"
+                "const lod = detail.lod;\n"
+                "const bisect = (xs, x) => {\n"
+                "  let lo = 0;\n"
+                "  let hi = xs.length;\n"
+                "  while (lo < hi) {\n"
+                "    const mid = (lo + hi) >> 1;\n"
+                "    if (xs[mid] < x) lo = mid + 1; else hi = mid;\n"
+                "  }\n"
+                "  return lo;\n"
+                "};\n"
+                "const show = (full, win) => {\n"
+                "  const recs = num_full.map((num, i) => {\n"
+                "    const xs = full['mths_frm_peak'][i];\n"
+                "    const lo = Math.max(0, bisect(xs, win[0]) - 1);\n"
+                "    const hi = Math.min(num, bisect(xs, win[1]) + 1);\n"
+                "    const rec = {};\n"
+                "    for (const col of rec_cols) {\n"
+                "      rec[col] = full[col][i].slice(lo, hi);\n"
+                "    }\n"
+                "    return rec;\n"
+                "  });\n"
+                "  if (is_multi) {\n"
+                "    const data = Object.assign({}, lod.overview[0]);\n"
+                "    for (const col of rec_cols) {\n"
+                "      data[col] = recs.map((rec) => rec[col]);\n"
+                "    }\n"
+                "    sources[0].data = data;\n"
+                "  } else {\n"
+                "    sources.forEach((src, i) => { src.data = recs[i]; });\n"
+                "  }\n"
+                "};\n"
+                "clearTimeout(lod.timer);\n"
+                "lod.timer = setTimeout(() => {\n"
+                "  const start = x_range.start;\n"
+                "  const end = x_range.end;\n"
+                "  let num_vis = 0;\n"
+                "  for (let i = 0; i < num_full.length; i++) {\n"
+                "    const vis = Math.min(end, x_max[i]) - "
+                "Math.max(start, x_min[i]);\n"
+                "    if (vis > 0) num_vis = Math.max(num_vis, num_full[i] * "
+                "vis / Math.max(x_max[i] - x_min[i], 1e-9));\n"
+                "  }\n"
+                "  if (num_vis > max_points) {\n"
+                "    lod.seq++;\n"
+                "    if (lod.win !== null) {\n"
+                "      lod.win = null;\n"
+                "      sources.forEach((src, i) => "
+                "{ src.data = lod.overview[i]; });\n"
+                "    }\n"
+                "    return;\n"
+                "  }\n"
+                "  if (lod.win !== null && start >= lod.win[0] && "
+                "end <= lod.win[1]) return;\n"
+                "  const win = [2 * start - end, 2 * end - start];\n"
+                "  const seq = ++lod.seq;\n"
+                "  const load = (full) => {\n"
+                "    lod.full = full;\n"
+                "    if (seq !== lod.seq) return;\n"
+                "    lod.win = win;\n"
+                "    show(full, win);\n"
+                "  };\n"
+                "  if (lod.full !== null) load(lod.full);\n"
+                "  else if (detail_url === null) load(detail.data);\n"
+                "  else fetch(detail_url).then((resp) => resp.json())"
+                ".then(load);\n"
+                "}, 100);"
+            ),
+        )
+        fig.x_range.js_on_change("start", lod_callback)
+        fig.x_range.js_on_change("end", lod_callback)
+
+    if y_autoscale:
+        # On each pan or zoom, and when a recession is muted, fit the y-range
+        # to the unmuted recessions in the blocks of the visible x-range with
+        # 10% buffers. The first call builds an implicit segment tree per
+        # recession from the block minimums and maximums (node k covers
+        # nodes 2k and 2k + 1, and the leaves start at the number of blocks)
+        yrange_bkwd_mths = max(
+            bkwd_mths_max,
+            int(np.ceil(-usempl_pk_long["mths_frm_peak"].min())),
+        )
+        yrange_frwd_mths = max(
+            frwd_mths_max,
+            int(np.ceil(usempl_pk_long["mths_frm_peak"].max())),
+        )
+        yrange_block_mths = 4
+        block_min, block_max = get_yrange_blocks(
+            usempl_pk_long,
+            yrange_bkwd_mths,
+            yrange_frwd_mths,
+            yrange_block_mths,
+        )
+        yrange_cds = ColumnDataSource(
+            {"block_min": list(block_min), "block_max": list(block_max)}
+        )
+        yrange_callback = CustomJS(
+            args={
+                "x_range": fig.x_range,
+                "y_range": fig.y_range,
+                "blocks": yrange_cds,
+                "rec_lines": rec_lines,
+                "mth_beg": -yrange_bkwd_mths,
+                "block_mths": yrange_block_mths,
+                "buffer_pct": fig_buffer_pct,
+            },
+            code=(
+                "const num_blocks = blocks.data['block_min'][0].length;\n"
+                "if (blocks.seg_trees == null) {\n"
+                "  blocks.seg_trees = [];\n"
+                "  for (let i = 0; i < rec_lines.length; i++) {\n"
+                "    const t_min = new Float32Array(2 * num_blocks);\n"
+                "    const t_max = new Float32Array(2 * num_blocks);\n"
+                "    t_min.set(blocks.data['block_min'][i], num_blocks);\n"
+                "    t_max.set(blocks.data['block_max'][i], num_blocks);\n"
+                "    for (let k = num_blocks - 1; k > 0; k--) {\n"
+                "      t_min[k] = Math.min(t_min[2 * k], t_min[2 * k + 1]);\n"
+                "      t_max[k] = Math.max(t_max[2 * k], t_max[2 * k + 1]);\n"
+                "    }\n"
+                "    blocks.seg_trees.push([t_min, t_max]);\n"
+                "  }\n"
+                "}\n"
+                "const lo = Math.max(0, Math.floor("
+                "(x_range.start - mth_beg) / block_mths));\n"
+                "const hi = Math.min(num_blocks - 1, Math.floor("
+                "(x_range.end - mth_beg) / block_mths));\n"
+                "let y_min = Infinity;\n"
+                "let y_max = -Infinity;\n"
+                "for (let i = 0; i < rec_lines.length; i++) {\n"
+                "  if (rec_lines[i].muted) continue;\n"
+                "  const [t_min, t_max] = blocks.seg_trees[i];\n"
+                "  let l = lo + num_blocks;\n"
+                "  let h = hi + num_blocks + 1;\n"
+                "  while (l < h) {\n"
+                "    if (l & 1) {\n"
+                "      y_min = Math.min(y_min, t_min[l]);\n"
+                "      y_max = Math.max(y_max, t_max[l]);\n"
+                "      l++;\n"
+                "    }\n"
+                "    if (h & 1) {\n"
+                "      h--;\n"
+                "      y_min = Math.min(y_min, t_min[h]);\n"
+                "      y_max = Math.max(y_max, t_max[h]);\n"
+                "    }\n"
+                "    l >>= 1;\n"
+                "    h >>= 1;\n"
+                "  }\n"
+                "}\n"
+                "if (y_min <= y_max) {\n"
+                "  const buffer = buffer_pct * Math.max(y_max - y_min, 0.01);\n"
+                "  y_range.setv({start: y_min - buffer, end: y_max + buffer});\n"
+                "}"
+            ),
+        )
+        fig.x_range.js_on_change("start", yrange_callback)
+        fig.x_range.js_on_change("end", yrange_callback)
+        for rec_line in rec_lines:
+            rec_line.js_on_change("muted", yrange_callback)
+
+    # Dashed vertical line at the peak PAYEMS value period
+    fig.line(
+        x=[0.0, 0.0],
+        y=[-0.5, 2.0],
+        color="black",
+        line_width=2,
+        line_dash="dashed",
+        alpha=0.5,
+    )
+
+    # Dashed horizontal line at PAYEMS as fraction of peak equals 1
+    fig.line(
+        x=[-bkwd_mths_max, frwd_mths_max],
+        y=[1.0, 1.0],
+        color="black",
+        line_width=2,
+        line_dash="dashed",
+        alpha=0.5,
+    )
+
+    # # Create the tick marks for the x-axis and set x-axis labels
+    # major_tick_labels = []
+    # major_tick_list = []
+    # for i in range(-bkwd_mths_max, frwd_mths_max + 1):
+    #     if i % 2 == 0:  # indicates even integer
+    #         major_tick_list.append(int(i))
+    #         if i < 0:
+    #             major_tick_labels.append(str(i) + 'mth')
+    #         elif i == 0:
+    #             major_tick_labels.append('peak')
+    #         elif i > 0:
+    #             major_tick_labels.append('+' + str(i) + 'mth')
+
+    # # minor_tick_list = [item for item in range(-bkwd_mths_max,
+    # #                                           frwd_mths_max + 1)]
+    # major_tick_dict = dict(zip(major_tick_list, major_tick_labels))
+    # fig.xaxis.ticker = major_tick_list
+    # fig.xaxis.major_label_overrides = major_tick_dict
+
+    # Add legend
+    legend = Legend(
+        items=[
+            (rec_label_yrmth, [rec_line])
+            for rec_label_yrmth, rec_line in zip(
+                rec_label_yrmth_lst, rec_lines
+            )
+        ],
+        location="center",
+    )
+    fig.add_layout(legend, "right")
+
+    # # Add label to current recession low point
+    # fig.text(x=[12, 12, 12, 12], y=[0.63, 0.60, 0.57, 0.54],
+    #          text=['2020-03-23', 'DJIA: 18,591.93', '63.3% of peak',
+    #                '39 days from peak'],
+    #          text_font_size='8pt', angle=0)
+
+    # label_text = ('Recent low \n 2020-03-23 \n DJIA: 18,591.93 \n '
+    #               '63\% of peak \n 39 days from peak')
+    # fig.add_layout(Label(x=10, y=0.65, x_units='screen', text=label_text,
+    #                      render_mode='css', border_line_color='black',
+    #                      border_line_alpha=1.0,
+    #                      background_fill_color='white',
+    #                      background_fill_alpha=1.0))
+
+    # Add title and subtitle to the plot
+    fig_title2 = "Progression of U.S. total nonfarm employment"
+    fig_title3 = (
+        "(PAYEMS, seasonally adjusted) in last " + str(num_rec) + " recessions"
+    )
+    fig.add_layout(
+        Title(
+            text=fig_title3,
+            text_font_style="bold",
+            text_font_size="16pt",
+            align="center",
+        ),
+        "above",
+    )
+    fig.add_layout(
+        Title(
+            text=fig_title2,
+            text_font_style="bold",
+            text_font_size="16pt",
+            align="center",
+        ),
+        "above",
+    )
+
+    # Add source text below figure
+    updated_date_str = (
+        end_date.strftime("%B")
+        + " "
+        + end_date.strftime("%d").lstrip("0")
+        + ", "
+        + end_date.strftime("%Y")
+    )
+    fig.add_layout(
+        Title(
+            text="Source: Richard W. Evans (@RickEcon), "
+            + "historical PAYEMS data from FRED and BLS, "
+            + "updated "
+            + updated_date_str
+            + ".",
+            align="left",
+            text_font_size="3mm",
+            text_font_style="italic",
+        ),
+        "below",
+    )
+    fig.legend.click_policy = "mute"
+
+    # Add the HoverTool to the figure
+    fig.add_tools(
+        HoverTool(
+            tooltips=tooltips,
+            toggleable=False,
+            formatters=formatters,
+        )
+    )
+
+    return fig
+
+
+def usempl_npp(
+    frwd_mths_main=53,
+    bkwd_mths_main=5,
+    frwd_mths_max=135,
+    bkwd_mths_max=48,
+    usempl_end_date="today",
+    download_from_internet=True,
+    html_show=True,
+    render_mode="lines",
+    verbose=False,
+    max_points=None,
+    downsample_method="lttb",
+    detail_file=False,
+    save_pk_files=False,
+):
+    """
+    This function creates the HTML and JavaScript code for the dynamic
+    visualization of the normalized peak plot of the last 15 recessions in the
+    United States, from the Great Depression (Aug. 1929 - Mar. 1933) to the
+    most recent COVID-19 recession (Feb. 2020 - present).
+
+    Args:
+        frwd_mths_main (int): number of months forward from the peak to plot in
+            the default main window of the visualization
+        bkwd_mths_maim (int): number of months backward from the peak to plot
+            in the default main window of the visualization
+        frwd_mths_max (int): maximum number of months forward from the peak to
+            allow for the plot, to be seen by zooming out
+        bkwd_mths_max (int): maximum number of months backward from the peak to
+            allow for the plot, to be seen by zooming out
+        usempl_end_date (str): either 'today' or the end date of PAYEMS time
+            series in 'YYYY-mm-dd' format
+        download_from_internet (bool): =True if download data from St. Louis
+            Federal Reserve's FRED system
+            (https://fred.stlouisfed.org/series/PAYEMS), otherwise read data in
+            from local directory
+        html_show (bool): =True if open dynamic visualization in browser once
+            created
+        render_mode (str): 'lines' for one line renderer per recession,
+            'multi_line' for one multi_line renderer for all recessions, or
+            'compact' for the smallest HTML file (see create_usempl_fig())
+        verbose (bool): =True if print the end date and the peak value and
+            date of each recession, which are also recorded by the stages of
+            get_usempl_data()
+        max_points (int): maximum number of points per line in the first
+            view, see create_usempl_fig(). If None, all points are drawn
+        downsample_method (str): 'lttb' or 'minmax', see
+            downsample.downsample_long()
+        detail_file (bool): =True if save the full-resolution points in a
+            JSON file next to the HTML file that the browser fetches on the
+            first zoom-in, which keeps the HTML file small but needs the
+            files to be served over HTTP, otherwise embed them in the HTML
+            file. Only used with max_points
+        save_pk_files (bool): =True if save the normalized peak series as
+            data/usempl_pk_[yyyy-mm-dd].csv and .npy files, see
+            get_usempl_data()
+
+    Other functions and files called by this function:
+        get_usempl_data()
+        get_source_cols()
+        downsample.get_detail_data()
+        create_usempl_fig()
+        instrument.stage()
+
+    Files created by this function:
+       images/usempl_[yyyy-mm-dd].html
+       images/usempl_npp_[yyyy-mm-dd]_detail.json (if detail_file)
+       data/usempl_pk_[yyyy-mm-dd].csv (if save_pk_files)
+       data/usempl_pk_[yyyy-mm-dd].npy (if save_pk_files)
+
+    Returns: fig, end_date_str
+    """
+    # Create directory if images directory does not already exist
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    image_fldr = "images"
+    image_dir = os.path.join(cur_path, image_fldr)
+    if not os.access(image_dir, os.F_OK):
+        os.makedirs(image_dir)
+
+    if usempl_end_date == "today":
+        end_date = dt.date.today()  # Go through today
+    else:
+        end_date = dt.datetime.strptime(usempl_end_date, "%Y-%m-%d")
+
+    end_date_str = end_date.strftime("%Y-%m-%d")
+
+    # Set main window and total data limits for monthly plot
+    frwd_mths_main = int(frwd_mths_main)
+    bkwd_mths_main = int(bkwd_mths_main)
+    frwd_mths_max = int(frwd_mths_max)
+    bkwd_mths_max = int(bkwd_mths_max)
+
+    (
+        usempl_pk,
+        end_date_str2,
+        peak_vals,
+        peak_dates,
+        rec_label_yr_lst,
+        rec_label_yrmth_lst,
+        rec_beg_yrmth_lst,
+        maxdate_rng_lst,
+    ) = get_usempl_data(
+        frwd_mths_max,
+        bkwd_mths_max,
+        end_date_str,
+        download_from_internet,
+        output_format="long",
+        verbose=verbose,
+        save_pk_files=save_pk_files,
+    )
+    if verbose and end_date_str2 != end_date_str:
+        print(
+            "PAYEMS data downloaded on "
+            + end_date_str
+            + " has most "
+            + "recent PAYEMS data month of "
+            + end_date_str2
+            + "."
+        )
+    end_date2 = dt.datetime.strptime(end_date_str2, "%Y-%m-%d")
+
+    # Create Bokeh plot of PAYEMS normalized peak plot figure
+    fig_title = (
+        "Progression of PAYEMS in last "
+        + str(len(rec_label_yrmth_lst))
+        + " recessions"
+    )
+    filename = "usempl_npp_" + end_date_str2 + ".html"
+    html_file_path = os.path.join(image_dir, filename)
+    output_file(html_file_path, title=fig_title)
+    detail_url = None
+    if max_points is not None and detail_file:
+        # The URL is relative to the HTML file
+        detail_filename = "usempl_npp_" + end_date_str2 + "_detail.json"
+        with instrument.stage("detail_write") as stage_rec:
+            with open(
+                os.path.join(image_dir, detail_filename), "w"
+            ) as detail_json:
+                json.dump(
+                    downsample.get_detail_data(
+                        usempl_pk, get_source_cols(render_mode)
+                    ),
+                    detail_json,
+                )
+            stage_rec["bytes"] = os.path.getsize(
+                os.path.join(image_dir, detail_filename)
+            )
+        detail_url = detail_filename
+    with instrument.stage("figure_build") as stage_rec:
+        fig = create_usempl_fig(
+            usempl_pk,
+            rec_label_yrmth_lst,
+            end_date,
+            frwd_mths_main,
+            bkwd_mths_main,
+            frwd_mths_max,
+            bkwd_mths_max,
+            render_mode,
+            max_points=max_points,
+            downsample_method=downsample_method,
+            detail_url=detail_url,
+        )
+        stage_rec["rows"] = len(usempl_pk)
+
+    if html_show:
+        with instrument.stage("html_write") as stage_rec:
+            show(fig)
+            stage_rec["bytes"] = os.path.getsize(html_file_path)
+
+    return fig, end_date_str
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    fig, end_date_str = usempl_npp(verbose=True)
@@ -0,0 +1,390 @@
+"""
+This module keeps every downloaded vintage of a monthly FRED series (e.g.,
+PAYEMS) in one compact append-only file instead of one full CSV file per end
+date. The file holds fixed-size binary records (month, vintage date, value).
+Each vintage appends only the observations that are new or revised relative
+to the latest vintage in the store, and a dropped observation is stored as a
+NaN record. Any vintage is rebuilt by keeping, for each month, the value of
+the last record with a vintage date on or before the as-of date. A vintage
+older than the latest stored one (e.g., a backfilled past vintage) is also
+appended to the end of the file, so the records are sorted by vintage when
+they are read, and the rebuild is one binary search and one np.unique()
+call. The parsed records are memoized within a process until the file
+changes on disk.
+
+The store bundled with the package in data/vintages is read-only. New
+vintages are appended to a copy of it in data/vintage_cache, which is not
+tracked by git, and appends from different threads or processes are
+serialized by an exclusive lock on the store file.
+
+This module defines the following function(s):
+    get_bundled_store_path()
+    get_store_path()
+    read_store()
+    get_vintage_dates()
+    get_vintage()
+    append_vintage()
+    append_locked()
+"""
+
+# Import packages
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, so appends are not locked there
+    fcntl = None
+
+# File header and record layout: month and vintage date as NumPy month and
+# day ordinals (since 1970-01 and 1970-01-01) and the observed value, 16
+# bytes per record
+STORE_HEADER = b"usempl vintages\n"
+RECORD_DTYPE = np.dtype([("mth", "<i4"), ("vintage", "<i4"), ("value", "<f8")])
+
+# In-process memo of parsed store files, keyed by store file path with the
+# file's (mtime_ns, size) signature so that appends by other processes are
+# seen
+_store_memo = {}
+
+"""
+Define functions
+"""
+
+
+def get_bundled_store_path(series_id="PAYEMS"):
+    """
+    This function returns the path of the read-only vintage store file of a
+    FRED series that is bundled with the package.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        bundled_path (str): path of the store file vintages/[series_id].bin
+            in the data directory of this package
+    """
+    cur_path = os.path.split(os.path.abspath(__file__))[0]
+    bundled_path = os.path.join(
+        cur_path, "data", "vintages", series_id + ".bin"
+    )
+
+    return bundled_path
+
+
+def get_store_path(series_id="PAYEMS", store_dir=None):
+    """
+    This function returns the path of the writable vintage store file of a
+    FRED series and makes sure that the store directory exists. The default
+    store starts as a copy of the bundled store, so that it holds the
+    bundled vintages and the bundled file itself is never written.
+
+    Args:
+        series_id (str): FRED series ID, e.g., 'PAYEMS'
+        store_dir (str): directory of the store files. If None, the stores
+            are kept in data/vintage_cache in this package directory
+
+    Other functions and files called by this function:
+        get_bundled_store_path()
+        vintages/[series_id].bin
+
+    Files created by this function:
+        vintage_cache/[series_id].bin (if store_dir is None)
+
+    Returns:
+        store_path (str): path of the store file [store_dir]/[series_id].bin
+    """
+    seed_path = None
+    if store_dir is None:
+        cur_path = os.path.split(os.path.abspath(__file__))[0]
+        store_dir = os.path.join(cur_path, "data", "vintage_cache")
+        seed_path = get_bundled_store_path(series_id)
+    if not os.access(store_dir, os.F_OK):
+        os.makedirs(store_dir, exist_ok=True)
+    store_path = os.path.join(store_dir, series_id + ".bin")
+    if (
+        seed_path is not None
+        and not os.access(store_path, os.F_OK)
+        and os.access(seed_path, os.F_OK)
+    ):
+        tmp_path = store_path + "." + str(os.getpid()) + ".tmp"
+        shutil.copyfile(seed_path, tmp_path)
+        os.replace(tmp_path, store_path)
+
+    return store_path
+
+
+def read_store(store_path):
+    """
+    This function reads the records of a vintage store and sorts them by
+    vintage date, reusing the sorted records from an earlier call in this
+    process if the file has not changed since. The sort is stable, so the
+    records of the same vintage keep their order in the file. A partial
+    record at the end of the file, left by an interrupted append, is
+    ignored.
+
+    Args:
+        store_path (str): path of the store file
+
+    Other functions and files called by this function:
+        vintages/[series_id].bin
+
+    Files created by this function: None
+
+    Returns:
+        records (array_like): (M,) structured array of RECORD_DTYPE records
+            sorted by vintage date, empty if there is no store file yet
+    """
+    if not os.access(store_path, os.F_OK):
+        return np.empty(0, dtype=RECORD_DTYPE)
+    stat = os.stat(store_path)
+    if stat.st_size == 0:
+        # A new store file whose first append has not written its header
+        return np.empty(0, dtype=RECORD_DTYPE)
+    file_sig = (stat.st_mtime_ns, stat.st_size)
+    memo = _store_memo.get(store_path)
+    if memo is not None and memo[0] == file_sig:
+        return memo[1]
+    with open(store_path, "rb") as store_file:
+        if store_file.read(len(STORE_HEADER)) != STORE_HEADER:
+            raise ValueError(store_path + " is not a vintage store file.")
+        records = np.fromfile(
+            store_file,
+            dtype=RECORD_DTYPE,
+            count=(stat.st_size - len(STORE_HEADER)) // RECORD_DTYPE.itemsize,
+        )
+    # Vintages appended in date order are already sorted
+    if np.any(np.diff(records["vintage"]) < 0):
+        records = records[np.argsort(records["vintage"], kind="stable")]
+    _store_memo[store_path] = (file_sig, records)
+
+    return records
+
+
+def get_vintage_dates(store_path):
+    """
+    This function lists the vintage dates in a vintage store.
+
+    Args:
+        store_path (str): path of the store file
+
+    Other functions and files called by this function:
+        read_store()
+
+    Files created by this function: None
+
+    Returns:
+        vintage_date_lst (list): list of string vintage dates (YYYY-mm-dd)
+            from old to new
+    """
+    vintages = np.unique(read_store(store_path)["vintage"])
+
+    return [
+        str(vintage)
+        for vintage in vintages.astype(np.int64).astype("datetime64[D]")
+    ]
+
+
+def get_vintage(store_path, as_of=None, end_date=None, value_col="PAYEMS"):
+    """
+    This function rebuilds the series as it was known on the as-of date from
+    the vintage store.
+
+    Args:
+        store_path (str): path of the store file
+        as_of (str or datetime): as-of date of the series. If None, the
+            latest vintage in the store
+        end_date (str or datetime): last date of the returned series. If
+            None, the series runs through its last month in the vintage
+        value_col (str): name of the value column of the returned series
+
+    Other functions and files called by this function:
+        read_store()
+
+    Files created by this function: None
+
+    Returns:
+        series_df (DataFrame): series with columns Date and value_col,
+            sorted from old to new
+    """
+    records = read_store(store_path)
+    if as_of is not None:
+        as_of_day = np.datetime64(pd.Timestamp(as_of).date(), "D")
+        num_known = np.searchsorted(
+            records["vintage"], as_of_day.astype(np.int64), "right"
+        )
+        if num_known == 0:
+            raise ValueError(
+                "The vintage store "
+                + store_path
+                + " has no vintage on or before "
+                + str(as_of_day)
+                + "."
+            )
+        records = records[:num_known]
+
+    # The last record of each month is its value in the vintage, and a NaN
+    # value marks a month that the vintage dropped
+    mths, last_idx = np.unique(records["mth"][::-1], return_index=True)
+    vals = records["value"][::-1][last_idx]
+    is_obs = ~np.isnan(vals)
+    dates = mths[is_obs].astype(np.int64).astype("datetime64[M]")
+    series_df = pd.DataFrame(
+        {"Date": dates.astype("datetime64[ns]"), value_col: vals[is_obs]}
+    )
+    if end_date is not None:
+        series_df = series_df[
+            series_df["Date"] <= pd.Timestamp(end_date)
+        ].reset_index(drop=True)
+
+    return series_df
+
+
+def append_vintage(series_df, vintage_date, store_path, value_col="PAYEMS"):
+    """
+    This function appends a vintage of a series to the vintage store. Only
+    the months that are new or have a different value than in the stored
+    vintage as of vintage_date are written. A month of that vintage that
+    falls within the date range of series_df but is missing from series_df
+    is written as a NaN record, while the months after the last date of
+    series_df (e.g., of a series downloaded through an earlier end date)
+    are left as they are. Appending the same vintage date again updates that
+    vintage. A vintage date before the latest stored vintage is inserted
+    among the stored vintages: each month that it changes and that the next
+    stored vintage does not store is also written with its previous value
+    as a record of the next stored vintage, so that the later vintages are
+    rebuilt as before. The store file is locked from the comparison with the
+    stored vintage through the append, so that concurrent appends (e.g., of
+    the service refresh thread and the command line) neither interleave
+    their records nor compare against a vintage that is being appended.
+
+    Args:
+        series_df (DataFrame): series with columns Date and value_col with
+            at most one observation per month
+        vintage_date (str or datetime): date on which the series was
+            published, e.g., the last-modified date that FRED reports
+        store_path (str): path of the store file
+        value_col (str): name of the value column of series_df
+
+    Other functions and files called by this function:
+        read_store()
+        get_vintage()
+
+    Files created by this function:
+        [store_dir]/[series_id].bin
+
+    Returns:
+        num_records (int): number of records appended
+    """
+    with open(store_path, "ab") as store_file:
+        if fcntl is not None:
+            fcntl.flock(store_file, fcntl.LOCK_EX)
+        # Other processes may have appended between the open and the lock
+        store_file.seek(0, os.SEEK_END)
+        try:
+            num_records = append_locked(
+                series_df, vintage_date, store_path, value_col, store_file
+            )
+        finally:
+            if fcntl is not None:
+                fcntl.flock(store_file, fcntl.LOCK_UN)
+
+    return num_records
+
+
+def append_locked(series_df, vintage_date, store_path, value_col, store_file):
+    """
+    This function does the comparison and the append of append_vintage()
+    while the store file is locked.
+
+    Args:
+        series_df (DataFrame): series with columns Date and value_col
+        vintage_date (str or datetime): vintage date of the series
+        store_path (str): path of the store file
+        value_col (str): name of the value column of series_df
+        store_file (file): store file opened for appending and locked
+
+    Other functions and files called by this function:
+        read_store()
+        get_vintage()
+
+    Files created by this function:
+        [store_dir]/[series_id].bin
+
+    Returns:
+        num_records (int): number of records appended
+    """
+    vintage_day = np.datetime64(pd.Timestamp(vintage_date).date(), "D")
+    vintage_int = vintage_day.astype(np.int64)
+    records = read_store(store_path)
+    num_known = np.searchsorted(records["vintage"], vintage_int, "right")
+    mths = (
+        series_df["Date"]
+        .to_numpy(dtype="datetime64[ns]")
+        .astype("datetime64[M]")
+        .astype(np.int64)
+    )
+    vals = series_df[value_col].to_numpy(dtype=float)
+
+    # Compare with the stored vintage as of the vintage date on the union of
+    # months within the date range of the new vintage
+    if num_known:
+        prev_df = get_vintage(store_path, vintage_day, value_col=value_col)
+        prev_mths = (
+            prev_df["Date"]
+            .to_numpy(dtype="datetime64[ns]")
+            .astype("datetime64[M]")
+            .astype(np.int64)
+        )
+        prev_vals = prev_df[value_col].to_numpy(dtype=float)
+    else:
+        prev_mths = np.empty(0, dtype=np.int64)
+        prev_vals = np.empty(0)
+    if len(mths):
+        in_range = (prev_mths >= mths.min()) & (prev_mths <= mths.max())
+    else:
+        in_range = np.zeros(len(prev_mths), dtype=bool)
+    all_mths = np.union1d(mths, prev_mths[in_range])
+    new_vals = np.full(len(all_mths), np.nan)
+    new_vals[np.searchsorted(all_mths, mths)] = vals
+    old_vals = np.full(len(all_mths), np.nan)
+    old_vals[np.searchsorted(all_mths, prev_mths[in_range])] = prev_vals[
+        in_range
+    ]
+    is_changed = (new_vals != old_vals) & ~(
+        np.isnan(new_vals) & np.isnan(old_vals)
+    )
+
+    # The next stored vintage keeps the previous value of each changed month
+    # that it does not store itself
+    is_restored = np.zeros(len(all_mths), dtype=bool)
+    next_vintage = vintage_int
+    if num_known < len(records):
+        next_vintage = records["vintage"][num_known]
+        next_mths = records["mth"][records["vintage"] == next_vintage]
+        is_restored = is_changed & ~np.isin(all_mths, next_mths)
+
+    num_changed = int(is_changed.sum())
+    new_records = np.empty(
+        num_changed + int(is_restored.sum()), dtype=RECORD_DTYPE
+    )
+    new_records["mth"][:num_changed] = all_mths[is_changed]
+    new_records["vintage"][:num_changed] = vintage_int
+    new_records["value"][:num_changed] = new_vals[is_changed]
+    new_records["mth"][num_changed:] = all_mths[is_restored]
+    new_records["vintage"][num_changed:] = next_vintage
+    new_records["value"][num_changed:] = old_vals[is_restored]
+    # The file is only ever appended to, so earlier vintages are never
+    # rewritten
+    if store_file.tell() == 0:
+        store_file.write(STORE_HEADER)
+    store_file.write(new_records.tobytes())
+    store_file.flush()
+
+    return len(new_records)
@@ -0,0 +1,235 @@
+"""
+This module answers range queries over the aligned normalized peak series
+for many plot windows at once, e.g., for sensitivity studies over thousands
+of (bkwd_mths_main, frwd_mths_main) pairs. A sparse table of the positions
+of the minimum and maximum of every power-of-two run of months is built once
+per (recession x months-from-peak) matrix. Each window is then answered with
+two lookups per recession, so a sweep is a handful of NumPy gathers instead
+of one boolean-mask scan of the series per window.
+
+Example:
+    usempl_pk = usempl_data.get_usempl_data(...)[0]
+    range_index = build_range_index(*get_sweep_matrix(usempl_pk))
+    win_min, win_max, trough_mths, y_min, y_max = sweep_windows(
+        range_index, bkwd_mths_arr, frwd_mths_arr
+    )
+
+This module defines the following function(s):
+    get_sweep_matrix()
+    build_range_index()
+    sweep_windows()
+"""
+
+# Import packages
+import numpy as np
+
+"""
+Define functions
+"""
+
+
+def get_sweep_matrix(usempl_pk, dv_pk_col="usempl_dv_pk"):
+    """
+    This function gets the (recession x months-from-peak) matrix of the
+    normalized peak values from the wide or the long normalized peak
+    DataFrame.
+
+    Args:
+        usempl_pk (DataFrame): N x (1 + 3R) wide normalized peak DataFrame
+            from usempl_data.align_peaks(), or long normalized peak DataFrame
+            from usempl_data.build_usempl_pk_long()
+        dv_pk_col (str): name of the value as fraction of peak column, or
+            prefix of the value as fraction of peak columns of the wide
+            DataFrame
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        mths_frm_peak (array_like): (N,) integer array of consecutive months
+            from peak
+        rec_vals (array_like): (R, N) float array of the normalized peak
+            value of each recession at each month from peak, NaN where the
+            recession has no data
+    """
+    if "recession_id" in usempl_pk.columns:
+        rec_codes = usempl_pk["recession_id"].cat.codes.to_numpy()
+        num_rec = len(usempl_pk["recession_id"].cat.categories)
+        mths = usempl_pk["mths_frm_peak"].to_numpy(dtype=np.int64)
+        mths_frm_peak = np.arange(mths.min(), mths.max() + 1)
+        rec_vals = np.full((num_rec, len(mths_frm_peak)), np.nan)
+        rec_vals[rec_codes, mths - mths_frm_peak[0]] = usempl_pk[
+            dv_pk_col
+        ].to_numpy(dtype=float)
+    else:
+        num_rec = (usempl_pk.shape[1] - 1) // 3
+        mths_frm_peak = usempl_pk["mths_frm_peak"].to_numpy(dtype=np.int64)
+        rec_vals = np.stack(
+            [
+                usempl_pk[dv_pk_col + str(i)].to_numpy(dtype=float)
+                for i in range(num_rec)
+            ]
+        )
+
+    return mths_frm_peak, rec_vals
+
+
+def build_range_index(mths_frm_peak, rec_vals):
+    """
+    This function builds the sparse table range index of the matrix of
+    normalized peak values. Level k of the table holds, for every recession
+    and month, the column of the minimum (earliest one if tied) and of the
+    maximum of the 2**k months that start at that month. Missing values
+    never win a comparison.
+
+    Args:
+        mths_frm_peak (array_like): (N,) integer array of consecutive months
+            from peak
+        rec_vals (array_like): (R, N) float array of the normalized peak
+            value of each recession at each month from peak, NaN where the
+            recession has no data
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        range_index (dict): dictionary with the months from peak
+            (mths_frm_peak), the (R, N) matrices with missing values filled
+            with +inf (min_vals) and -inf (max_vals), the (K, R, N) int32
+            column tables (min_cols, max_cols), and the (N + 1,) floor
+            log2 lookup of window lengths (log_tbl)
+    """
+    mths_frm_peak = np.asarray(mths_frm_peak, dtype=np.int64)
+    rec_vals = np.asarray(rec_vals, dtype=float)
+    if np.any(np.diff(mths_frm_peak) != 1):
+        raise ValueError("mths_frm_peak must be consecutive months.")
+    num_rec, num_mths = rec_vals.shape
+    is_nan = np.isnan(rec_vals)
+    min_vals = np.where(is_nan, np.inf, rec_vals)
+    max_vals = np.where(is_nan, -np.inf, rec_vals)
+    rec_rows = np.arange(num_rec)[:, None]
+
+    # Each level combines two overlapping runs of the level below. Columns
+    # whose run would pass the last month keep the entry of the level below
+    # and are never queried
+    num_lvls = int(num_mths).bit_length()
+    min_cols = np.empty((num_lvls, num_rec, num_mths), dtype=np.int32)
+    max_cols = np.empty((num_lvls, num_rec, num_mths), dtype=np.int32)
+    min_cols[0] = np.arange(num_mths, dtype=np.int32)
+    max_cols[0] = min_cols[0]
+    for k in range(1, num_lvls):
+        half = 1 << (k - 1)
+        num_runs = num_mths - (1 << k) + 1
+        min_cols[k] = min_cols[k - 1]
+        max_cols[k] = max_cols[k - 1]
+        for cols, vals, is_better in [
+            (min_cols, min_vals, np.less_equal),
+            (max_cols, max_vals, np.greater_equal),
+        ]:
+            left = cols[k - 1, :, :num_runs]
+            right = cols[k - 1, :, half : half + num_runs]
+            cols[k, :, :num_runs] = np.where(
+                is_better(vals[rec_rows, left], vals[rec_rows, right]),
+                left,
+                right,
+            )
+    log_tbl = np.zeros(num_mths + 1, dtype=np.int64)
+    log_tbl[2:] = np.floor(np.log2(np.arange(2, num_mths + 1)))
+
+    range_index = {
+        "mths_frm_peak": mths_frm_peak,
+        "min_vals": min_vals,
+        "max_vals": max_vals,
+        "min_cols": min_cols,
+        "max_cols": max_cols,
+        "log_tbl": log_tbl,
+    }
+
+    return range_index
+
+
+def sweep_windows(range_index, bkwd_mths, frwd_mths):
+    """
+    This function returns the minimum, maximum, and trough month of every
+    recession in every window of months from peak -bkwd_mths to frwd_mths,
+    and the y-range of all recessions in each window, with two sparse table
+    lookups per window and recession.
+
+    Args:
+        range_index (dict): range index from build_range_index()
+        bkwd_mths (array_like): (W,) integer array of the number of months
+            backward from the peak of each window
+        frwd_mths (array_like): (W,) integer array of the number of months
+            forward from the peak of each window
+
+    Other functions and files called by this function: None
+
+    Files created by this function: None
+
+    Returns:
+        win_min (array_like): (W, R) float array of the minimum of each
+            recession in each window, NaN if the recession has no data in
+            the window
+        win_max (array_like): (W, R) float array of the maximum of each
+            recession in each window, NaN if no data
+        trough_mths (array_like): (W, R) float array of the earliest month
+            from peak of the minimum of each recession in each window, NaN if
+            no data
+        y_min (array_like): (W,) float array of the minimum of all
+            recessions in each window, NaN if no data
+        y_max (array_like): (W,) float array of the maximum of all
+            recessions in each window, NaN if no data
+    """
+    mths_frm_peak = range_index["mths_frm_peak"]
+    bkwd_mths = np.atleast_1d(np.asarray(bkwd_mths, dtype=np.int64))
+    frwd_mths = np.atleast_1d(np.asarray(frwd_mths, dtype=np.int64))
+    if bkwd_mths.shape != frwd_mths.shape or bkwd_mths.ndim != 1:
+        raise ValueError(
+            "bkwd_mths and frwd_mths must be 1-D arrays of the same length."
+        )
+    lo = -bkwd_mths - mths_frm_peak[0]
+    hi = frwd_mths - mths_frm_peak[0]
+    if np.any(lo > hi) or np.any(lo < 0) or np.any(hi >= len(mths_frm_peak)):
+        raise ValueError(
+            "Each window must be nonempty and inside months from peak "
+            + str(mths_frm_peak[0])
+            + " to "
+            + str(mths_frm_peak[-1])
+            + "."
+        )
+
+    # Two overlapping runs of length 2**k cover each window [lo, hi]
+    lvl = range_index["log_tbl"][hi - lo + 1][:, None]
+    lo = lo[:, None]
+    hi_run = hi[:, None] - (1 << lvl) + 1
+    rec_rows = np.arange(range_index["min_vals"].shape[0])[None, :]
+    win_stats = []
+    for cols, vals, is_better in [
+        (range_index["min_cols"], range_index["min_vals"], np.less_equal),
+        (range_index["max_cols"], range_index["max_vals"], np.greater_equal),
+    ]:
+        left = cols[lvl, rec_rows, lo]
+        right = cols[lvl, rec_rows, hi_run]
+        left_vals = vals[rec_rows, left]
+        right_vals = vals[rec_rows, right]
+        is_left = is_better(left_vals, right_vals)
+        win_stats.append(
+            (
+                np.where(is_left, left, right),
+                np.where(is_left, left_vals, right_vals),
+            )
+        )
+    (min_col, win_min), (_, win_max) = win_stats
+
+    has_data = np.isfinite(win_min)
+    y_min = win_min.min(axis=1)
+    y_max = win_max.max(axis=1)
+    y_min[~np.isfinite(y_min)] = np.nan
+    y_max[~np.isfinite(y_max)] = np.nan
+    trough_mths = np.where(has_data, mths_frm_peak[min_col], np.nan)
+    win_min = np.where(has_data, win_min, np.nan)
+    win_max = np.where(has_data, win_max, np.nan)
+
+    return win_min, win_max, trough_mths, y_min, y_max